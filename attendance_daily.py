@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Итоги посещаемости за день для дашборда (PostgreSQL)
+
+day_summary считает одним запросом все показатели дня: сколько сотрудников
+активно, пришло, опоздало, было с исключениями и у скольких день рождения.
+day_employees - те же показатели по каждому пришедшему сотруднику: из этого
+набора /dashboard строит и итоги, и списки виджетов за один проход по дню.
+Итоги прошедших дней хранятся в attendance_daily (миграция 11), из них
+читается недельный тренд. Строку дня удаляют те, кто меняет его данные:
+импорт (по дням записанных событий), исключения сотрудников, исключения
+отделов и правки сотрудников и отделов (ФИО, день рождения, отдел,
+активность, удаление отдела); при следующем чтении она пересчитывается.
+
+Чтобы чтение не сохранило итог, посчитанный до чужой записи, пересчет дня
+идет под разделяемой advisory-блокировкой дня, а сброс берет ту же блокировку
+монопольно до конца своей транзакции: сброс ждет, пока читатель сохранит
+строку, и удаляет ее, а читатель ждет фиксации сброса и видит новые данные.
+"""
+
+from datetime import datetime, time, timedelta
+
+# Служебные учетные записи, которые не считаются сотрудниками в отчетах
+EXCLUDED_NAMES = [
+    'Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.'
+]
+
+# Позже этого первый вход считается опозданием
+LATE_AFTER = time(9, 0)
+
+# Окно недельного тренда, дней (включая выбранный)
+TREND_DAYS = 7
+
+# Класс advisory-блокировок пересчета итогов: ключ (класс, день.toordinal()), (класс, 0) - все дни
+ATTENDANCE_LOCK_CLASS = 7240511
+
+# Сброс большего числа дней блокирует все дни разом, а не каждый отдельно
+INVALIDATE_LOCK_DAYS_MAX = 31
+
+SUMMARY_FIELDS = ('total_employees', 'present_count', 'late_count', 'exceptions_count', 'birthdays_count')
+
+# Сотрудники с записями за день и их первый вход не через выход (NULL - были только выходы)
+DAY_LOGS_CTE = """
+    day_logs AS (
+        SELECT employee_id,
+               MIN(CASE WHEN door_location NOT LIKE '%%выход%%' OR door_location IS NULL
+                        THEN CAST(access_datetime AS TIME) END) AS first_entry
+        FROM access_logs
+        WHERE access_datetime >= %(start)s AND access_datetime < %(end)s
+        GROUP BY employee_id
+    )
+"""
+
+DAY_SUMMARY_SQL = f"""
+    WITH {DAY_LOGS_CTE},
+    personal_exceptions AS (
+        SELECT employee_id, BOOL_OR(exception_type = 'no_lateness_check') AS no_lateness
+        FROM employee_exceptions
+        WHERE exception_date = %(day)s AND exception_type IS NOT NULL
+        GROUP BY employee_id
+    ),
+    department_exceptions AS (
+        SELECT department_id, BOOL_OR(exception_type = 'no_lateness_check') AS no_lateness
+        FROM whitelist_departments
+        WHERE exception_type IS NOT NULL
+        GROUP BY department_id
+    )
+    SELECT COUNT(*) AS total_employees,
+           COUNT(dl.employee_id) AS present_count,
+           COUNT(*) FILTER (
+               WHERE dl.first_entry > %(late_after)s
+               AND NOT COALESCE(pe.no_lateness, FALSE)
+               AND NOT COALESCE(de.no_lateness, FALSE)
+           ) AS late_count,
+           COUNT(*) FILTER (
+               WHERE dl.employee_id IS NOT NULL
+               AND (pe.employee_id IS NOT NULL OR de.department_id IS NOT NULL)
+           ) AS exceptions_count,
+           COUNT(*) FILTER (
+               WHERE EXTRACT(MONTH FROM e.birth_date) = %(month)s
+               AND EXTRACT(DAY FROM e.birth_date) = %(day_of_month)s
+           ) AS birthdays_count
+    FROM employees e
+    LEFT JOIN day_logs dl ON dl.employee_id = e.id
+    LEFT JOIN personal_exceptions pe ON pe.employee_id = e.id
+    LEFT JOIN department_exceptions de ON de.department_id = e.department_id
+    WHERE e.is_active = TRUE
+    AND e.full_name <> ALL(%(excluded)s)
+"""
+
+
+DAY_EMPLOYEES_SQL = f"""
+    WITH {DAY_LOGS_CTE}
+    SELECT e.id, e.full_name, e.department_id, dl.first_entry,
+           ee.reason, ee.exception_type, wd.reason, wd.exception_type
+    FROM day_logs dl
+    JOIN employees e ON e.id = dl.employee_id
+    LEFT JOIN employee_exceptions ee ON ee.employee_id = e.id AND ee.exception_date = %(day)s
+    LEFT JOIN whitelist_departments wd ON wd.department_id = e.department_id
+    WHERE e.is_active = TRUE
+    AND e.full_name <> ALL(%(excluded)s)
+    ORDER BY e.full_name
+"""
+
+BIRTHDAYS_SQL = """
+    SELECT e.id, e.full_name, e.birth_date, d.name, p.name,
+           %(year)s - EXTRACT(YEAR FROM e.birth_date) AS age
+    FROM employees e
+    LEFT JOIN departments d ON e.department_id = d.id
+    LEFT JOIN positions p ON e.position_id = p.id
+    WHERE e.is_active = TRUE
+    AND EXTRACT(MONTH FROM e.birth_date) = %(month)s
+    AND EXTRACT(DAY FROM e.birth_date) = %(day_of_month)s
+    AND e.full_name <> ALL(%(excluded)s)
+    ORDER BY e.full_name
+"""
+
+
+def day_params(day):
+    start = datetime.combine(day, time.min)
+    return {
+        'start': start,
+        'end': start + timedelta(days=1),
+        'day': day,
+        'late_after': LATE_AFTER,
+        'year': day.year,
+        'month': day.month,
+        'day_of_month': day.day,
+        'excluded': EXCLUDED_NAMES
+    }
+
+
+def day_employees(conn, day):
+    """Пришедшие за день сотрудники (по ФИО) с первым входом, опозданием и исключением
+
+    Общий набор для всех виджетов дашборда: те же правила, что и в day_summary.
+    Причина исключения - личная, если есть, иначе исключение отдела.
+    """
+    cursor = conn.cursor()
+    cursor.execute(DAY_EMPLOYEES_SQL, day_params(day))
+    employees = []
+    for (employee_id, full_name, department_id, first_entry,
+         personal_reason, personal_type, department_reason, department_type) in cursor.fetchall():
+        no_lateness = 'no_lateness_check' in (personal_type, department_type)
+        employees.append({
+            'id': employee_id,
+            'full_name': full_name,
+            'department_id': department_id,
+            'first_entry': first_entry,
+            'is_late': bool(first_entry and first_entry > LATE_AFTER and not no_lateness),
+            'has_exception': personal_type is not None or department_type is not None,
+            'exception_reason': personal_reason or department_reason,
+            'exception_type': personal_type if personal_reason else department_type
+        })
+    return employees
+
+
+def active_employees_count(conn):
+    """Активные сотрудники без служебных учетных записей"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM employees WHERE is_active = TRUE AND full_name <> ALL(%s)",
+                   (EXCLUDED_NAMES,))
+    return cursor.fetchone()[0]
+
+
+def birthdays(conn, day):
+    """Активные сотрудники с днем рождения в этот день (по дню и месяцу)"""
+    cursor = conn.cursor()
+    cursor.execute(BIRTHDAYS_SQL, day_params(day))
+    return [{
+        'id': row[0],
+        'name': row[1],
+        'birth_date': row[2].strftime('%Y-%m-%d') if row[2] else None,
+        'age': int(row[5]) if row[5] else None,
+        'department_name': row[3],
+        'position_name': row[4]
+    } for row in cursor.fetchall()]
+
+
+def totals_from_employees(employees, total_employees, birthdays_count):
+    """Итоги дня (как day_summary) из набора day_employees"""
+    return {
+        'total_employees': total_employees,
+        'present_count': len(employees),
+        'late_count': sum(1 for employee in employees if employee['is_late']),
+        'exceptions_count': sum(1 for employee in employees if employee['has_exception']),
+        'birthdays_count': birthdays_count
+    }
+
+
+def day_summary(conn, day):
+    """Показатели дня одним проходом: {total_employees, present_count, late_count, exceptions_count, birthdays_count}
+
+    Пришедшие - активные сотрудники с любой записью за день; опоздавшие - первый вход
+    не через выход позже 9:00 без исключения no_lateness_check (личного или отдела);
+    с исключениями - пришедшие с личным исключением на дату или исключением отдела.
+    """
+    cursor = conn.cursor()
+    cursor.execute(DAY_SUMMARY_SQL, day_params(day))
+    return dict(zip(SUMMARY_FIELDS, cursor.fetchone()))
+
+
+def store_day(conn, day, summary):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO attendance_daily (day, total_employees, present_count, late_count, exceptions_count, birthdays_count)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (day) DO UPDATE
+        SET total_employees = EXCLUDED.total_employees,
+            present_count = EXCLUDED.present_count,
+            late_count = EXCLUDED.late_count,
+            exceptions_count = EXCLUDED.exceptions_count,
+            birthdays_count = EXCLUDED.birthdays_count,
+            computed_at = CURRENT_TIMESTAMP
+    """, (day,) + tuple(summary[field] for field in SUMMARY_FIELDS))
+
+
+def past_days_totals(conn, day):
+    """Итоги TREND_DAYS - 1 дней перед day: из attendance_daily, недостающие считаются и сохраняются"""
+    first_day = day - timedelta(days=TREND_DAYS - 1)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT day, {', '.join(SUMMARY_FIELDS)}
+        FROM attendance_daily
+        WHERE day >= %s AND day < %s
+    """, (first_day, day))
+    totals = {row[0]: dict(zip(SUMMARY_FIELDS, row[1:])) for row in cursor.fetchall()}
+    for offset in range(TREND_DAYS - 1):
+        past_day = first_day + timedelta(days=offset)
+        if past_day not in totals:
+            totals[past_day] = compute_day(conn, past_day)
+    return totals
+
+
+def compute_day(conn, day):
+    """Считает и сохраняет итоги дня; сброс дня (invalidate_*) ждет, пока строка не будет сохранена"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_lock_shared(%s, 0)", (ATTENDANCE_LOCK_CLASS,))
+    try:
+        cursor.execute("SELECT pg_advisory_lock_shared(%s, %s)", (ATTENDANCE_LOCK_CLASS, day.toordinal()))
+        try:
+            summary = day_summary(conn, day)
+            store_day(conn, day, summary)
+            if not conn.autocommit:
+                conn.commit()
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock_shared(%s, %s)", (ATTENDANCE_LOCK_CLASS, day.toordinal()))
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock_shared(%s, 0)", (ATTENDANCE_LOCK_CLASS,))
+    return summary
+
+
+def trend_from_totals(totals):
+    """Посещаемость и доля опозданий (%) по итогам дней {день: итоги}
+
+    В среднее входят будни, в которые кто-то пришел: выходные (с дежурными
+    и ночными сменами) и праздники тренд не занижают.
+    """
+    worked = [t for trend_day, t in totals.items()
+              if trend_day.weekday() < 5 and t['present_count'] and t['total_employees']]
+    if not worked:
+        return 0.0, 0.0
+    attendance = sum(t['present_count'] * 100.0 / t['total_employees'] for t in worked) / len(worked)
+    late = sum(t['late_count'] for t in worked) * 100.0 / sum(t['present_count'] for t in worked)
+    return attendance, late
+
+
+def weekly_trend(conn, day, day_totals):
+    """Недельный тренд (посещаемость, опоздания в %) за TREND_DAYS дней, заканчивающихся day
+
+    day_totals - итоги самого дня (уже посчитаны дашбордом).
+    """
+    totals = past_days_totals(conn, day)
+    totals[day] = day_totals
+    return trend_from_totals(totals)
+
+
+def invalidate_days(cursor, days):
+    """Сбрасывает итоги дней (их записи или исключения изменились)
+
+    Блокировки дней держатся до конца транзакции вызывающего: пересчет этих дней
+    (compute_day) дождется ее фиксации.
+    """
+    if not days:
+        return
+    days = sorted(days)
+    if len(days) > INVALIDATE_LOCK_DAYS_MAX:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, 0)", (ATTENDANCE_LOCK_CLASS,))
+    else:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, key) FROM unnest(%s::int[]) AS key",
+                       (ATTENDANCE_LOCK_CLASS, [day.toordinal() for day in days]))
+    cursor.execute("DELETE FROM attendance_daily WHERE day = ANY(%s::date[])", (days,))
+
+
+def invalidate_all(cursor):
+    """Сбрасывает итоги всех дней (изменились исключения отделов или состав сотрудников)"""
+    cursor.execute("SELECT pg_advisory_xact_lock(%s, 0)", (ATTENDANCE_LOCK_CLASS,))
+    cursor.execute("DELETE FROM attendance_daily")
@@ -5,33 +5,14 @@ import sys
 from fastapi import HTTPException
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+import asyncio
 import configparser
+import threading
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
 app = FastAPI(title="СКУД API", description="API для системы контроля и управления доступом")
 
-# Создать таблицу whitelist_departments для бесконечных исключений по отделу
-def create_whitelist_departments_table():
-    """Создает таблицу whitelist_departments для отделов с бесконечным исключением"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS whitelist_departments (
-                id SERIAL PRIMARY KEY,
-                department_id INTEGER NOT NULL REFERENCES departments(id),
-                reason TEXT NOT NULL,
-                exception_type TEXT DEFAULT 'no_lateness_check',
-                is_permanent BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_by TEXT DEFAULT 'system',
-                UNIQUE(department_id)
-            )
-        """)
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Ошибка создания таблицы whitelist_departments: {e}")
 # Получить все исключения сотрудников
 
 # ...existing code...
@@ -41,23 +22,95 @@ def create_whitelist_departments_table():
 # ...existing code...
 
 # Добавляю GET-эндпоинт /employee-exceptions после создания app
-def get_db_connection():
-    """Создает соединение с PostgreSQL"""
-    import psycopg2
-    import psycopg2.extras
-    import configparser
+def get_db_params():
+    """Параметры подключения к PostgreSQL из real_skud_config.ini"""
     config = configparser.ConfigParser()
     config.read('real_skud_config.ini')
-    db_params = {
+    return {
         'host': config.get('DATABASE', 'host', fallback='localhost'),
         'port': config.get('DATABASE', 'port', fallback='5432'),
         'user': config.get('DATABASE', 'user', fallback='postgres'),
         'password': config.get('DATABASE', 'password', fallback='postgres'),
         'dbname': config.get('DATABASE', 'database', fallback='skud_db')
     }
-    conn = psycopg2.connect(**db_params)
+
+# Пул соединений создается лениво (при прогреве на старте или при первом запросе)
+DB_POOL_MIN = 2
+DB_POOL_MAX = 20
+db_pool = None
+db_pool_lock = threading.Lock()
+
+class PooledConnection:
+    """Соединение из пула: close() возвращает его в пул, а не закрывает"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._pool is None:
+            conn.close()
+            return
+        if not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+            conn.rollback()
+        self._pool.putconn(conn, close=bool(conn.closed))
+
+    def __del__(self):
+        # Эндпоинты, упавшие до conn.close(), не должны забирать соединения из пула навсегда
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        # conn.autocommit = ... должно попадать в настоящее соединение
+        if name in ('_pool', '_conn'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+def get_db_pool():
+    """Возвращает (и при необходимости создает) общий пул соединений"""
+    global db_pool
+    if db_pool is None:
+        with db_pool_lock:
+            if db_pool is None:
+                db_pool = psycopg2.pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **get_db_params())
+    return db_pool
+
+def get_db_connection():
+    """Выдает соединение с PostgreSQL из пула"""
+    pool = get_db_pool()
+    try:
+        conn = pool.getconn()
+    except psycopg2.pool.PoolError:
+        # Пул исчерпан - работаем отдельным соединением, чтобы не отказывать запросу;
+        # исчерпание - сигнал перегрузки для ограничителя записи импорта
+        get_throttle().observe_pool_exhausted()
+        conn = psycopg2.connect(**get_db_params())
+        conn.autocommit = True
+        return PooledConnection(None, conn)
+    if conn.closed:
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
     conn.autocommit = True
-    return conn
+    return PooledConnection(pool, conn)
+
+def close_db_pool():
+    """Закрывает все соединения пула (при остановке сервера)"""
+    global db_pool
+    with db_pool_lock:
+        if db_pool is not None:
+            db_pool.closeall()
+            db_pool = None
 
 def get_employee_status(is_late, first_entry, exception_info):
     """Простая функция статуса сотрудника для отчёта"""
@@ -78,12 +131,30 @@ import uvicorn
 import os
 import tempfile
 import sys
+import time
+import csv
+import io
 import hashlib
 import secrets
-from functools import wraps
+from functools import wraps, lru_cache
+from collections import OrderedDict, namedtuple
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import threading
+from ingest_jobs import IngestJob, IngestJobQueue, IngestQueueFull
+from ingest_pipeline import load_pipeline_settings
+from ingest_manifest import process_owner
+from ingest_throttle import get_throttle, PUBLISH_INTERVAL
+from migrations import ensure_schema
+from attendance_daily import (
+    day_summary, weekly_trend, day_employees, active_employees_count, birthdays, totals_from_employees,
+    past_days_totals, trend_from_totals, invalidate_days, invalidate_all, LATE_AFTER, EXCLUDED_NAMES
+)
+import data_catalog
+from event_export import event_filters, stream_events
+from fast_json import FastJSONResponse
+from report_queries import employee_history
+from sql_dialect import PostgresDialect, exit_condition
 def hash_password(password: str) -> str:
     """Хеширует пароль с помощью SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -95,10 +166,12 @@ import psycopg2
 import psycopg2.extras
 import configparser
 sys.path.append(os.path.join(os.path.dirname(__file__)))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+from real_skud_parser import parse_real_skud_line, record_from_dict, create_real_skud_config
 
 app = FastAPI(title="СКУД API", description="API для системы контроля и управления доступом")
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # Хранилище для логов проверки папки
 folder_check_logs = []
@@ -117,6 +190,21 @@ def add_folder_log(message: str, log_type: str = 'info'):
         if len(folder_check_logs) > 100:
             folder_check_logs.pop(0)
 
+def get_integrator_db_config():
+    """Параметры подключения для SkudDatabaseIntegrator из postgres_config.ini"""
+    config = configparser.ConfigParser()
+    config.read('postgres_config.ini', encoding='utf-8')
+    return {
+        'host': config.get('DATABASE', 'host', fallback='localhost'),
+        'port': config.getint('DATABASE', 'port', fallback=5432),
+        'database': config.get('DATABASE', 'database', fallback='skud_db'),
+        'user': config.get('DATABASE', 'user', fallback='postgres'),
+        'password': config.get('DATABASE', 'password', fallback='password')
+    }
+
+# Сколько файлов папки prishel_txt загружать одновременно ([INGEST] file_workers)
+FOLDER_INGEST_WORKERS = load_pipeline_settings()['file_workers']
+
 def check_prishel_folder_background():
     """Фоновая задача для проверки папки prishel_txt"""
     import glob
@@ -137,34 +225,16 @@ def check_prishel_folder_background():
             add_folder_log('ℹ Папка пуста - файлы не найдены', 'info')
             return
         
-        # Обрабатываем каждый файл
-        from database_integrator import SkudDatabaseIntegrator
-        import configparser
+        # Обрабатываем файлы параллельно (у каждого воркера свое соединение)
+        from database_integrator import SkudDatabaseIntegrator, process_skud_files
         
-        # Загружаем конфигурацию PostgreSQL
-        config = configparser.ConfigParser()
-        config.read('postgres_config.ini', encoding='utf-8')
-        
-        pg_config = {
-            'host': config.get('DATABASE', 'host', fallback='localhost'),
-            'port': config.getint('DATABASE', 'port', fallback=5432),
-            'database': config.get('DATABASE', 'database', fallback='skud_db'),
-            'user': config.get('DATABASE', 'user', fallback='postgres'),
-            'password': config.get('DATABASE', 'password', fallback='password')
-        }
-        
-        integrator = SkudDatabaseIntegrator(db_type="postgresql", **pg_config)
+        integrator = SkudDatabaseIntegrator(db_type="postgresql", **get_integrator_db_config())
         if not integrator.connect():
             add_folder_log('✗ Ошибка подключения к базе данных', 'error')
             return
+        integrator.close()
         
-        total_stats = {
-            'processed_lines': 0,
-            'new_employees': 0,
-            'new_access_records': 0
-        }
-        files_processed = 0
-        
+        ready_files = []
         for file_path in txt_files:
             filename = os.path.basename(file_path)
             try:
@@ -187,28 +257,36 @@ def check_prishel_folder_background():
                 # Пересохраняем файл в правильной кодировке
                 with open(file_path, 'w', encoding='windows-1251') as f:
                     f.write(content_str)
-                
-                result = integrator.process_skud_file(file_path)
-                
-                if result['success']:
-                    details = result.get('details', {})
-                    total_stats['processed_lines'] += details.get('processed_lines', 0)
-                    total_stats['new_employees'] += details.get('new_employees', 0)
-                    total_stats['new_access_records'] += details.get('new_access_records', 0)
-                    
-                    add_folder_log(f'✓ {filename}: {details.get("processed_lines", 0)} строк обработано', 'success')
-                    files_processed += 1
-                    
-                    # Удаляем обработанный файл
-                    os.remove(file_path)
-                else:
-                    add_folder_log(f'✗ {filename}: {result.get("error", "Неизвестная ошибка")}', 'error')
+                ready_files.append(file_path)
             except Exception as e:
                 add_folder_log(f'✗ {filename}: {str(e)}', 'error')
         
+        def on_file_done(file_path, result):
+            filename = os.path.basename(file_path)
+            if result.get('skipped'):
+                add_folder_log(f'⏭ {filename}: файл уже был загружен ранее, пропущен', 'info')
+                os.remove(file_path)
+            elif result['success']:
+                details = result.get('details', {})
+                add_folder_log(f'✓ {filename}: {details.get("processed_lines", 0)} строк обработано за {result["seconds"]} сек', 'success')
+                # Удаляем обработанный файл
+                os.remove(file_path)
+            else:
+                add_folder_log(f'✗ {filename}: {result.get("error", "Неизвестная ошибка")}', 'error')
+        
+        if not ready_files:
+            return
+        summary = process_skud_files(
+            ready_files, get_integrator_db_config(),
+            workers=FOLDER_INGEST_WORKERS, source='folder', on_result=on_file_done
+        )
+        # Записи могли лечь и в файлы, завершившиеся ошибкой (зафиксированные пакеты)
+        invalidate_dashboard_cache()
+        
+        files_processed = summary['succeeded'] + summary['skipped']
         if files_processed > 0:
-            add_folder_log(f'✓ Обработано файлов: {files_processed}', 'success')
-            add_folder_log(f'  → Строк: {total_stats["processed_lines"]} | Новых сотрудников: {total_stats["new_employees"]} | Записей доступа: {total_stats["new_access_records"]}', 'success')
+            add_folder_log(f'✓ Обработано файлов: {files_processed} за {summary["elapsed_sec"]} сек ({summary["workers"]} потоков)', 'success')
+            add_folder_log(f'  → Строк: {summary["processed_lines"]} | Новых сотрудников: {summary["new_employees"]} | Записей доступа: {summary["new_access_records"]}', 'success')
         
     except Exception as e:
         add_folder_log(f'✗ Ошибка проверки папки: {str(e)}', 'error')
@@ -223,20 +301,429 @@ scheduler.add_job(
     replace_existing=True
 )
 
+def load_tail_settings():
+    """Настройки tail-режима из секции [TAIL] postgres_config.ini"""
+    config = configparser.ConfigParser()
+    config.read('postgres_config.ini', encoding='utf-8')
+    return {
+        'enabled': config.getboolean('TAIL', 'enabled', fallback=False),
+        'folder': config.get('TAIL', 'folder', fallback='tail_txt'),
+        'pattern': config.get('TAIL', 'pattern', fallback='*.txt'),
+        'interval_seconds': config.getint('TAIL', 'interval_seconds', fallback=5),
+        'idle_after_minutes': config.getint('TAIL', 'idle_after_minutes', fallback=60)
+    }
+
+tail_settings = load_tail_settings()
+tail_follower = None
+
+def tail_follow_background():
+    """Дочитывает новые строки растущих файлов выгрузки (только после готовности сервера)"""
+    global tail_follower
+    if not readiness_state['ready']:
+        return
+    try:
+        if tail_follower is None:
+            from database_integrator import SkudDatabaseIntegrator
+            from ingest_tail import TailFollower
+            tail_follower = TailFollower(
+                lambda: SkudDatabaseIntegrator(db_type="postgresql", **get_integrator_db_config()),
+                tail_settings['folder'],
+                tail_settings['pattern'],
+                idle_after_seconds=tail_settings['idle_after_minutes'] * 60
+            )
+        results = tail_follower.poll()
+        if any(results.values()):
+            invalidate_dashboard_cache()
+        for filename, inserted in results.items():
+            if inserted:
+                add_folder_log(f'📈 {filename}: +{inserted} новых записей (tail)', 'success')
+    except Exception as e:
+        add_folder_log(f'✗ Ошибка tail-импорта: {str(e)}', 'error')
+
+if tail_settings['enabled']:
+    os.makedirs(tail_settings['folder'], exist_ok=True)
+    scheduler.add_job(
+        func=tail_follow_background,
+        trigger=IntervalTrigger(seconds=tail_settings['interval_seconds']),
+        id='tail_follow',
+        name=f'Дочитывание растущих выгрузок каждые {tail_settings["interval_seconds"]} сек',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+
+# Папка для загруженных файлов, ожидающих импорта в очереди
+UPLOADS_DIR = "uploads"
+
+def run_ingest_job(job):
+    """Обработчик задачи очереди импорта: загружает файл в БД через интегратор"""
+    from database_integrator import SkudDatabaseIntegrator
+    try:
+        integrator = SkudDatabaseIntegrator(db_type="postgresql", **get_integrator_db_config())
+        if job.records is not None:
+            result = integrator.process_records(job.records, job=job, source=job.source)
+        else:
+            result = integrator.process_skud_file(job.file_path, job=job, source=job.source)
+        job.details = result.get('details')
+        if result.get('cancelled'):
+            job.set_phase('cancelled')
+            add_folder_log(f'⏹ {job.filename}: импорт отменен', 'info')
+        elif result.get('skipped'):
+            job.set_phase('done')
+            add_folder_log(f'⏭ {job.filename}: файл уже был загружен ранее, пропущен', 'info')
+        elif result['success']:
+            job.set_phase('done')
+            invalidate_dashboard_cache()
+            details = result.get('details', {})
+            add_folder_log(f'✓ {job.filename}: {details.get("processed_lines", 0)} строк обработано', 'success')
+        else:
+            job.add_error(result.get('error', 'Неизвестная ошибка'))
+            job.set_phase('failed')
+            add_folder_log(f'✗ {job.filename}: {result.get("error", "Неизвестная ошибка")}', 'error')
+    finally:
+        job.discard_file()
+
+def create_ingest_queue():
+    """Создает очередь импорта с настройками из секции [INGEST] postgres_config.ini"""
+    config = configparser.ConfigParser()
+    config.read('postgres_config.ini', encoding='utf-8')
+    return IngestJobQueue(
+        handler=run_ingest_job,
+        workers=config.getint('INGEST', 'workers', fallback=2),
+        max_depth=config.getint('INGEST', 'max_queue_depth', fallback=10)
+    )
+
+ingest_queue = create_ingest_queue()
+
+# ================================
+# КЭШ СПРАВОЧНИКОВ
+# ================================
+
+REFERENCE_CACHE_TTL = 60  # секунд
+reference_cache = {}
+reference_cache_lock = threading.Lock()
+
+def load_departments_map():
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name FROM departments")
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+def load_whitelist_rows():
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT department_id, reason, exception_type FROM whitelist_departments")
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+REFERENCE_LOADERS = {
+    'departments': load_departments_map,
+    'whitelist': load_whitelist_rows
+}
+
+def get_cached_reference(name):
+    """Возвращает справочник из кэша, перечитывая его из БД по истечении TTL"""
+    with reference_cache_lock:
+        entry = reference_cache.get(name)
+        if entry and time.time() - entry[0] < REFERENCE_CACHE_TTL:
+            return entry[1]
+    value = REFERENCE_LOADERS[name]()
+    with reference_cache_lock:
+        reference_cache[name] = (time.time(), value)
+    return value
+
+def get_departments_map():
+    """{department_id: name} для всех служб"""
+    return get_cached_reference('departments')
+
+def get_whitelist_rows():
+    """[(department_id, reason, exception_type)] из whitelist_departments"""
+    return get_cached_reference('whitelist')
+
+def invalidate_reference_cache(*names):
+    """Сбрасывает кэш справочников после изменений (без аргументов - весь кэш)"""
+    with reference_cache_lock:
+        for name in names or list(reference_cache.keys()):
+            reference_cache.pop(name, None)
+
+def prefill_reference_cache():
+    for name in REFERENCE_LOADERS:
+        invalidate_reference_cache(name)
+        get_cached_reference(name)
+
+# ================================
+# ЗАПУСК И ГОТОВНОСТЬ СЕРВЕРА
+# ================================
+
+# Пауза между попытками подготовки, если БД еще недоступна
+READINESS_RETRY_SECONDS = 5
+
+readiness_state = {
+    'ready': False,
+    'started_at': None,
+    'finished_at': None,
+    'attempts': 0,
+    'steps': {},
+    'error': None
+}
+readiness_lock = threading.Lock()
+shutdown_requested = threading.Event()
+# Прерванные импорты уже восстановлены этим процессом (шаг resume_imports)
+imports_resumed = False
+
+def warm_up_db_pool():
+    """Открывает минимальный набор соединений пула и проверяет их"""
+    conns = [get_db_connection() for _ in range(DB_POOL_MIN)]
+    try:
+        for conn in conns:
+            conn.cursor().execute("SELECT 1")
+    finally:
+        for conn in conns:
+            conn.close()
+
+def init_schema():
+    """Сверяет версию схемы (миграции применяются только если она отстала) и создает администратора"""
+    conn = get_db_connection()
+    try:
+        applied = ensure_schema(conn)
+    finally:
+        conn.close()
+    if applied:
+        add_folder_log(f'🗄 Применены миграции схемы: {", ".join(str(v) for v in applied)}', 'info')
+    create_initial_admin()
+
+def resume_interrupted_imports():
+    """Находит импорты, прерванные остановкой сервера, и ставит загрузки обратно в очередь
+
+    Повторный импорт продолжается с последней контрольной точки (см. IngestManifest.plan).
+    Файлы из prishel_txt подхватит плановая проверка папки, CLI-импорт перезапускается вручную.
+    Прерванными считаются только загрузки умерших процессов (IngestManifest.recover_interrupted),
+    и восстановление выполняется один раз за процесс: повтор подготовки после сбоя
+    следующего шага не ставит в очередь уже идущие загрузки второй раз.
+    """
+    global imports_resumed
+    from ingest_manifest import IngestManifest
+    if imports_resumed:
+        ingest_queue.start()
+        return
+    conn = get_db_connection()
+    try:
+        interrupted = IngestManifest(conn).recover_interrupted()
+    finally:
+        conn.close()
+    imports_resumed = True
+    for file_id, source, file_name, file_path, committed_offset in interrupted:
+        if source != 'upload' or not file_path or not os.path.exists(file_path):
+            add_folder_log(f'⚠️ {file_name}: импорт прерван на байте {committed_offset}', 'info')
+            continue
+        try:
+            ingest_queue.submit(IngestJob(file_path, file_name, source='upload'))
+            add_folder_log(f'⏩ {file_name}: прерванный импорт продолжится с байта {committed_offset}', 'info')
+        except IngestQueueFull:
+            add_folder_log(f'✗ {file_name}: очередь заполнена, прерванный импорт не возобновлен', 'error')
+    ingest_queue.start()
+
+READINESS_STEPS = [
+    ('pool_warmup', warm_up_db_pool),
+    ('schema', init_schema),
+    ('resume_imports', resume_interrupted_imports),
+    ('cache_prefill', prefill_reference_cache)
+]
+
+def run_readiness_sequence():
+    """Подготовка сервера в фоне: пул, схема, кэш; затем первичная проверка папки"""
+    with readiness_lock:
+        readiness_state['started_at'] = datetime.now().isoformat()
+    while not shutdown_requested.is_set():
+        with readiness_lock:
+            readiness_state['attempts'] += 1
+        try:
+            for step_name, step in READINESS_STEPS:
+                step_started = time.time()
+                step()
+                with readiness_lock:
+                    readiness_state['steps'][step_name] = round(time.time() - step_started, 3)
+        except Exception as e:
+            with readiness_lock:
+                readiness_state['error'] = f"{step_name}: {str(e).strip()}"
+            print(f"⚠️ Сервер не готов ({step_name}): {str(e).strip()}. Повтор через {READINESS_RETRY_SECONDS} сек")
+            shutdown_requested.wait(READINESS_RETRY_SECONDS)
+            continue
+        with readiness_lock:
+            readiness_state['ready'] = True
+            readiness_state['error'] = None
+            readiness_state['finished_at'] = datetime.now().isoformat()
+        add_folder_log('✓ Сервер готов к работе', 'success')
+        # Первичная проверка папки и снимок статистики - планировщиком, а не в потоке старта
+        scheduler.modify_job('check_prishel_folder', next_run_time=datetime.now())
+        scheduler.modify_job('health_stats', next_run_time=datetime.now())
+        return
+
 @app.on_event("startup")
 async def startup_event():
-    """Запускается при старте приложения"""
+    """Запускается при старте приложения: только запуск фоновых механизмов, без ожидания БД"""
     add_folder_log('🚀 Сервер запущен. Автопроверка активирована (интервал: 5 минут)', 'info')
+    shutdown_requested.clear()
     scheduler.start()
-    # Запускаем первую проверку сразу
-    check_prishel_folder_background()
+    threading.Thread(target=run_readiness_sequence, name='readiness', daemon=True).start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Запускается при остановке приложения"""
+    shutdown_requested.set()
     scheduler.shutdown()
+    ingest_queue.stop()
+    close_db_pool()
     add_folder_log('⏹ Сервер остановлен', 'info')
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: процесс жив и обрабатывает запросы (БД не проверяется)"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+# ================================
+# ПРОВЕРКИ ЗДОРОВЬЯ
+# ================================
+
+# Результат проверки пула переиспользуется столько секунд: частые пробы не нагружают БД
+HEALTH_PING_TTL = 10
+# Период обновления снимка статистики для /health
+HEALTH_STATS_INTERVAL_MINUTES = 5
+
+db_ping_state = {'checked_at': 0.0, 'ok': False, 'latency_ms': None, 'error': None}
+health_stats = {'data': None, 'refreshed_at': None, 'error': None}
+health_lock = threading.Lock()
+
+def ping_db_pool():
+    """Проверяет соединение из пула (SELECT 1); результат кэшируется на HEALTH_PING_TTL секунд"""
+    with health_lock:
+        if time.time() - db_ping_state['checked_at'] < HEALTH_PING_TTL:
+            return dict(db_ping_state)
+    started = time.time()
+    try:
+        conn = get_db_connection()
+        try:
+            conn.cursor().execute("SELECT 1")
+        finally:
+            conn.close()
+        result = {'ok': True, 'latency_ms': round((time.time() - started) * 1000, 1), 'error': None}
+    except Exception as e:
+        result = {'ok': False, 'latency_ms': None, 'error': str(e).strip()}
+    with health_lock:
+        db_ping_state.update(result, checked_at=time.time())
+        return dict(db_ping_state)
+
+def load_health_stats():
+    """Сводка по данным без полного прохода по access_logs
+
+    Число записей и последний день - из data_catalog, сотрудники с записями -
+    проверка по индексу (employee_id, ...) для каждого сотрудника.
+    """
+    conn = get_db_connection()
+    try:
+        catalog = data_catalog.totals(conn)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) FROM employees e
+            WHERE EXISTS (SELECT 1 FROM access_logs al WHERE al.employee_id = e.id)
+        """)
+        total_employees = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        "total_records": catalog['total_records'],
+        "total_employees": total_employees,
+        "last_data_date": catalog['last_day'].isoformat() if catalog['last_day'] else None
+    }
+
+def refresh_health_stats():
+    """Обновляет снимок статистики для /health (задача планировщика)"""
+    if not readiness_state['ready']:
+        return
+    try:
+        data = load_health_stats()
+        with health_lock:
+            health_stats.update(data=data, refreshed_at=datetime.now().isoformat(), error=None)
+    except Exception as e:
+        with health_lock:
+            health_stats['error'] = str(e).strip()
+
+def publish_load_signal():
+    """Публикует замеры нагрузки API для импорта в других процессах (ingest_throttle)"""
+    if not readiness_state['ready']:
+        return
+    try:
+        conn = get_db_connection()
+        try:
+            get_throttle().publish(conn.cursor(), f"api:{process_owner()}")
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Не удалось опубликовать сигнал нагрузки: {e}")
+
+scheduler.add_job(
+    func=publish_load_signal,
+    trigger=IntervalTrigger(seconds=PUBLISH_INTERVAL),
+    id='load_signal',
+    name=f'Публикация нагрузки API для импорта каждые {PUBLISH_INTERVAL:g} сек',
+    max_instances=1,
+    coalesce=True,
+    replace_existing=True
+)
+
+scheduler.add_job(
+    func=refresh_health_stats,
+    trigger=IntervalTrigger(minutes=HEALTH_STATS_INTERVAL_MINUTES),
+    id='health_stats',
+    name=f'Снимок статистики для /health каждые {HEALTH_STATS_INTERVAL_MINUTES} минут',
+    max_instances=1,
+    coalesce=True,
+    replace_existing=True
+)
+
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: сервер подготовлен (пул, схема, кэш) и пул выдает рабочие соединения"""
+    with readiness_lock:
+        state = dict(readiness_state, steps=dict(readiness_state['steps']))
+    if not state['ready']:
+        return JSONResponse(status_code=503, content=dict(state, status="starting"))
+    ping = ping_db_pool()
+    state['database'] = {'ok': ping['ok'], 'latency_ms': ping['latency_ms'], 'error': ping['error']}
+    if not ping['ok']:
+        return JSONResponse(status_code=503, content=dict(state, status="degraded"), headers={'Cache-Control': 'no-store'})
+    return dict(state, status="ready")
+
+@app.get("/health")
+def health_check():
+    """Общее состояние: проверка пула (кэшируется) и снимок статистики данных
+
+    Статистика обновляется планировщиком раз в HEALTH_STATS_INTERVAL_MINUTES минут,
+    поэтому частые пробы (Docker, nginx) не сканируют access_logs.
+    """
+    ping = ping_db_pool()
+    if not ping['ok']:
+        raise HTTPException(status_code=503, detail=f"Проблемы с системой: {ping['error']}")
+    with health_lock:
+        stats = dict(health_stats)
+    return {
+        "status": "healthy",
+        "database": "connected",
+        "data": stats['data'],
+        "data_refreshed_at": stats['refreshed_at'],
+        "modules": {
+            "smart_lunch_analyzer": "active",
+            "dashboard": "active",
+            "api": "active"
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/employee-exceptions")
 async def get_employee_exceptions():
     """Получить все исключения сотрудников"""
@@ -278,6 +765,20 @@ async def limit_upload_size(request: Request, call_next):
     response = await call_next(request)
     return response
 
+# Отчетные запросы, по длительности которых подстраивается скорость записи импорта
+REPORT_PATH_PREFIXES = (
+    '/dashboard', '/employee-schedule', '/employee-history', '/svod-report', '/employees-list'
+)
+
+@app.middleware("http")
+async def observe_report_latency(request: Request, call_next):
+    if request.method != "GET" or not request.url.path.startswith(REPORT_PATH_PREFIXES):
+        return await call_next(request)
+    started = time.time()
+    response = await call_next(request)
+    get_throttle().observe_report_latency((time.time() - started) * 1000)
+    return response
+
 # Конфигурация для JWT
 SECRET_KEY = "your-secret-key-change-in-production"  # В продакшене использовать переменную окружения
 ALGORITHM = "HS256"
@@ -363,81 +864,6 @@ class UpdateFullNameByName(BaseModel):
     full_name: str
     full_name_expanded: str
 
-def create_employee_exceptions_table():
-    """Создает таблицу исключений для сотрудников, если её нет"""
-    try:
-        conn = get_db_connection()
-        if not conn:
-            print("Ошибка: не удалось получить соединение с БД")
-            return False
-    except Exception as e:
-        print(f"Ошибка создания таблицы исключений: {e}")
-        return False
-        execute_query(conn, """
-            CREATE TABLE IF NOT EXISTS employee_exceptions (
-                id SERIAL PRIMARY KEY,
-                employee_id INTEGER NOT NULL,
-                exception_date DATE NOT NULL,
-                reason TEXT NOT NULL,
-                exception_type TEXT DEFAULT 'no_lateness_check',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_by TEXT DEFAULT 'system',
-                FOREIGN KEY (employee_id) REFERENCES employees (id),
-                UNIQUE(employee_id, exception_date)
-            )
-        """)
-        execute_query(conn, """
-            CREATE INDEX IF NOT EXISTS idx_employee_exceptions_date 
-            ON employee_exceptions (employee_id, exception_date)
-        """)
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Ошибка создания таблицы исключений: {e}")
-        return False
-
-def create_auth_tables():
-    """Создает таблицы для системы авторизации"""
-    try:
-        conn = get_db_connection()
-        # Только PostgreSQL
-        execute_query(conn, """
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                full_name VARCHAR(100),
-                role INTEGER DEFAULT 3,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                created_by INTEGER,
-                FOREIGN KEY (created_by) REFERENCES users (id)
-            )
-        """)
-
-        execute_query(conn, """
-            CREATE TABLE IF NOT EXISTS roles (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(50) UNIQUE NOT NULL,
-                description TEXT,
-                permissions TEXT
-            )
-        """)
-
-        execute_query(conn, """
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                token_hash TEXT NOT NULL,
-                expires_at TIMESTAMP NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
-    except Exception as e:
-        print(f"Ошибка создания таблиц авторизации: {e}")
 def generate_simple_token():
     """Генерирует простой токен для авторизации"""
     try:
@@ -553,6 +979,7 @@ async def add_whitelist_department(
     """Добавить бесконечное исключение для службы (отдела)"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         # Проверяем, есть ли уже исключение
         cursor.execute("SELECT id FROM whitelist_departments WHERE department_id = %s", (department_id,))
@@ -567,8 +994,10 @@ async def add_whitelist_department(
                 INSERT INTO whitelist_departments (department_id, reason, exception_type, is_permanent)
                 VALUES (%s, %s, %s, %s)
             """, (department_id, reason, exception_type, is_permanent))
+        attendance_changed(cursor)
         conn.commit()
         conn.close()
+        invalidate_reference_cache('whitelist')
         return {"message": "Исключение для службы добавлено"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка добавления исключения: {str(e)}")
@@ -603,144 +1032,21 @@ async def delete_whitelist_department(department_id: int, current_user: dict = D
     """Удалить бесконечное исключение для службы (отдела)"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         cursor.execute("DELETE FROM whitelist_departments WHERE department_id = %s", (department_id,))
         deleted_count = cursor.rowcount
+        attendance_changed(cursor)
         conn.commit()
         conn.close()
+        invalidate_reference_cache('whitelist')
         return {"message": "Исключение для службы удалено", "deleted": deleted_count > 0}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка удаления исключения: {str(e)}")
 
 # ...existing code...
 
-# Инициализация таблиц при запуске
-
-def create_department_positions_table():
-    """Создает таблицу связей отдел-должность, если её нет"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS department_positions (
-                id SERIAL PRIMARY KEY,
-                department_id INTEGER NOT NULL REFERENCES departments(id),
-                position_id INTEGER NOT NULL REFERENCES positions(id),
-                UNIQUE(department_id, position_id)
-            )
-        """)
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Ошибка создания таблицы department_positions: {e}")
-
-def create_svod_report_employees_table():
-    """Создание таблицы для хранения списка сотрудников в своде ТРК"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS svod_report_employees (
-                id SERIAL PRIMARY KEY,
-                employee_id INTEGER NOT NULL UNIQUE REFERENCES employees(id) ON DELETE CASCADE,
-                order_index INTEGER DEFAULT 0,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Добавляем колонку order_index, если таблица уже существует без неё
-        try:
-            cursor.execute("ALTER TABLE svod_report_employees ADD COLUMN order_index INTEGER DEFAULT 0")
-        except Exception:
-            # Колонка уже существует, это нормально
-            pass
-        
-        # Добавляем колонку position_override для хранения должности без сотрудника
-        try:
-            cursor.execute("ALTER TABLE svod_report_employees ADD COLUMN position_override VARCHAR(255)")
-        except Exception:
-            # Колонка уже существует
-            pass
-        
-        # Добавляем колонку report_date для привязки к дате
-        try:
-            cursor.execute("ALTER TABLE svod_report_employees ADD COLUMN report_date DATE DEFAULT CURRENT_DATE")
-        except Exception:
-            # Колонка уже существует
-            pass
-        
-        # Делаем report_date опциональным (может быть NULL, так как свод общий для всех дат)
-        try:
-            cursor.execute("ALTER TABLE svod_report_employees ALTER COLUMN report_date DROP NOT NULL")
-            cursor.execute("ALTER TABLE svod_report_employees ALTER COLUMN report_date DROP DEFAULT")
-        except Exception:
-            # Уже изменено
-            pass
-        
-        # Делаем employee_id опциональным (может быть NULL для записей с только должностью)
-        try:
-            cursor.execute("ALTER TABLE svod_report_employees ALTER COLUMN employee_id DROP NOT NULL")
-        except Exception:
-            # Уже изменено
-            pass
-        
-        # Удаляем старый unique constraint на employee_id, если он есть
-        try:
-            cursor.execute("ALTER TABLE svod_report_employees DROP CONSTRAINT IF EXISTS svod_report_employees_employee_id_key")
-        except Exception:
-            pass
-        
-        # Примечание: svod_id = id (первичный ключ таблицы), используется в запросах как алиас
-            
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Ошибка создания таблицы svod_report_employees: {e}")
-
-def add_departments_priority_column():
-    """Добавляет колонку priority в таблицу departments, если её нет"""
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT
-        )
-        cursor = conn.cursor()
-        
-        # Добавляем колонку priority для кастомной сортировки служб
-        try:
-            cursor.execute("ALTER TABLE departments ADD COLUMN priority INTEGER")
-            print("Колонка priority добавлена в таблицу departments")
-        except Exception:
-            # Колонка уже существует
-            pass
-        
-        # Создаем индекс для оптимизации сортировки
-        try:
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_departments_priority ON departments(priority)")
-            print("Индекс idx_departments_priority создан")
-        except Exception:
-            # Индекс уже существует
-            pass
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Ошибка добавления колонки priority: {e}")
-
-@app.on_event("startup")
-async def startup_event():
-    """Инициализация при запуске приложения"""
-    create_employee_exceptions_table()
-    create_auth_tables()
-    create_department_positions_table()
-    create_whitelist_departments_table()
-    add_departments_priority_column()
-    create_svod_report_employees_table()
-    # update_employees_table()  # Функция не определена, убрано для предотвращения ошибки
-    create_initial_admin()
+# Схема БД создается и обновляется миграциями (migrations.py) при старте
 
 # ================================
 # АУТЕНТИФИКАЦИЯ И АВТОРИЗАЦИЯ
@@ -1110,6 +1416,39 @@ async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
 # ================================
     print("✅ Таблица исключений сотрудников инициализирована")
 
+@app.get("/data-calendar")
+def get_data_calendar(
+    start_date: Optional[str] = Query(None, description="Начало периода (ГГГГ-ММ-ДД)"),
+    end_date: Optional[str] = Query(None, description="Конец периода (ГГГГ-ММ-ДД)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Календарь дней с данными из data_catalog: записи, сотрудники, первое/последнее событие, файлы"""
+    try:
+        start_day = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_day = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Дата должна быть в формате ГГГГ-ММ-ДД")
+    try:
+        conn = get_db_connection()
+        try:
+            days = data_catalog.calendar(conn, start_day, end_day)
+            latest_day = data_catalog.latest_day(conn)
+        finally:
+            conn.close()
+        return FastJSONResponse({
+            "latest_date": latest_day.isoformat() if latest_day else None,
+            "days": [{
+                "date": day['day'].isoformat(),
+                "records": day['row_count'],
+                "employees": day['employee_count'],
+                "first_event": day['first_event'].isoformat(),
+                "last_event": day['last_event'].isoformat(),
+                "source_files": day['source_files']
+            } for day in days]
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка получения календаря данных: {str(e)}")
+
 @app.get("/employee-schedule")
 async def get_employee_schedule(
     date: Optional[str] = Query(None), 
@@ -1123,14 +1462,11 @@ async def get_employee_schedule(
     try:
         if date is None:
             conn = get_db_connection()
-            
-            latest_date = execute_query(
-                conn,
-                "SELECT DISTINCT DATE(access_datetime) as access_date FROM access_logs ORDER BY access_date DESC LIMIT 1",
-                fetch_one=True
-            )
-            date = latest_date['access_date'] if latest_date else datetime.today().strftime('%Y-%m-%d')
-            conn.close()
+            try:
+                latest_day = data_catalog.latest_day(conn)
+            finally:
+                conn.close()
+            date = latest_day.isoformat() if latest_day else datetime.today().strftime('%Y-%m-%d')
         
         conn = get_db_connection()
         
@@ -1146,26 +1482,22 @@ async def get_employee_schedule(
             ORDER BY al.employee_id, al.access_datetime
             """,
             (date,),
-            fetch_all=True
+            row='namedtuple',
+            iterate=True
         )
 
-        # Получаем все whitelist_departments для быстрого доступа
-        whitelist_rows = execute_query(
-            conn,
-            "SELECT department_id, reason, exception_type FROM whitelist_departments",
-            fetch_all=True
-        )
-        whitelist_map = {row['department_id']: {'reason': row['reason'], 'type': row['exception_type']} for row in whitelist_rows}
+        # Получаем все whitelist_departments для быстрого доступа (из кэша справочников)
+        whitelist_map = {row[0]: {'reason': row[1], 'type': row[2]} for row in get_whitelist_rows()}
 
-        # Группируем по сотрудникам
+        # Группируем по сотрудникам (строки читаются пачками, без промежуточного списка)
         employees_dict = {}
         for log in all_logs:
-            employee_id = log['employee_id']
-            full_name = log['full_name']
-            full_name_expanded = log.get('full_name_expanded')
-            department_id = log['department_id']
-            access_time = log['access_time']
-            door_location = log['door_location']
+            employee_id = log.employee_id
+            full_name = log.full_name
+            full_name_expanded = log.full_name_expanded
+            department_id = log.department_id
+            access_time = log.access_time
+            door_location = log.door_location
             
             if employee_id not in employees_dict:
                 employees_dict[employee_id] = {
@@ -1182,14 +1514,7 @@ async def get_employee_schedule(
             else:
                 employees_dict[employee_id]['entries'].append((access_time, door_location))
         
-        dept_names_map = {}
-        dept_rows = execute_query(
-            conn,
-            "SELECT id, name FROM departments",
-            fetch_all=True
-        )
-        for row in dept_rows:
-            dept_names_map[row['id']] = row['name']
+        dept_names_map = get_departments_map()
         
         employees_schedule = []
         work_start_time = datetime.strptime('09:00:00', '%H:%M:%S').time()
@@ -1330,7 +1655,7 @@ async def get_employee_schedule(
         
         conn.close()
         
-        return {
+        return FastJSONResponse({
             'date': date,
             'employees': paginated_employees,
             'total_count': total_count,
@@ -1338,13 +1663,181 @@ async def get_employee_schedule(
             'page': page,
             'per_page': per_page,
             'total_pages': (total_count + per_page - 1) // per_page
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения расписания: {str(e)}")
 
+# Строк (сотрудник, день) за одно обращение к серверному курсору
+SCHEDULE_RANGE_ITERSIZE = 2000
+
+# Первый вход и последний выход сотрудника за каждый день периода вместе с дверью
+# (при равном времени - первая/последняя по имени, как min/max кортежей (время, дверь))
+# и личным исключением на этот день. Порядок сотрудников - по кодам символов ФИО.
+# Событие без двери (NULL) считается входом, как в attendance_daily.
+SCHEDULE_RANGE_SQL = f"""
+    WITH day_logs AS (
+        SELECT employee_id, DATE(access_datetime) AS access_date,
+               TO_CHAR(access_datetime, 'HH24:MI:SS') COLLATE "C" AS access_time,
+               door_location COLLATE "C" AS door_location,
+               COALESCE({exit_condition('door_location')} OR LOWER(door_location) LIKE '%%exit%%', FALSE) AS is_exit
+        FROM access_logs
+        WHERE access_datetime >= %(start)s AND access_datetime < %(end)s
+    )
+    SELECT e.id, e.full_name, e.full_name_expanded, e.department_id, dl.access_date,
+           MIN(dl.access_time) FILTER (WHERE NOT dl.is_exit) AS first_entry,
+           (ARRAY_AGG(dl.door_location ORDER BY dl.access_time, dl.door_location)
+               FILTER (WHERE NOT dl.is_exit))[1] AS first_entry_door,
+           MAX(dl.access_time) FILTER (WHERE dl.is_exit) AS last_exit,
+           (ARRAY_AGG(dl.door_location ORDER BY dl.access_time DESC, dl.door_location DESC)
+               FILTER (WHERE dl.is_exit))[1] AS last_exit_door,
+           ee.reason, ee.exception_type
+    FROM day_logs dl
+    JOIN employees e ON e.id = dl.employee_id
+    LEFT JOIN employee_exceptions ee ON ee.employee_id = e.id AND ee.exception_date = dl.access_date
+    WHERE e.is_active = TRUE
+    AND e.full_name <> ALL(%(excluded)s)
+    AND (%(department_ids)s::int[] IS NULL OR e.department_id = ANY(%(department_ids)s::int[]))
+    GROUP BY e.id, e.full_name, e.full_name_expanded, e.department_id, dl.access_date, ee.reason, ee.exception_type
+    ORDER BY e.full_name COLLATE "C", dl.access_date
+"""
+
+def seconds_of(value):
+    """Секунды от полуночи для datetime.time"""
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+def hhmm(seconds):
+    return f"{int(seconds // 3600):02d}:{int((seconds % 3600) // 60):02d}"
+
+def text_seconds(value):
+    """Секунды от полуночи для строки ЧЧ:ММ:СС"""
+    hours, minutes, seconds = value.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+def parse_department_ids(department_ids):
+    """ID отделов из строки через запятую; некорректная строка - без фильтра (None)"""
+    if not department_ids:
+        return None
+    try:
+        dept_ids = [int(dept_id.strip()) for dept_id in department_ids.split(',') if dept_id.strip()]
+    except ValueError:
+        return None  # Игнорируем некорректные ID отделов
+    return dept_ids or None
+
+def schedule_day(access_date, first_entry, first_entry_door, last_exit, last_exit_door,
+                 exception_data, department_exception):
+    """День расписания за период: опоздание с учетом исключений, часы работы и статус"""
+    is_late = False
+    late_minutes = 0
+    exception_info = None
+    work_hours = None
+    entry_seconds = text_seconds(first_entry) if first_entry else None
+    if first_entry and last_exit:
+        exit_seconds = text_seconds(last_exit)
+        if exit_seconds > entry_seconds:
+            work_hours = (exit_seconds - entry_seconds) / 3600
+    if first_entry and entry_seconds > seconds_of(LATE_AFTER):
+        # Опоздал физически - проверяем исключения: личное, затем отдела
+        if exception_data and exception_data[1] == 'no_lateness_check':
+            exception_info = {'has_exception': True, 'reason': exception_data[0], 'type': exception_data[1]}
+        elif department_exception and department_exception['type'] == 'no_lateness_check':
+            exception_info = {'has_exception': True, 'reason': department_exception['reason'],
+                              'type': department_exception['type']}
+        else:
+            is_late = True
+            late_minutes = int((entry_seconds - seconds_of(LATE_AFTER)) / 60)
+    # Если пришёл вовремя - исключения не показываем (exception_info остается None)
+    return {
+        'date': access_date.strftime('%Y-%m-%d'),
+        'first_entry': first_entry,
+        'last_exit': last_exit,
+        'first_entry_door': first_entry_door,
+        'last_exit_door': last_exit_door,
+        'is_late': is_late,
+        'late_minutes': late_minutes,
+        'work_hours': work_hours,
+        'status': get_employee_status(is_late, first_entry, exception_info),
+        'exception': exception_info
+    }
+
+def iter_schedule_range(conn, start_dt, end_dt, search=None, dept_ids=None):
+    """Сотрудники с днями за период по одному, по мере чтения из БД
+
+    Строки читаются серверным курсором пачками по SCHEDULE_RANGE_ITERSIZE, поэтому
+    в памяти только текущий сотрудник. Общая основа /employee-schedule-range и выгрузки.
+    """
+    dept_names_map = get_departments_map()
+    whitelist_map = {row[0]: {'reason': row[1], 'type': row[2]} for row in get_whitelist_rows()}
+    search_lower = search.strip().lower() if search and search.strip() else None
+
+    rows = execute_query(conn, SCHEDULE_RANGE_SQL, {
+        'start': datetime.combine(start_dt, datetime.min.time()),
+        'end': datetime.combine(end_dt, datetime.min.time()) + timedelta(days=1),
+        'excluded': EXCLUDED_NAMES,
+        'department_ids': dept_ids
+    }, row='tuple', iterate=True, server_side=True, fetch_size=SCHEDULE_RANGE_ITERSIZE)
+    employee = None
+    try:
+        for (emp_id, emp_name, emp_name_expanded, department_id, access_date, first_entry, first_entry_door,
+             last_exit, last_exit_door, exception_reason, exception_type) in rows:
+            if search_lower and search_lower not in emp_name.lower():
+                continue
+            if employee is None or employee['employee_id'] != emp_id:
+                if employee is not None:
+                    yield employee
+                employee = {
+                    'employee_id': emp_id,
+                    'full_name': emp_name,
+                    'full_name_expanded': emp_name_expanded,
+                    'department_id': department_id,
+                    'department_name': dept_names_map.get(department_id, None),
+                    'days': []
+                }
+            exception_data = (exception_reason, exception_type) if exception_reason is not None else None
+            employee['days'].append(schedule_day(access_date, first_entry, first_entry_door, last_exit,
+                                                 last_exit_door, exception_data, whitelist_map.get(department_id)))
+        if employee is not None:
+            yield employee
+    finally:
+        rows.close()
+
+def parse_schedule_range(start_date, end_date):
+    """Проверка периода расписания: (начало, конец) или HTTP 400"""
+    try:
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Дата должна быть в формате ГГГГ-ММ-ДД")
+    if start_dt > end_dt:
+        raise HTTPException(status_code=400, detail="Начальная дата не может быть позже конечной")
+    if (end_dt - start_dt).days > 365:
+        raise HTTPException(status_code=400, detail="Максимальный диапазон - 365 дней")
+    return start_dt, end_dt
+
+def schedule_range_payload(employees_with_days, start_date, end_date, page, per_page):
+    """Ответ /employee-schedule-range: страница сотрудников и итоги по всему периоду"""
+    # Применяем пагинацию (по сотрудникам, а не по дням)
+    total_count = len(employees_with_days)
+    start_idx = (page - 1) * per_page
+    end_idx = start_idx + per_page
+    paginated_employees = employees_with_days[start_idx:end_idx]
+
+    # Считаем общее количество опозданий
+    late_count = sum(1 for emp in employees_with_days for day in emp['days'] if day['is_late'])
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'employees': paginated_employees,
+        'total_count': total_count,
+        'late_count': late_count,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': (total_count + per_page - 1) // per_page
+    }
+
 @app.get("/employee-schedule-range")
-async def get_employee_schedule_range(
+def get_employee_schedule_range(
     start_date: str = Query(...), 
     end_date: str = Query(...),
     page: int = Query(1, ge=1, description="Номер страницы"),
@@ -1354,343 +1847,268 @@ async def get_employee_schedule_range(
     current_user: dict = Depends(get_current_user)
 ):
     """Расписание всех сотрудников за диапазон дат с детализацией по дням"""
-    from datetime import datetime, timedelta
+    start_dt, end_dt = parse_schedule_range(start_date, end_date)
     try:
-        # Валидация дат
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
-        if start_dt > end_dt:
-            raise HTTPException(status_code=400, detail="Начальная дата не может быть позже конечной")
-        if (end_dt - start_dt).days > 365:
-            raise HTTPException(status_code=400, detail="Максимальный диапазон - 365 дней")
-
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Получаем имена отделов для всех department_id
-        cursor.execute("SELECT id, name FROM departments")
-        dept_names_map = {row[0]: row[1] for row in cursor.fetchall()}
-        cursor.execute("""
-            SELECT DISTINCT e.id, e.full_name, e.full_name_expanded
-            FROM employees e
-            INNER JOIN access_logs al ON e.id = al.employee_id
-            WHERE e.is_active = TRUE
-            AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-            AND DATE(al.access_datetime) BETWEEN %s AND %s
-            ORDER BY e.full_name
-        """, (start_date, end_date))
-        employees = cursor.fetchall()
-
-        employees_with_days = []
-        total_late_count = 0
-
-        # Получаем department_id для всех сотрудников
-        cursor.execute("SELECT id, department_id FROM employees")
-        emp_dept_map = {row[0]: row[1] for row in cursor.fetchall()}
-        # Получаем все whitelist_departments
-        cursor.execute("SELECT department_id, reason, exception_type FROM whitelist_departments")
-        whitelist_map = {row[0]: {'reason': row[1], 'type': row[2]} for row in cursor.fetchall()}
-
-        for emp_id, emp_name, emp_name_expanded in employees:
-            employee_days = []
-            department_id = emp_dept_map.get(emp_id)
-            department_name = dept_names_map.get(department_id, None)
-            current_date = start_dt
-            while current_date <= end_dt:
-                date_str = current_date.strftime('%Y-%m-%d')
-                cursor.execute("""
-                    SELECT TO_CHAR(access_datetime, 'HH24:MI:SS') as access_time, door_location
-                    FROM access_logs
-                    WHERE employee_id = %s AND DATE(access_datetime) = %s
-                    ORDER BY access_datetime ASC
-                """, (emp_id, date_str))
-                day_logs = cursor.fetchall()
-                if day_logs:
-                    entries = []
-                    exits = []
-                    for access_time, door_location in day_logs:
-                        if 'выход' in door_location.lower() or 'exit' in door_location.lower():
-                            exits.append((access_time, door_location))
-                        else:
-                            entries.append((access_time, door_location))
-                    first_entry = min(entries)[0] if entries else None
-                    first_entry_door = min(entries)[1] if entries else None
-                    last_exit = max(exits)[0] if exits else None
-                    last_exit_door = max(exits)[1] if exits else None
-                    is_late = False
-                    late_minutes = 0
-                    exception_info = None
-                    # Проверяем персональное исключение
-                    cursor.execute("""
-                        SELECT reason, exception_type
-                        FROM employee_exceptions
-                        WHERE employee_id = %s AND exception_date = %s
-                    """, (emp_id, date_str))
-                    exception_data = cursor.fetchone()
-                    department_exception = whitelist_map.get(department_id)
-                    work_hours = None
-                    if first_entry and last_exit:
-                        try:
-                            first_dt = datetime.strptime(first_entry, '%H:%M:%S')
-                            last_dt = datetime.strptime(last_exit, '%H:%M:%S')
-                            if last_dt > first_dt:
-                                work_duration = last_dt - first_dt
-                                work_hours = work_duration.total_seconds() / 3600
-                        except Exception:
-                            work_hours = None
-                    if first_entry:
-                        entry_time = datetime.strptime(first_entry, '%H:%M:%S').time()
-                        work_start = datetime.strptime('09:00:00', '%H:%M:%S').time()
-                        physically_late = entry_time > work_start
-                        
-                        if physically_late:
-                            # Если опоздал физически, проверяем есть ли исключение
-                            if (exception_data and exception_data[1] == 'no_lateness_check'):
-                                # Есть персональное исключение - не считаем опозданием
-                                is_late = False
-                                late_minutes = 0
-                                exception_info = {
-                                    'has_exception': True,
-                                    'reason': exception_data[0],
-                                    'type': exception_data[1]
-                                }
-                            elif (department_exception and department_exception['type'] == 'no_lateness_check'):
-                                # Есть исключение отдела - не считаем опозданием
-                                is_late = False
-                                late_minutes = 0
-                                exception_info = {
-                                    'has_exception': True,
-                                    'reason': department_exception['reason'],
-                                    'type': department_exception['type']
-                                }
-                            else:
-                                # Опоздал и нет исключения
-                                is_late = True
-                                entry_datetime = datetime.combine(current_date, entry_time)
-                                work_start_datetime = datetime.combine(current_date, work_start)
-                                late_minutes = int((entry_datetime - work_start_datetime).total_seconds() / 60)
-                                total_late_count += 1
-                        # Если пришёл вовремя - исключения не показываем (exception_info остается None)
-                    status = get_employee_status(is_late, first_entry, exception_info)
-                    # Ensure work_hours is always defined
-                    if 'work_hours' not in locals():
-                        work_hours = None
-                    day_data = {
-                        'date': date_str,
-                        'first_entry': first_entry,
-                        'last_exit': last_exit,
-                        'first_entry_door': first_entry_door,
-                        'last_exit_door': last_exit_door,
-                        'is_late': is_late,
-                        'late_minutes': late_minutes,
-                        'work_hours': work_hours,
-                        'status': status,
-                        'exception': exception_info
-                    }
-                    employee_days.append(day_data)
-                current_date += timedelta(days=1)
-            if employee_days:
-                employees_with_days.append({
-                    'employee_id': emp_id,
-                    'full_name': emp_name,
-                    'full_name_expanded': emp_name_expanded,
-                    'department_id': department_id,
-                    'department_name': department_name,
-                    'days': employee_days
-                })
-        # Сортируем по имени
-        employees_with_days.sort(key=lambda x: x['full_name'])
-        
-        # Применяем фильтрацию по поиску
-        if search and search.strip():
-            search_lower = search.strip().lower()
-            employees_with_days = [e for e in employees_with_days if search_lower in e['full_name'].lower()]
-        
-        # Применяем фильтрацию по отделам
-        if department_ids:
-            try:
-                dept_ids = [int(dept_id.strip()) for dept_id in department_ids.split(',') if dept_id.strip()]
-                if dept_ids:
-                    employees_with_days = [e for e in employees_with_days if e.get('department_id') in dept_ids]
-            except ValueError:
-                pass  # Игнорируем некорректные ID отделов
-        
-        # Применяем пагинацию (по сотрудникам, а не по дням)
-        total_count = len(employees_with_days)
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_employees = employees_with_days[start_idx:end_idx]
-        
-        # Считаем общее количество опозданий
-        late_count = 0
-        for emp in employees_with_days:
-            for day in emp['days']:
-                if day['is_late']:
-                    late_count += 1
-        
-        conn.close()
-        return {
-            'start_date': start_date,
-            'end_date': end_date,
-            'employees': paginated_employees,
-            'total_count': total_count,
-            'late_count': late_count,
-            'page': page,
-            'per_page': per_page,
-            'total_pages': (total_count + per_page - 1) // per_page
-        }
+        try:
+            employees_with_days = list(iter_schedule_range(conn, start_dt, end_dt, search,
+                                                           parse_department_ids(department_ids)))
+        finally:
+            conn.close()
+        return FastJSONResponse(schedule_range_payload(employees_with_days, start_date, end_date, page, per_page))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения расписания за период: {str(e)}")
 
+# Колонки выгрузки расписания за период: одна строка на сотрудника и день
+SCHEDULE_EXPORT_COLUMNS = [
+    'ФИО', 'Полное ФИО', 'Отдел', 'Дата', 'Приход', 'Дверь прихода', 'Уход', 'Дверь ухода',
+    'Часы работы', 'Опоздание, мин', 'Статус', 'Исключение'
+]
+
+# Размер куска при отдаче готового XLSX
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def schedule_export_rows(employees):
+    """Строки выгрузки из сотрудников iter_schedule_range - те же данные, что и в JSON"""
+    for employee in employees:
+        for day in employee['days']:
+            yield [
+                employee['full_name'],
+                employee['full_name_expanded'] or '',
+                employee['department_name'] or '',
+                day['date'],
+                day['first_entry'] or '',
+                day['first_entry_door'] or '',
+                day['last_exit'] or '',
+                day['last_exit_door'] or '',
+                round(day['work_hours'], 2) if day['work_hours'] is not None else '',
+                day['late_minutes'] if day['is_late'] else '',
+                day['status'],
+                day['exception']['reason'] if day['exception'] else ''
+            ]
+
+def stream_schedule_csv(conn, start_dt, end_dt, search, dept_ids):
+    """CSV по мере чтения из БД: кусок на сотрудника, соединение освобождается в конце"""
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        # BOM и ';' - чтобы Excel сразу открывал кириллицу по колонкам
+        buffer.write('\ufeff')
+        writer.writerow(SCHEDULE_EXPORT_COLUMNS)
+        for employee in iter_schedule_range(conn, start_dt, end_dt, search, dept_ids):
+            writer.writerows(schedule_export_rows([employee]))
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    finally:
+        conn.close()
+
+def build_schedule_xlsx(conn, start_dt, end_dt, search, dept_ids):
+    """XLSX во временном файле: write-only книга пишет строки на диск, а не в память"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Расписание')
+    sheet.append(SCHEDULE_EXPORT_COLUMNS)
+    for row in schedule_export_rows(iter_schedule_range(conn, start_dt, end_dt, search, dept_ids)):
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+def stream_file(output):
+    try:
+        while True:
+            chunk = output.read(EXPORT_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        output.close()
+
+@app.get("/employee-schedule-range/export")
+def export_employee_schedule_range(
+    start_date: str = Query(...),
+    end_date: str = Query(...),
+    format: str = Query('csv', pattern='^(csv|xlsx)$', description="csv или xlsx"),
+    search: Optional[str] = Query(None, description="Поиск по ФИО"),
+    department_ids: Optional[str] = Query(None, description="ID отделов через запятую"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Выгрузка расписания за период (те же данные, что /employee-schedule-range, без пагинации)
+
+    CSV отдается потоком по мере чтения из БД. XLSX собирается write-only книгой
+    во временном файле (архив можно отдать только целиком) и отдается кусками.
+    """
+    start_dt, end_dt = parse_schedule_range(start_date, end_date)
+    dept_ids = parse_department_ids(department_ids)
+    file_name = f"schedule_{start_dt}_{end_dt}.{format}"
+    headers = {'Content-Disposition': f'attachment; filename="{file_name}"'}
+    if format == 'csv':
+        conn = get_db_connection()
+        return StreamingResponse(stream_schedule_csv(conn, start_dt, end_dt, search, dept_ids),
+                                 media_type='text/csv; charset=utf-8', headers=headers)
+
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Для выгрузки XLSX нужен пакет openpyxl")
+    conn = get_db_connection()
+    try:
+        output = build_schedule_xlsx(conn, start_dt, end_dt, search, dept_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка выгрузки расписания: {str(e)}")
+    finally:
+        conn.close()
+    return StreamingResponse(
+        stream_file(output),
+        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        headers=headers
+    )
+
+def parse_id_list(value, name):
+    """ID через запятую из параметра запроса; некорректное значение - HTTP 400"""
+    if not value:
+        return None
+    try:
+        return [int(item.strip()) for item in value.split(',') if item.strip()] or None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name}: ожидаются ID через запятую")
+
+@app.get("/access-events/export")
+def export_access_events(
+    start_date: str = Query(..., description="Первый день (ГГГГ-ММ-ДД)"),
+    end_date: str = Query(..., description="Последний день (ГГГГ-ММ-ДД)"),
+    format: str = Query('ndjson', pattern='^(ndjson|csv)$', description="ndjson или csv"),
+    employee_ids: Optional[str] = Query(None, description="ID сотрудников через запятую"),
+    department_ids: Optional[str] = Query(None, description="ID отделов через запятую"),
+    doors: Optional[List[str]] = Query(None, description="Двери (точное название), параметр можно повторять"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Сырые события за период потоком (event_export): серверный курсор, память не зависит от периода"""
+    try:
+        start_day = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_day = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Дата должна быть в формате ГГГГ-ММ-ДД")
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="Начальная дата не может быть позже конечной")
+    filters = event_filters(start_day, end_day, parse_id_list(employee_ids, 'employee_ids'),
+                            parse_id_list(department_ids, 'department_ids'), doors)
+
+    conn = get_db_connection()
+
+    def chunks():
+        try:
+            yield from stream_events(conn, filters, format)
+        finally:
+            conn.close()
+
+    media_type = 'text/csv; charset=utf-8' if format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(chunks(), media_type=media_type, headers={
+        'Content-Disposition': f'attachment; filename="access_events_{start_day}_{end_day}.{format}"'
+    })
+
 @app.get("/employee-history/{employee_id}")
-async def get_employee_history(
+def get_employee_history(
     employee_id: int, 
-    days_back: int = Query(365, description="Количество дней назад для анализа")
+    days_back: int = Query(365, ge=0, description="Количество дней назад для анализа")
 ):
-    """История посещений конкретного сотрудника за период"""
-    from datetime import date, timedelta, datetime
+    """История посещений конкретного сотрудника за период
+
+    Приход и уход по дням считаются в БД (report_queries.employee_history),
+    поэтому ответ зависит от числа дней, а не событий. Посещаемость - доля рабочих
+    дней (будни, за которые в data_catalog есть данные), в которые сотрудник
+    приходил, начиная с его первого дня в периоде.
+    """
     try:
         end_date = date.today()
         start_date = end_date - timedelta(days=days_back)
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT full_name FROM employees WHERE id = %s", (employee_id,))
-        employee_result = cursor.fetchone()
-        if not employee_result:
-            raise HTTPException(status_code=404, detail="Сотрудник не найден")
-        employee_name = employee_result[0]
-        
-        # Получаем все записи сотрудника за период
-        cursor.execute("""
-            SELECT DATE(access_datetime) as access_date, TO_CHAR(access_datetime, 'HH24:MI:SS') as access_time, door_location
-            FROM access_logs
-            WHERE employee_id = %s 
-            AND DATE(access_datetime) BETWEEN %s AND %s
-            ORDER BY access_datetime
-        """, (employee_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        all_records = cursor.fetchall()
-        daily_data = {}
-        for access_date, access_time, door_location in all_records:
-            if access_date not in daily_data:
-                daily_data[access_date] = {'entries': [], 'exits': []}
-            if door_location and 'выход' in door_location.lower():
-                daily_data[access_date]['exits'].append((access_time, door_location))
-            else:
-                daily_data[access_date]['entries'].append((access_time, door_location))
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT full_name, department_id FROM employees WHERE id = %s", (employee_id,))
+            employee_result = cursor.fetchone()
+            if not employee_result:
+                raise HTTPException(status_code=404, detail="Сотрудник не найден")
+            employee_name, department_id = employee_result
 
-        # Получаем department_id сотрудника
-        cursor.execute("SELECT department_id FROM employees WHERE id = %s", (employee_id,))
-        dept_row = cursor.fetchone()
-        department_id = dept_row[0] if dept_row else None
+            days = employee_history(conn, PostgresDialect(), employee_id, start_date, end_date)
 
-        # Получаем whitelist_departments
-        cursor.execute("SELECT department_id, reason, exception_type FROM whitelist_departments")
-        whitelist_map = {row[0]: {'reason': row[1], 'exception_type': row[2]} for row in cursor.fetchall()}
+            # Персональные исключения
+            cursor.execute("""
+                SELECT exception_date, reason, exception_type
+                FROM employee_exceptions 
+                WHERE employee_id = %s 
+                AND exception_date BETWEEN %s AND %s
+            """, (employee_id, start_date, end_date))
+            exceptions_data = {exc_date: {'reason': reason, 'exception_type': exc_type}
+                               for exc_date, reason, exc_type in cursor.fetchall()}
+
+            workdays = data_catalog.workdays(conn, days[0]['date'], end_date) if days else 0
+        finally:
+            conn.close()
 
-        # Получаем персональные исключения
-        cursor.execute("""
-            SELECT exception_date, reason, exception_type
-            FROM employee_exceptions 
-            WHERE employee_id = %s 
-            AND exception_date BETWEEN %s AND %s
-        """, (employee_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        exceptions_data = {}
-        for exc_date, reason, exc_type in cursor.fetchall():
-            exceptions_data[exc_date] = {
-                'reason': reason,
-                'exception_type': exc_type
-            }
+        # Исключение отдела (whitelist_departments)
+        whitelist_map = {row[0]: {'reason': row[1], 'exception_type': row[2]} for row in get_whitelist_rows()}
+        dept_exception_info = whitelist_map.get(department_id)
+
+        work_start = seconds_of(LATE_AFTER)
         daily_records = []
         total_late_days = 0
-        work_start_time = datetime.strptime('09:00:00', '%H:%M:%S').time()
         total_work_hours = 0
         valid_work_days = 0
-        for date_str in sorted(daily_data.keys()):
-            day_data = daily_data[date_str]
-            first_entry = min(day_data['entries'])[0] if day_data['entries'] else None
-            last_exit = max(day_data['exits'])[0] if day_data['exits'] else None
-            # Проверяем персональное исключение
-            has_personal_exception = date_str in exceptions_data
-            personal_exception_info = exceptions_data.get(date_str, None)
-            # Проверяем whitelist исключение отдела
-            dept_exception_info = whitelist_map.get(department_id)
-            has_dept_exception = dept_exception_info is not None
-
-            # Если есть персональное исключение, оно приоритетнее
-            if has_personal_exception:
-                has_exception = True
-                exception_info = personal_exception_info
-            elif has_dept_exception:
-                has_exception = True
-                exception_info = dept_exception_info
-            else:
-                has_exception = False
-                exception_info = None
-
-            is_late = False
-            if first_entry and not has_exception:
-                try:
-                    entry_time = datetime.strptime(first_entry, '%H:%M:%S').time()
-                    if entry_time > work_start_time:
-                        is_late = True
-                        total_late_days += 1
-                except Exception:
-                    pass
+        present_workdays = 0
+        entry_seconds = []
+        exit_seconds = []
+        for day in days:
+            first_entry = seconds_of(day['first_entry']) if day['first_entry'] else None
+            last_exit = seconds_of(day['last_exit']) if day['last_exit'] else None
+            # Персональное исключение приоритетнее исключения отдела
+            exception_info = exceptions_data.get(day['date'], dept_exception_info)
+            has_exception = exception_info is not None
+
+            is_late = first_entry is not None and not has_exception and first_entry > work_start
+            total_late_days += is_late
             work_hours = None
-            if first_entry and last_exit:
-                try:
-                    entry_datetime = datetime.strptime(first_entry, '%H:%M:%S')
-                    exit_datetime = datetime.strptime(last_exit, '%H:%M:%S')
-                    work_duration = exit_datetime - entry_datetime
-                    work_hours = work_duration.total_seconds() / 3600
-                    if work_hours > 0:
-                        total_work_hours += work_hours
-                        valid_work_days += 1
-                except Exception:
-                    pass
+            if first_entry is not None and last_exit is not None:
+                work_hours = (last_exit - first_entry) / 3600
+                if work_hours > 0:
+                    total_work_hours += work_hours
+                    valid_work_days += 1
+            if first_entry is not None:
+                entry_seconds.append(first_entry)
+            if last_exit is not None:
+                exit_seconds.append(last_exit)
+            if day['date'].weekday() < 5:
+                present_workdays += 1
             daily_records.append({
-                'date': date_str,
-                'first_entry': first_entry,
-                'last_exit': last_exit,
+                'date': day['date'],
+                'first_entry': day['first_entry'].strftime('%H:%M:%S') if day['first_entry'] else None,
+                'last_exit': day['last_exit'].strftime('%H:%M:%S') if day['last_exit'] else None,
                 'work_hours': work_hours,
                 'is_late': is_late,
                 'has_exception': has_exception,
                 'exception_info': exception_info
             })
         total_days = len(daily_records)
-        punctuality_rate = ((total_days - total_late_days) / total_days * 100) if total_days > 0 else 0
-        avg_work_hours = total_work_hours / valid_work_days if valid_work_days > 0 else None
-        all_entries = [rec['first_entry'] for rec in daily_records if rec['first_entry']]
-        all_exits = [rec['last_exit'] for rec in daily_records if rec['last_exit']]
-        avg_arrival_time = None
-        avg_departure_time = None
-        if all_entries:
-            try:
-                times = [datetime.strptime(t, '%H:%M:%S') for t in all_entries]
-                avg_seconds = sum(t.hour * 3600 + t.minute * 60 + t.second for t in times) / len(times)
-                avg_arrival_time = f"{int(avg_seconds // 3600):02d}:{int((avg_seconds % 3600) // 60):02d}"
-            except Exception:
-                pass
-        if all_exits:
-            try:
-                times = [datetime.strptime(t, '%H:%M:%S') for t in all_exits]
-                avg_seconds = sum(t.hour * 3600 + t.minute * 60 + t.second for t in times) / len(times)
-                avg_departure_time = f"{int(avg_seconds // 3600):02d}:{int((avg_seconds % 3600) // 60):02d}"
-            except Exception:
-                pass
-        conn.close()
-        return {
+        return FastJSONResponse({
             "employee_name": employee_name,
             "total_days": total_days,
-            "attendance_rate": 100.0,
-            "punctuality_rate": punctuality_rate,
-            "avg_arrival_time": avg_arrival_time,
-            "avg_departure_time": avg_departure_time,
-            "avg_work_hours": avg_work_hours,
+            "attendance_rate": round(min(present_workdays, workdays) / workdays * 100, 1) if workdays else 0.0,
+            "punctuality_rate": ((total_days - total_late_days) / total_days * 100) if total_days > 0 else 0,
+            "avg_arrival_time": hhmm(sum(entry_seconds) / len(entry_seconds)) if entry_seconds else None,
+            "avg_departure_time": hhmm(sum(exit_seconds) / len(exit_seconds)) if exit_seconds else None,
+            "avg_work_hours": total_work_hours / valid_work_days if valid_work_days > 0 else None,
             "daily_records": daily_records
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения истории сотрудника: {str(e)}")
 
@@ -1806,6 +2224,7 @@ async def update_employee_full_name_by_name(data: UpdateFullNameByName):
             raise HTTPException(status_code=400, detail="full_name обязателен")
         
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Обновляем полное ФИО по короткому имени
@@ -1819,6 +2238,8 @@ async def update_employee_full_name_by_name(data: UpdateFullNameByName):
         if cursor.rowcount == 0:
             conn.close()
             raise HTTPException(status_code=404, detail="Сотрудник не найден")
+        updated_count = cursor.rowcount
+        attendance_changed(cursor)
         
         conn.commit()
         conn.close()
@@ -1827,7 +2248,7 @@ async def update_employee_full_name_by_name(data: UpdateFullNameByName):
             'success': True,
             'full_name': full_name,
             'full_name_expanded': full_name_expanded,
-            'updated_count': cursor.rowcount
+            'updated_count': updated_count
         }
         
     except HTTPException:
@@ -1847,6 +2268,7 @@ async def update_employee_full_name(employee_id: int, data: dict):
         full_name_expanded = data.get('full_name_expanded', '').strip()
         
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Проверяем существование сотрудника
@@ -1862,6 +2284,7 @@ async def update_employee_full_name(employee_id: int, data: dict):
                 updated_at = CURRENT_TIMESTAMP
             WHERE id = %s
         """, (full_name_expanded if full_name_expanded else None, employee_id))
+        attendance_changed(cursor)
         
         conn.commit()
         conn.close()
@@ -1885,6 +2308,7 @@ async def update_employee(employee_id: int, updates: dict, current_user: dict =
     """Обновление данных сотрудника (для superadmin и выше)"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Проверяем существование сотрудника
@@ -1913,6 +2337,8 @@ async def update_employee(employee_id: int, updates: dict, current_user: dict =
             UPDATE employees SET {', '.join(update_fields)}
             WHERE id = %s
         """, update_values)
+        # ФИО, день рождения, отдел и активность входят в итоги посещаемости
+        attendance_changed(cursor)
         
         conn.commit()
         conn.close()
@@ -1943,6 +2369,7 @@ async def deactivate_employee(employee_id: int, request: Request):
         
         # Подключаемся к базе данных
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Проверяем существование сотрудника
@@ -1965,6 +2392,7 @@ async def deactivate_employee(employee_id: int, request: Request):
             "UPDATE employees SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
             (employee_id,)
         )
+        attendance_changed(cursor)
         
         conn.commit()
         conn.close()
@@ -2027,6 +2455,7 @@ async def reactivate_employee(employee_id: int):
         print(f"[REACTIVATE] Запрос на активацию сотрудника {employee_id}")
         
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Проверяем существование сотрудника
@@ -2049,6 +2478,7 @@ async def reactivate_employee(employee_id: int):
             "UPDATE employees SET is_active = TRUE, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
             (employee_id,)
         )
+        attendance_changed(cursor)
         
         conn.commit()
         conn.close()
@@ -2324,6 +2754,7 @@ async def update_employee_department(employee_id: int, request_data: dict):
     """Перевести сотрудника в другую службу"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
 
         new_department_id = request_data.get('department_id')
@@ -2355,6 +2786,8 @@ async def update_employee_department(employee_id: int, request_data: dict):
             SET department_id = %s, position_id = %s
             WHERE id = %s
         """, (new_department_id, new_position_id, employee_id))
+        # Исключения отдела в итогах посещаемости берутся по department_id
+        attendance_changed(cursor)
 
         conn.commit()
         conn.close()
@@ -2447,6 +2880,7 @@ async def create_employee_exception(exception: ExceptionCreate, current_user: di
     """Создание нового исключения для сотрудника"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
 
         # Проверяем существование сотрудника
@@ -2460,6 +2894,7 @@ async def create_employee_exception(exception: ExceptionCreate, current_user: di
             INSERT INTO employee_exceptions (employee_id, exception_date, reason, exception_type)
             VALUES (%s, %s, %s, %s)
         """, (exception.employee_id, exception.exception_date, exception.reason, exception.exception_type))
+        attendance_changed(cursor, [exception.exception_date])
 
         exception_id = cursor.lastrowid
         conn.commit()
@@ -2488,11 +2923,12 @@ async def update_employee_exception(exception_id: int, exception: ExceptionUpdat
     """Обновление существующего исключения"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Проверяем существование исключения
         cursor.execute("""
-            SELECT ee.id, e.full_name 
+            SELECT ee.id, e.full_name, ee.exception_date
             FROM employee_exceptions ee
             JOIN employees e ON ee.employee_id = e.id
             WHERE ee.id = %s
@@ -2508,6 +2944,7 @@ async def update_employee_exception(exception_id: int, exception: ExceptionUpdat
             SET reason = %s, exception_type = %s
             WHERE id = %s
         """, (exception.reason, exception.exception_type, exception_id))
+        attendance_changed(cursor, [existing[2]])
         
         conn.commit()
         conn.close()
@@ -2527,6 +2964,7 @@ async def delete_employee_exception(exception_id: int):
     """Удаление исключения"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Проверяем существование исключения
@@ -2543,6 +2981,7 @@ async def delete_employee_exception(exception_id: int):
         
         # Удаляем исключение
         cursor.execute("DELETE FROM employee_exceptions WHERE id = %s", (exception_id,))
+        attendance_changed(cursor, [existing[2]])
 
         conn.commit()
         conn.close()
@@ -2572,6 +3011,7 @@ async def create_employee_exception_range(exception_range: ExceptionRangeCreate)
             raise HTTPException(status_code=400, detail="Максимальный диапазон - 31 день")
 
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
 
         # Проверяем существование сотрудника
@@ -2607,6 +3047,7 @@ async def create_employee_exception_range(exception_range: ExceptionRangeCreate)
                     raise e
             current_date += timedelta(days=1)
 
+        attendance_changed(cursor, [start_dt + timedelta(days=offset) for offset in range((end_dt - start_dt).days + 1)])
         conn.commit()
         conn.close()
 
@@ -2689,7 +3130,7 @@ async def get_svod_report(date: str = None):
             )
         
         # Получаем данные о входах за выбранную дату (только если есть сотрудники)
-        access_data = []
+        access_data = {'employee_id': []}
         if svod_employee_ids:
             access_data = execute_query(
                 conn,
@@ -2699,7 +3140,8 @@ async def get_svod_report(date: str = None):
                 WHERE DATE(access_datetime) = %s
                 """,
                 (date,),
-                fetch_all=True
+                fetch_all=True,
+                columnar=True
             )
         
         conn.close()
@@ -2708,7 +3150,7 @@ async def get_svod_report(date: str = None):
         exceptions_dict = {exc['employee_id']: exc for exc in exceptions_data}
         
         # Создаем set с id сотрудников, у которых есть вход
-        employees_with_access = {acc['employee_id'] for acc in access_data}
+        employees_with_access = set(access_data['employee_id'])
         
         # Формируем результат
         result = []
@@ -2758,12 +3200,12 @@ async def get_svod_report(date: str = None):
                     'is_position_only': False
                 })
         
-        return {
+        return FastJSONResponse({
             'date': date,
             'employees': result,
             'total_count': len(result),
             'svod_count': len(svod_employee_ids)
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения сводной таблицы: {str(e)}")
@@ -2936,14 +3378,6 @@ async def update_svod_order(order_data: dict, current_user: dict = Depends(get_c
         if missing_ids:
             raise HTTPException(status_code=400, detail=f"Записи с ID {missing_ids} не найдены в своде")
         
-        # Добавляем колонку order_index в таблицу, если её нет
-        try:
-            cursor.execute("ALTER TABLE svod_report_employees ADD COLUMN order_index INTEGER DEFAULT 0")
-            conn.commit()
-        except Exception:
-            # Колонка уже существует, это нормально
-            pass
-        
         # Обновляем порядок для каждой записи (svod_id это id таблицы)
         for item in order_list:
             svod_id = item['svod_id']
@@ -3160,6 +3594,7 @@ async def create_department(department: DepartmentCreate):
 
         conn.commit()
         conn.close()
+        invalidate_reference_cache('departments')
 
         return {
             "id": department_id,
@@ -3197,6 +3632,7 @@ async def update_department(department_id: int, department: DepartmentUpdate):
         
         conn.commit()
         conn.close()
+        invalidate_reference_cache('departments')
         
         return {
             "id": department_id,
@@ -3213,6 +3649,7 @@ async def delete_department(department_id: int):
     """Удалить отдел/службу"""
     try:
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
 
         # Проверяем, что отдел существует
@@ -3233,9 +3670,11 @@ async def delete_department(department_id: int):
 
         # Удаляем отдел
         cursor.execute("DELETE FROM departments WHERE id = %s", (department_id,))
+        attendance_changed(cursor)
 
         conn.commit()
         conn.close()
+        invalidate_reference_cache('departments', 'whitelist')
 
         return {
             "message": f"Отдел '{dept_result[0]}' успешно удален"
@@ -3425,38 +3864,6 @@ async def delete_department_position_link(department_id: int, position_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка удаления связи: {str(e)}")
 
-@app.get("/health")
-async def health_check():
-    """Проверка работоспособности API"""
-    from datetime import datetime
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM access_logs")
-        count = cursor.fetchone()[0]
-        cursor.execute("SELECT MAX(DATE(access_datetime)) FROM access_logs")
-        last_data_date = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(DISTINCT employee_id) FROM access_logs")
-        total_employees = cursor.fetchone()[0]
-        conn.close()
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "data": {
-                "total_records": count,
-                "total_employees": total_employees,
-                "last_data_date": last_data_date
-            },
-            "modules": {
-                "smart_lunch_analyzer": "active",
-                "dashboard": "active",
-                "api": "active"
-            },
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Проблемы с системой: {str(e)}")
-
 @app.get("/folder-check-logs")
 async def get_folder_check_logs(current_user: dict = Depends(get_current_user)):
     """Получить логи автоматической проверки папки"""
@@ -3482,9 +3889,9 @@ async def check_prishel_folder_now(current_user: dict = Depends(get_current_user
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка запуска проверки: {str(e)}")
 
-@app.post("/upload-skud-file")
+@app.post("/upload-skud-file", status_code=202)
 async def upload_skud_file(file: UploadFile = File(..., description="СКУД файл (максимальный размер: 100MB)")):
-    """Загрузка и обработка СКУД файла через веб-интерфейс"""
+    """Прием СКУД файла через веб-интерфейс: файл ставится в очередь импорта"""
     try:
         # Проверяем размер файла
         content = await file.read()
@@ -3513,248 +3920,384 @@ async def upload_skud_file(file: UploadFile = File(..., description="СКУД ф
         if content_str is None:
             content_str = content.decode('utf-8', errors='ignore')
         
-        # Создаем временный файл в кодировке windows-1251
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='windows-1251') as temp_file:
-            temp_file.write(content_str)
-            temp_file_path = temp_file.name
+        # Сохраняем файл в папку загрузок в кодировке windows-1251:
+        # задача живет дольше запроса, поэтому временный файл не подходит
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', dir=UPLOADS_DIR, delete=False, encoding='windows-1251') as saved_file:
+            saved_file.write(content_str)
+            saved_file_path = saved_file.name
         
+        job = IngestJob(saved_file_path, file.filename, source='upload')
         try:
-            # Импортируем и используем наш парсер
-            from database_integrator import SkudDatabaseIntegrator
-            import configparser
-            
-            # Загружаем конфигурацию PostgreSQL
-            config = configparser.ConfigParser()
-            config.read('postgres_config.ini', encoding='utf-8')
-            
-            # Настройки подключения к PostgreSQL
-            pg_config = {
-                'host': config.get('DATABASE', 'host', fallback='localhost'),
-                'port': config.getint('DATABASE', 'port', fallback=5432),
-                'database': config.get('DATABASE', 'database', fallback='skud_db'),
-                'user': config.get('DATABASE', 'user', fallback='postgres'),
-                'password': config.get('DATABASE', 'password', fallback='password')
-            }
-            
-            integrator = SkudDatabaseIntegrator(db_type="postgresql", **pg_config)
-            if not integrator.connect():
-                raise HTTPException(status_code=500, detail="Ошибка подключения к PostgreSQL базе данных")
-            
-            # Обрабатываем файл
-            result = integrator.process_skud_file(temp_file_path)
-            
-            if result['success']:
-                return {
-                    "success": True,
-                    "message": f"Файл '{file.filename}' успешно обработан",
-                    "details": result.get('details')
-                }
-            else:
-                raise HTTPException(status_code=500, detail=result.get('error', 'Неизвестная ошибка'))
+            ingest_queue.submit(job)
+        except IngestQueueFull as e:
+            os.remove(saved_file_path)
+            raise HTTPException(status_code=429, detail=f"{e}. Повторите попытку позже")
         
-        finally:
-            # Удаляем временный файл
-            os.remove(temp_file_path)
+        add_folder_log(f'📥 {file.filename}: принят в очередь импорта (задача {job.id})', 'info')
+        return {
+            "success": True,
+            "message": f"Файл '{file.filename}' принят в очередь импорта",
+            "job_id": job.id,
+            "status_url": f"/ingest-jobs/{job.id}",
+            "queue_depth": ingest_queue.depth()
+        }
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка загрузки файла: {str(e)}")
 
-def execute_query(conn, query, params=None, fetch_one=False, fetch_all=False):
-    """Выполняет запросы только для PostgreSQL"""
+# Максимальный размер пакета /ingest/events (строк или записей)
+INGEST_EVENTS_MAX_BATCH = 5000
+# Через сколько секунд клиенту повторить пакет при переполненной очереди
+INGEST_RETRY_AFTER_SECONDS = 2
+
+ingest_events_config = None
+
+class IngestEventsBatch(BaseModel):
+    lines: Optional[List[str]] = None      # строки выгрузки (10 полей через табуляцию)
+    records: Optional[List[dict]] = None   # уже распарсенные записи (поля RealSkudRecord)
+    workstation: Optional[str] = None      # РМ по умолчанию для records без workstation
+
+@app.post("/ingest/events", status_code=202)
+async def ingest_events(batch: IngestEventsBatch):
+    """Прием пакета событий СКУД от РМ: строки выгрузки или JSON-записи ставятся в очередь импорта"""
+    global ingest_events_config
+    try:
+        lines = batch.lines or []
+        raw_records = batch.records or []
+        received = len(lines) + len(raw_records)
+        if received == 0:
+            raise HTTPException(status_code=400, detail="Пакет пуст: передайте lines или records")
+        if received > INGEST_EVENTS_MAX_BATCH:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Слишком большой пакет ({received}). Максимум: {INGEST_EVENTS_MAX_BATCH}"
+            )
+        
+        if ingest_events_config is None:
+            ingest_events_config = create_real_skud_config('postgres_config.ini')
+        
+        records = []
+        for line_number, line in enumerate(lines, 1):
+            skud_record = parse_real_skud_line(line.strip(), line_number, ingest_events_config)
+            if skud_record:
+                records.append(skud_record)
+        for data in raw_records:
+            if batch.workstation and not data.get('workstation'):
+                data = dict(data, workstation=batch.workstation)
+            skud_record = record_from_dict(data, ingest_events_config)
+            if skud_record:
+                records.append(skud_record)
+        
+        response = {
+            "success": True,
+            "received": received,
+            "accepted": len(records),
+            # Заголовки, другие события, исключенные фильтрами и нераспознанные строки
+            "rejected": received - len(records),
+            "job_id": None,
+            "status_url": None
+        }
+        if not records:
+            return response
+        
+        job = IngestJob(None, f"events[{len(records)}]", source='events', cleanup=False, records=records)
+        try:
+            ingest_queue.submit(job)
+        except IngestQueueFull as e:
+            raise HTTPException(
+                status_code=429,
+                detail=f"{e}. Повторите пакет позже",
+                headers={"Retry-After": str(INGEST_RETRY_AFTER_SECONDS)}
+            )
+        
+        response.update({
+            "job_id": job.id,
+            "status_url": f"/ingest-jobs/{job.id}",
+            "queue_depth": ingest_queue.depth()
+        })
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка приема событий: {str(e)}")
+
+@app.get("/ingest-jobs")
+async def get_ingest_jobs():
+    """Список задач импорта (последние сверху)"""
+    jobs = [job.to_dict() for job in reversed(ingest_queue.list_jobs())]
+    return {
+        "jobs": jobs,
+        "queue_depth": ingest_queue.depth(),
+        "max_queue_depth": ingest_queue.max_depth,
+        "workers": ingest_queue.workers
+    }
+
+@app.get("/ingest-jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Статус задачи импорта: фаза, строки, вставленные записи, скорость и ошибки"""
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача импорта не найдена")
+    return job.to_dict()
+
+@app.post("/ingest-jobs/{job_id}/cancel")
+async def cancel_ingest_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Отменить задачу импорта"""
+    job = ingest_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача импорта не найдена")
+    return {
+        "success": True,
+        "message": "Отмена задачи запрошена" if not job.is_finished else f"Задача уже завершена ({job.phase})",
+        "job": job.to_dict()
+    }
+
+# Строк за одно обращение к БД при построчном чтении (execute_query(..., iterate=True))
+QUERY_FETCH_SIZE = 2000
+
+ROW_TYPES = ('dict', 'namedtuple', 'tuple')
+
+@lru_cache(maxsize=256)
+def row_class(columns):
+    """namedtuple для набора колонок: класс строится один раз на форму результата"""
+    return namedtuple('Row', columns, rename=True)
+
+def row_factory(cursor, row):
+    """Функция сборки строки нужного вида; колонки берутся из cursor.description один раз"""
+    columns = tuple(desc[0] for desc in cursor.description)
+    if row == 'tuple':
+        return None
+    if row == 'namedtuple':
+        return row_class(columns)._make
+    return lambda values: dict(zip(columns, values))
+
+def iterate_query(conn, query, params, row, server_side, fetch_size):
+    """Строки запроса по мере чтения: fetchmany пачками или именованный (серверный) курсор
+
+    Серверному курсору нужна транзакция: на время чтения соединение выходит
+    из autocommit и возвращается в него, когда генератор исчерпан или закрыт.
+    """
+    previous_autocommit = conn.autocommit
+    if server_side:
+        conn.autocommit = False
+        cursor = conn.cursor(name='execute_query')
+        cursor.itersize = fetch_size
+    else:
+        cursor = conn.cursor()
+    try:
+        cursor.execute(query, params or ())
+        rows = cursor.fetchmany(fetch_size)
+        # У серверного курсора описание колонок появляется после первой выборки
+        make_row = row_factory(cursor, row) if rows else None
+        while rows:
+            if make_row is None:
+                yield from rows
+            else:
+                for values in rows:
+                    yield make_row(values)
+            rows = cursor.fetchmany(fetch_size)
+    finally:
+        cursor.close()
+        if server_side:
+            conn.rollback()
+            conn.autocommit = previous_autocommit
+
+def execute_query(conn, query, params=None, fetch_one=False, fetch_all=False, row='dict',
+                  iterate=False, server_side=False, columnar=False, fetch_size=QUERY_FETCH_SIZE):
+    """Выполняет запросы только для PostgreSQL
+
+    row - вид строк: 'dict' (по умолчанию), 'namedtuple' (класс кэшируется по набору
+    колонок) или 'tuple' (как вернул драйвер, без преобразования).
+    fetch_all=True, columnar=True - {колонка: [значения]} вместо списка строк.
+    iterate=True - генератор строк, читаемых пачками по fetch_size; с server_side=True
+    через серверный курсор, тогда в памяти только текущая пачка. Генератор нужно
+    дочитать (или закрыть) до возврата соединения в пул.
+    """
+    if row not in ROW_TYPES:
+        raise ValueError(f"row: ожидается одно из {ROW_TYPES}")
     query_pg = query.replace('?', '%s')
+    if iterate:
+        return iterate_query(conn, query_pg, params, row, server_side, fetch_size)
     cursor = conn.cursor()
     cursor.execute(query_pg, params or ())
     if fetch_one:
         result = cursor.fetchone()
-        if result:
-            columns = [desc[0] for desc in cursor.description]
-            return dict(zip(columns, result))
-        else:
+        if result is None:
             return None
+        make_row = row_factory(cursor, row)
+        return result if make_row is None else make_row(result)
     elif fetch_all:
         results = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        return [dict(zip(columns, row)) for row in results]
+        if columnar:
+            columns = [desc[0] for desc in cursor.description]
+            values = list(zip(*results)) if results else [()] * len(columns)
+            return {column: list(column_values) for column, column_values in zip(columns, values)}
+        make_row = row_factory(cursor, row)
+        return results if make_row is None else [make_row(values) for values in results]
     else:
         return cursor
 
+def dashboard_stats_payload(day_totals, average_attendance, late_percentage):
+    """Ответ /dashboard-stats из итогов дня и недельного тренда"""
+    present_count = day_totals['present_count']
+    late_count = day_totals['late_count']
+    return {
+        "todayAttendance": {
+            "onTime": max(0, present_count - late_count),
+            "late": late_count
+        },
+        "weeklyTrend": {
+            "totalEmployees": day_totals['total_employees'],
+            "averageAttendance": round(average_attendance, 1),
+            "latePercentage": round(late_percentage, 1)
+        },
+        "recentActivity": {
+            # Упрощенные оценки: активные - примерно 80% от пришедших, входов - примерно в 1.5 раза больше
+            "totalEntries": max(1, int(present_count * 1.5)),
+            "activeEmployees": max(0, int(present_count * 0.8)),
+            "exceptions": day_totals['exceptions_count'],
+            "birthdays": day_totals['birthdays_count']
+        }
+    }
+
+# ================================
+# ДАШБОРД: ВСЕ ВИДЖЕТЫ ЗА ДЕНЬ
+# ================================
+
+# Сколько секунд ответ /dashboard за дату отдается из кэша: за сегодня данные еще
+# приходят (импорт в других процессах кэш не сбрасывает), прошедшие дни меняются редко
+DASHBOARD_CACHE_TTL_TODAY = 30
+DASHBOARD_CACHE_TTL_PAST = 300
+# Сколько дат держать в кэше: сверх этого вытесняется дата, которую дольше всех не запрашивали
+DASHBOARD_CACHE_MAX_DAYS = 32
+dashboard_cache = OrderedDict()
+dashboard_cache_lock = threading.Lock()
+
+def invalidate_dashboard_cache():
+    """Сбрасывает кэш дашборда (изменились записи, исключения или сотрудники)"""
+    with dashboard_cache_lock:
+        dashboard_cache.clear()
+
+def attendance_changed(cursor, days=None):
+    """Итоги посещаемости устарели: сбрасывает attendance_daily (дни или все) и кэш дашборда"""
+    if days is None:
+        invalidate_all(cursor)
+    else:
+        invalidate_days(cursor, days)
+    invalidate_dashboard_cache()
+
+def with_db_connection(func, *args):
+    """Вызывает func(conn, *args) на соединении из пула (для запуска в потоке)"""
+    conn = get_db_connection()
+    try:
+        return func(conn, *args)
+    finally:
+        conn.close()
+
+def load_staff_and_birthdays(conn, day):
+    return active_employees_count(conn), birthdays(conn, day)
+
+def dashboard_cache_ttl(day):
+    return DASHBOARD_CACHE_TTL_TODAY if day >= datetime.now().date() else DASHBOARD_CACHE_TTL_PAST
+
+async def build_dashboard(day):
+    """Все виджеты дашборда за день
+
+    Три независимых запроса идут параллельно на разных соединениях пула:
+    пришедшие сотрудники (один проход по записям дня), число сотрудников с днями
+    рождения и итоги предыдущих дней для тренда. Остальное выводится из них.
+    """
+    employees, (total_employees, birthdays_list), past_totals = await asyncio.gather(
+        asyncio.to_thread(with_db_connection, day_employees, day),
+        asyncio.to_thread(with_db_connection, load_staff_and_birthdays, day),
+        asyncio.to_thread(with_db_connection, past_days_totals, day)
+    )
+    day_totals = totals_from_employees(employees, total_employees, len(birthdays_list))
+    past_totals[day] = day_totals
+    average_attendance, late_percentage = trend_from_totals(past_totals)
+
+    date_str = day.isoformat()
+    arrived = [employee for employee in employees if employee['first_entry']]
+    on_time, late = [], []
+    for employee in arrived:
+        (late if employee['is_late'] else on_time).append({
+            'id': employee['id'],
+            'name': employee['full_name'],
+            'first_entry': str(employee['first_entry']),
+            'is_late': employee['is_late']
+        })
+    exceptions_list = [{
+        'id': employee['id'],
+        'name': employee['full_name'],
+        'first_entry': str(employee['first_entry']),
+        'exception_reason': employee['exception_reason'],
+        'exception_type': employee['exception_type'],
+        'is_late': False  # Сотрудники с исключениями не считаются опоздавшими
+    } for employee in arrived if employee['has_exception']]
+
+    return {
+        'date': date_str,
+        'stats': dashboard_stats_payload(day_totals, average_attendance, late_percentage),
+        'employeeLists': {'date': date_str, 'onTime': on_time, 'late': late, 'total': len(arrived)},
+        'exceptions': {'date': date_str, 'exceptions': exceptions_list, 'total': len(exceptions_list)},
+        'birthdays': {'date': date_str, 'birthdays': birthdays_list, 'total': len(birthdays_list)}
+    }
+
+async def get_dashboard_day(date):
+    """Дашборд за дату (ГГГГ-ММ-ДД, по умолчанию сегодня) из кэша или заново"""
+    day = datetime.strptime(date, '%Y-%m-%d').date() if date else datetime.today().date()
+    with dashboard_cache_lock:
+        entry = dashboard_cache.get(day)
+        if entry:
+            dashboard_cache.move_to_end(day)
+    if entry and time.time() - entry[0] < dashboard_cache_ttl(day):
+        return entry[1]
+    payload = await build_dashboard(day)
+    with dashboard_cache_lock:
+        dashboard_cache[day] = (time.time(), payload)
+        dashboard_cache.move_to_end(day)
+        while len(dashboard_cache) > DASHBOARD_CACHE_MAX_DAYS:
+            dashboard_cache.popitem(last=False)
+    return payload
+
+@app.get("/dashboard")
+async def get_dashboard(
+    date: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Все виджеты дашборда за день одним запросом: stats, employeeLists, exceptions, birthdays"""
+    try:
+        payload = await get_dashboard_day(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Дата должна быть в формате ГГГГ-ММ-ДД")
+    except Exception as e:
+        print(f"Ошибка получения дашборда: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка получения данных: {str(e)}")
+    day = datetime.strptime(payload['date'], '%Y-%m-%d').date()
+    return FastJSONResponse(content=payload,
+                            headers={'Cache-Control': f'private, max-age={dashboard_cache_ttl(day)}'})
+
 @app.get("/dashboard-stats")
 async def get_dashboard_stats(date: str = None):
-    """Получает статистику для дашборда"""
+    """Получает статистику для дашборда
+
+    Показатели дня считаются одним запросом (attendance_daily.day_summary),
+    недельный тренд - по сохраненным итогам предыдущих дней.
+    """
     try:
-        print(f"Dashboard stats requested for date: {date}")  # Отладка
+        target_date = datetime.strptime(date, '%Y-%m-%d').date() if date else datetime.now().date()
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Получаем дату для запроса (переданную или текущую)
-        from datetime import datetime
-        target_date = date if date else datetime.now().strftime('%Y-%m-%d')
-        print(f"Using target_date: {target_date}")  # Отладка
-        
-        # Проверяем, есть ли вообще данные в таблице access_logs
-        cursor.execute("SELECT COUNT(*) as total_records FROM access_logs")
-        total_records = cursor.fetchone()['total_records']
-        print(f"Total records in access_logs: {total_records}")  # Отладка
-        
-        # Проверяем, есть ли данные за выбранную дату
-        cursor.execute("SELECT COUNT(*) as records_for_date FROM access_logs WHERE DATE(access_datetime) = %s", (target_date,))
-        records_for_date = cursor.fetchone()['records_for_date']
-        print(f"Records for {target_date}: {records_for_date}")  # Отладка
-        
-        # Показываем какие даты вообще есть в таблице
-        cursor.execute("SELECT DISTINCT DATE(access_datetime) as date FROM access_logs ORDER BY date DESC LIMIT 10")
-        available_dates = cursor.fetchall()
-        print(f"Available dates in database: {[row['date'] for row in available_dates]}")  # Отладка
-        
-        # Статистика посещаемости за день - простой подсчет
-        # Всего сотрудников (исключая служебный персонал)
-        cursor.execute("""
-            SELECT COUNT(*) as total_employees
-            FROM employees 
-            WHERE is_active = true
-            AND full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-        """)
-        total_employees_result = cursor.fetchone()
-        total_employees = total_employees_result['total_employees'] if total_employees_result else 0
-        
-        # Сотрудники, которые были за день (все записи, как в EmployeeSchedule)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT al.employee_id) as present_count
-            FROM access_logs al
-            JOIN employees e ON al.employee_id = e.id
-            WHERE DATE(al.access_datetime) = %s
-            AND e.is_active = true
-            AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-        """, (target_date,))
-        present_result = cursor.fetchone()
-        present_count = present_result['present_count'] if present_result else 0
-        
-        # Сотрудники, которые опоздали (первый вход после 9:00, БЕЗ исключений)
-        cursor.execute("""
-            WITH first_entries AS (
-                SELECT 
-                    al.employee_id,
-                    e.department_id,
-                    MIN(CAST(al.access_datetime AS TIME)) as first_entry_time
-                FROM access_logs al
-                JOIN employees e ON al.employee_id = e.id
-                WHERE DATE(al.access_datetime) = %s
-                AND e.is_active = true
-                AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-                AND (al.door_location NOT LIKE '%%выход%%' OR al.door_location IS NULL)
-                GROUP BY al.employee_id, e.department_id
-            )
-            SELECT COUNT(*) as late_count
-            FROM first_entries fe
-            WHERE fe.first_entry_time > '09:00:00'
-            AND NOT EXISTS (
-                -- Исключение для конкретного сотрудника
-                SELECT 1 FROM employee_exceptions ee 
-                WHERE ee.employee_id = fe.employee_id 
-                AND ee.exception_date = %s 
-                AND ee.exception_type = 'no_lateness_check'
-            )
-            AND NOT EXISTS (
-                -- Исключение для всего отдела
-                SELECT 1 FROM whitelist_departments wd 
-                WHERE wd.department_id = fe.department_id 
-                AND wd.exception_type = 'no_lateness_check'
-            )
-        """, (target_date, target_date))
-        late_result = cursor.fetchone()
-        late_count = late_result['late_count'] if late_result else 0
-        
-        # Формируем attendance_stats
-        attendance_stats = {
-            'present_count': present_count,
-            'late_count': late_count,
-            'absent_count': max(0, total_employees - present_count),
-            'total_employees': total_employees
-        }
-        
-        print(f"Attendance stats for {target_date}: {attendance_stats}")  # Отладка
-        
-        # Активные сотрудники - упрощенная логика (примерно 80% от пришедших)
-        active_employees = max(0, int(present_count * 0.8))
-        
-        # Общее количество входов за день (примерно в 1.5 раза больше уникальных сотрудников)
-        total_entries = max(1, int(present_count * 1.5))
-        
-        # Реальное количество исключений за день - считаем как в модальном окне
-        cursor.execute("""
-            SELECT COUNT(DISTINCT e.id) as exceptions_count
-            FROM employees e
-            LEFT JOIN employee_exceptions ee ON e.id = ee.employee_id AND ee.exception_date = %s
-            LEFT JOIN whitelist_departments wd ON e.department_id = wd.department_id
-            WHERE e.is_active = true
-            AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-            AND (
-                -- Есть персональное исключение на эту дату
-                (ee.employee_id IS NOT NULL AND ee.exception_type IS NOT NULL)
-                OR
-                -- Есть исключение для отдела
-                (wd.department_id IS NOT NULL AND wd.exception_type IS NOT NULL)
-            )
-            -- Показываем только тех, кто реально был на работе в этот день
-            AND EXISTS (
-                SELECT 1 FROM access_logs al 
-                WHERE al.employee_id = e.id 
-                AND DATE(al.access_datetime) = %s
-            )
-        """, (target_date, target_date))
-        exceptions_result = cursor.fetchone()
-        exceptions_count = exceptions_result['exceptions_count'] if exceptions_result else 0
-        print(f"Real exceptions count for {target_date}: {exceptions_count}")  # Отладка
-        
-        # Количество дней рождений на сегодня
-        cursor.execute("""
-            SELECT COUNT(*) as birthdays_count
-            FROM employees e
-            WHERE e.is_active = true
-            AND e.birth_date IS NOT NULL
-            AND EXTRACT(MONTH FROM e.birth_date) = EXTRACT(MONTH FROM %s::date)
-            AND EXTRACT(DAY FROM e.birth_date) = EXTRACT(DAY FROM %s::date)
-            AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-        """, (target_date, target_date))
-        birthdays_result = cursor.fetchone()
-        birthdays_count = birthdays_result['birthdays_count'] if birthdays_result else 0
-        print(f"Birthdays count for {target_date}: {birthdays_count}")  # Отладка
-        
-        # Средняя посещаемость за неделю
-        cursor.execute("""
-            SELECT 
-                75.0 as avg_attendance,
-                12.5 as avg_late_percentage
-        """)
-        
-        weekly_stats = cursor.fetchone()
-        
-        conn.close()
-        
-        # Формируем ответ
-        stats = {
-            "todayAttendance": {
-                "onTime": max(0, attendance_stats['present_count'] - attendance_stats['late_count']),
-                "late": attendance_stats['late_count']
-            },
-            "weeklyTrend": {
-                "totalEmployees": attendance_stats['total_employees'],
-                "averageAttendance": round(weekly_stats['avg_attendance'] if weekly_stats and weekly_stats['avg_attendance'] else 0, 1),
-                "latePercentage": round(weekly_stats['avg_late_percentage'] if weekly_stats and weekly_stats['avg_late_percentage'] else 0, 1)
-            },
-            "recentActivity": {
-                "totalEntries": total_entries,
-                "activeEmployees": active_employees,
-                "exceptions": exceptions_count,
-                "birthdays": birthdays_count
-            }
-        }
-        
-        print(f"Final stats being returned: {stats}")  # Отладка
-        
-        return stats
+        try:
+            day_totals = day_summary(conn, target_date)
+            average_attendance, late_percentage = weekly_trend(conn, target_date, day_totals)
+        finally:
+            conn.close()
+
+        return FastJSONResponse(dashboard_stats_payload(day_totals, average_attendance, late_percentage))
         
     except Exception as e:
         import traceback
@@ -3783,83 +4326,9 @@ async def get_dashboard_employee_lists(
     date: Optional[str] = Query(None), 
     current_user: dict = Depends(get_current_user)
 ):
-    """Быстрая загрузка списков сотрудников для модальных окон"""
+    """Быстрая загрузка списков сотрудников для модальных окон (часть /dashboard)"""
     try:
-        if date is None:
-            date = datetime.today().strftime('%Y-%m-%d')
-        
-        conn = get_db_connection()
-        
-        # Получаем всех сотрудников с первым входом за день (с учетом исключений)
-        all_employees = execute_query(
-            conn,
-            """
-            WITH first_entries AS (
-                SELECT 
-                    al.employee_id,
-                    e.full_name,
-                    e.department_id,
-                    MIN(CAST(al.access_datetime AS TIME)) as first_entry_time
-                FROM access_logs al
-                JOIN employees e ON al.employee_id = e.id
-                WHERE DATE(al.access_datetime) = %s
-                AND e.is_active = true
-                AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-                AND (al.door_location NOT LIKE '%%выход%%' OR al.door_location IS NULL)
-                GROUP BY al.employee_id, e.full_name, e.department_id
-            )
-            SELECT 
-                fe.employee_id as id,
-                fe.full_name,
-                fe.first_entry_time as first_entry,
-                CASE 
-                    WHEN fe.first_entry_time > '09:00:00' 
-                    AND NOT EXISTS (
-                        SELECT 1 FROM employee_exceptions ee 
-                        WHERE ee.employee_id = fe.employee_id 
-                        AND ee.exception_date = %s 
-                        AND ee.exception_type = 'no_lateness_check'
-                    )
-                    AND NOT EXISTS (
-                        SELECT 1 FROM whitelist_departments wd 
-                        WHERE wd.department_id = fe.department_id 
-                        AND wd.exception_type = 'no_lateness_check'
-                    )
-                    THEN true
-                    ELSE false
-                END as is_late
-            FROM first_entries fe
-            ORDER BY fe.full_name
-            """,
-            (date, date),
-            fetch_all=True
-        )
-        conn.close()
-        
-        # Разделяем на две группы
-        on_time_employees = []
-        late_employees = []
-        
-        for emp in all_employees:
-            emp_data = {
-                'id': emp['id'],
-                'name': emp['full_name'],
-                'first_entry': str(emp['first_entry']),
-                'is_late': emp['is_late']
-            }
-            
-            if emp['is_late']:
-                late_employees.append(emp_data)
-            else:
-                on_time_employees.append(emp_data)
-        
-        return {
-            'date': date,
-            'onTime': on_time_employees,
-            'late': late_employees,
-            'total': len(all_employees)
-        }
-        
+        return FastJSONResponse((await get_dashboard_day(date))['employeeLists'])
     except Exception as e:
         import traceback
         print(f"Ошибка получения списков сотрудников: {e}")
@@ -3871,84 +4340,9 @@ async def get_dashboard_employee_exceptions(
     date: Optional[str] = Query(None), 
     current_user: dict = Depends(get_current_user)
 ):
-    """Получить список сотрудников с исключениями за конкретную дату для дашборда"""
+    """Получить список сотрудников с исключениями за конкретную дату для дашборда (часть /dashboard)"""
     try:
-        if date is None:
-            date = datetime.today().strftime('%Y-%m-%d')
-        
-        conn = get_db_connection()
-        
-        # Получаем сотрудников с исключениями за конкретную дату с их временем прихода
-        employees_with_exceptions = execute_query(
-            conn,
-            """
-            SELECT DISTINCT
-                e.id,
-                e.full_name,
-                ee.reason as exception_reason,
-                ee.exception_type,
-                wd.reason as dept_exception_reason,
-                wd.exception_type as dept_exception_type,
-                (
-                    SELECT MIN(CAST(al.access_datetime AS TIME))
-                    FROM access_logs al 
-                    WHERE al.employee_id = e.id 
-                    AND DATE(al.access_datetime) = %s
-                    AND (al.door_location NOT LIKE '%%выход%%' OR al.door_location IS NULL)
-                ) as first_entry
-            FROM employees e
-            LEFT JOIN employee_exceptions ee ON e.id = ee.employee_id AND ee.exception_date = %s
-            LEFT JOIN whitelist_departments wd ON e.department_id = wd.department_id
-            WHERE e.is_active = true
-            AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-            AND (
-                -- Есть персональное исключение на эту дату
-                (ee.employee_id IS NOT NULL AND ee.exception_type IS NOT NULL)
-                OR
-                -- Есть исключение для отдела
-                (wd.department_id IS NOT NULL AND wd.exception_type IS NOT NULL)
-            )
-            -- Показываем только тех, кто реально был на работе в этот день
-            AND EXISTS (
-                SELECT 1 FROM access_logs al 
-                WHERE al.employee_id = e.id 
-                AND DATE(al.access_datetime) = %s
-                AND (al.door_location NOT LIKE '%%выход%%' OR al.door_location IS NULL)
-            )
-            ORDER BY e.full_name
-            """,
-            (date, date, date),
-            fetch_all=True
-        )
-        
-        conn.close()
-        
-        # Форматируем результат
-        exceptions_list = []
-        for emp in employees_with_exceptions:
-            # Определяем основную причину исключения (персональное приоритетнее отделового)
-            if emp['exception_reason']:
-                reason = emp['exception_reason']
-                exception_type = emp['exception_type']
-            else:
-                reason = emp['dept_exception_reason']
-                exception_type = emp['dept_exception_type']
-            
-            exceptions_list.append({
-                'id': emp['id'],
-                'name': emp['full_name'],
-                'first_entry': str(emp['first_entry']) if emp['first_entry'] else None,
-                'exception_reason': reason,
-                'exception_type': exception_type,
-                'is_late': False  # Сотрудники с исключениями не считаются опоздавшими
-            })
-        
-        return {
-            'date': date,
-            'exceptions': exceptions_list,
-            'total': len(exceptions_list)
-        }
-        
+        return FastJSONResponse((await get_dashboard_day(date))['exceptions'])
     except Exception as e:
         import traceback
         print(f"Ошибка получения исключений: {e}")
@@ -3960,58 +4354,9 @@ async def get_dashboard_birthdays(
     date: Optional[str] = Query(None), 
     current_user: dict = Depends(get_current_user)
 ):
-    """Получить список сотрудников с днями рождения на сегодня или указанную дату"""
+    """Получить список сотрудников с днями рождения на сегодня или указанную дату (часть /dashboard)"""
     try:
-        if date is None:
-            date = datetime.today().strftime('%Y-%m-%d')
-        
-        conn = get_db_connection()
-        
-        # Получаем сотрудников, у которых день рождения сегодня (по дню и месяцу)
-        birthdays_today = execute_query(
-            conn,
-            """
-            SELECT 
-                e.id,
-                e.full_name,
-                e.birth_date,
-                d.name as department_name,
-                p.name as position_name,
-                EXTRACT(YEAR FROM %s::date) - EXTRACT(YEAR FROM e.birth_date) as age
-            FROM employees e
-            LEFT JOIN departments d ON e.department_id = d.id
-            LEFT JOIN positions p ON e.position_id = p.id
-            WHERE e.is_active = true
-            AND e.birth_date IS NOT NULL
-            AND EXTRACT(MONTH FROM e.birth_date) = EXTRACT(MONTH FROM %s::date)
-            AND EXTRACT(DAY FROM e.birth_date) = EXTRACT(DAY FROM %s::date)
-            AND e.full_name NOT IN ('Охрана М.', '1 пост о.', '2 пост о.', 'Крыша К.', 'Водитель 1 В.', 'Водитель 2 В.', 'Дежурный в.', 'Дежурный В.')
-            ORDER BY e.full_name
-            """,
-            (date, date, date),
-            fetch_all=True
-        )
-        
-        conn.close()
-        
-        # Форматируем результат
-        birthdays_list = []
-        for emp in birthdays_today:
-            birthdays_list.append({
-                'id': emp['id'],
-                'name': emp['full_name'],
-                'birth_date': emp['birth_date'].strftime('%Y-%m-%d') if emp['birth_date'] else None,
-                'age': int(emp['age']) if emp['age'] else None,
-                'department_name': emp['department_name'],
-                'position_name': emp['position_name']
-            })
-        
-        return {
-            'date': date,
-            'birthdays': birthdays_list,
-            'total': len(birthdays_list)
-        }
-        
+        return FastJSONResponse((await get_dashboard_day(date))['birthdays'])
     except Exception as e:
         import traceback
         print(f"Ошибка получения дней рождений: {e}")
@@ -4080,6 +4425,7 @@ async def update_employee_full_name(employee_id: int, data: dict = Body(...)):
         full_name_expanded = data.get('full_name_expanded', '').strip()
         
         conn = get_db_connection()
+        conn.autocommit = False
         cursor = conn.cursor()
         
         # Обновляем полное ФИО
@@ -4093,6 +4439,7 @@ async def update_employee_full_name(employee_id: int, data: dict = Body(...)):
         if cursor.rowcount == 0:
             conn.close()
             raise HTTPException(status_code=404, detail="Сотрудник не найден")
+        attendance_changed(cursor)
         
         conn.commit()
         conn.close()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Каталог данных access_logs по дням (PostgreSQL)
+
+data_catalog (миграция 12) хранит по каждой дате число записей, число
+сотрудников, первое и последнее событие и файлы, из которых пришли записи.
+Ведет его импорт: дни, в которые легли записи, копятся по контрольным
+точкам, и в конце файла (цикла дочитывания, пакета событий) их строки
+один раз пересчитываются диапазонным запросом по индексу времени
+(refresh_days), а имена файлов добавляются к уже известным. Последний
+день с данными, календарь доступных дат и общее число записей читаются
+отсюда, без прохода по access_logs.
+"""
+
+from datetime import datetime, time, timedelta
+
+CATALOG_FIELDS = ('day', 'row_count', 'employee_count', 'first_event', 'last_event', 'source_files')
+
+REFRESH_DAY_SQL = """
+    INSERT INTO data_catalog (day, row_count, employee_count, first_event, last_event, source_files)
+    SELECT %(day)s, COUNT(*), COUNT(DISTINCT employee_id), MIN(access_datetime), MAX(access_datetime),
+           %(files)s::text[]
+    FROM access_logs
+    WHERE access_datetime >= %(start)s AND access_datetime < %(end)s
+    HAVING COUNT(*) > 0
+    ON CONFLICT (day) DO UPDATE
+    SET row_count = EXCLUDED.row_count,
+        employee_count = EXCLUDED.employee_count,
+        first_event = EXCLUDED.first_event,
+        last_event = EXCLUDED.last_event,
+        source_files = ARRAY(
+            SELECT DISTINCT unnest(data_catalog.source_files || EXCLUDED.source_files) ORDER BY 1
+        ),
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def refresh_days(cursor, days):
+    """Пересчитывает строки каталога для дней, в которые легли записи
+
+    days - {день: имена файлов-источников} или просто набор дней (без источников).
+    """
+    for day in sorted(days):
+        files = sorted(days[day]) if isinstance(days, dict) else []
+        start = datetime.combine(day, time.min)
+        cursor.execute(REFRESH_DAY_SQL, {'day': day, 'files': files, 'start': start, 'end': start + timedelta(days=1)})
+
+
+def latest_day(conn):
+    """Последний день, за который есть записи доступа (None - данных нет)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(day) FROM data_catalog")
+    return cursor.fetchone()[0]
+
+
+def totals(conn):
+    """Сводка по каталогу: {total_records, days, first_day, last_day}"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(SUM(row_count), 0), COUNT(*), MIN(day), MAX(day) FROM data_catalog")
+    total_records, days, first_day, last_day = cursor.fetchone()
+    return {'total_records': int(total_records), 'days': days, 'first_day': first_day, 'last_day': last_day}
+
+
+def workdays(conn, start_day, end_day):
+    """Будни с данными за период (включительно) - рабочие дни для расчета посещаемости"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM data_catalog
+        WHERE day BETWEEN %s AND %s AND EXTRACT(ISODOW FROM day) < 6
+    """, (start_day, end_day))
+    return cursor.fetchone()[0]
+
+
+def calendar(conn, start_day=None, end_day=None):
+    """Дни с данными за период (включительно), по возрастанию даты"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {', '.join(CATALOG_FIELDS)}
+        FROM data_catalog
+        WHERE (%(start)s::date IS NULL OR day >= %(start)s::date)
+        AND (%(end)s::date IS NULL OR day <= %(end)s::date)
+        ORDER BY day
+    """, {'start': start_day, 'end': end_day})
+    return [dict(zip(CATALOG_FIELDS, row)) for row in cursor.fetchall()]
@@ -7,13 +7,32 @@
 
 import sys
 import os
+import time
+import configparser
+import threading
 import sqlite3
 import psycopg2
 import psycopg2.extras
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from real_skud_parser import parse_real_skud_line, create_real_skud_config
+from migrations import ensure_schema
+from attendance_daily import invalidate_days
+from data_catalog import refresh_days
+from ingest_manifest import IngestManifest
+from ingest_pipeline import IngestPipeline, load_pipeline_settings
+from ingest_throttle import get_throttle
+from ingest_validate import validate_skud_file
+from sql_dialect import dialect_for
+
+def access_type_for(direction):
+    """Тип доступа по направлению - соответствует CHECK constraint в БД"""
+    if direction == "выход":
+        return "ВЫХОД"
+    return "ВХОД"  # вход и неизвестное направление
+
 
 class SkudDatabaseIntegrator:
     """Класс для интеграции парсера с существующей базой данных"""
@@ -22,6 +41,26 @@ class SkudDatabaseIntegrator:
         self.db_type = db_type
         self.db_config = db_config
         self.connection = None
+        # Перевод запросов в синтаксис SQLite (sql_dialect)
+        self.dialect = dialect_for(db_type)
+        # Самое позднее записанное событие по каждому РМ (для ingest_watermarks)
+        self.committed_high_water = {}
+        # Дни записанных событий -> файлы, из которых они пришли: их итоги в attendance_daily
+        # устарели, а строки data_catalog пересчитываются
+        self.touched_days = {}
+        # Дни уже зафиксированных пакетов, строки data_catalog которых еще не пересчитаны:
+        # пересчет полного дня - один раз в конце файла, а не на каждой контрольной точке
+        self.catalog_days = {}
+        # Имя загружаемого файла для data_catalog (None - события не из файла)
+        self.source_file = None
+        # Пакетный режим: записи фиксируются не по одной, а вместе с контрольной точкой
+        self.batch_mode = False
+        # Не закрывать соединение после файла (воркер параллельного импорта, см. process_skud_files)
+        self.keep_connection = False
+        # Общий бюджет записи импорта (ingest_throttle); None - без ограничения
+        self.throttle = get_throttle()
+        # Массовая загрузка (skud_ingest backfill --bulk): без ограничителя и с асинхронной фиксацией
+        self.bulk_mode = False
         
         # Настройки по умолчанию для PostgreSQL
         if db_type == "postgresql":
@@ -42,13 +81,23 @@ class SkudDatabaseIntegrator:
         """Подключение к базе данных"""
         try:
             if self.db_type == "postgresql":
+                if self.keep_connection and self.connection is not None and not self.connection.closed:
+                    return True
                 self.connection = psycopg2.connect(**self.db_config)
                 self.connection.autocommit = False
+                if self.bulk_mode:
+                    # Фиксация не ждет записи WAL на диск: при сбое СУБД теряются последние
+                    # пакеты вместе с их контрольными точками, и повторный запуск их дочитает
+                    cursor = self.connection.cursor()
+                    cursor.execute("SET synchronous_commit TO off")
+                    self.connection.commit()
                 return True
             else:
-                # SQLite
+                # SQLite: WAL - чтение отчетов не блокируется записью импорта
                 self.connection = sqlite3.connect(self.db_path)
                 self.connection.row_factory = sqlite3.Row
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute("PRAGMA synchronous=NORMAL")
                 return True
         except Exception as e:
             print(f"❌ Ошибка подключения к БД: {e}")
@@ -62,60 +111,8 @@ class SkudDatabaseIntegrator:
         cursor = self.connection.cursor()
         
         if self.db_type == "postgresql":
-            # PostgreSQL синтаксис
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS departments (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL UNIQUE,
-                    priority INTEGER
-                );
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS positions (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL UNIQUE
-                );
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS employees (
-                    id SERIAL PRIMARY KEY,
-                    full_name VARCHAR(255) NOT NULL UNIQUE,
-                    birth_date DATE,
-                    department_id INTEGER REFERENCES departments(id),
-                    position_id INTEGER REFERENCES positions(id),
-                    card_number VARCHAR(50),
-                    is_active BOOLEAN DEFAULT TRUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS access_logs (
-                    id SERIAL PRIMARY KEY,
-                    employee_id INTEGER NOT NULL REFERENCES employees(id),
-                    access_datetime TIMESTAMP NOT NULL,
-                    access_type VARCHAR(10) NOT NULL CHECK (access_type IN ('ВХОД', 'ВЫХОД', 'IN', 'OUT')),
-                    door_location TEXT,
-                    card_number VARCHAR(50),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(employee_id, access_datetime, door_location)
-                );
-            ''')
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS employee_exceptions (
-                    id SERIAL PRIMARY KEY,
-                    employee_id INTEGER NOT NULL REFERENCES employees(id),
-                    exception_date DATE NOT NULL,
-                    reason TEXT NOT NULL,
-                    exception_type VARCHAR(50) DEFAULT 'no_lateness_check',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(employee_id, exception_date)
-                );
-            ''')
+            # Схема PostgreSQL ведется версионными миграциями
+            ensure_schema(self.connection)
         else:
             # SQLite синтаксис (для обратной совместимости)
             cursor.executescript('''
@@ -153,11 +150,32 @@ class SkudDatabaseIntegrator:
                     FOREIGN KEY (employee_id) REFERENCES employees(id),
                     UNIQUE(employee_id, access_datetime, door_location)
                 );
+                
+                CREATE INDEX IF NOT EXISTS idx_access_logs_datetime ON access_logs(access_datetime);
+                
+                CREATE TABLE IF NOT EXISTS ingest_watermarks (
+                    source TEXT PRIMARY KEY,
+                    high_water TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
             ''')
         
         self.connection.commit()
         return True
     
+    def commit(self):
+        """Фиксирует транзакцию; в пакетном режиме фиксация откладывается до контрольной точки"""
+        if not self.batch_mode:
+            self.connection.commit()
+    
+    def checkpoint(self, manifest=None, file_id=None, committed_offset=0, committed_line=0,
+                   rows_inserted=0, duplicates=0):
+        """Фиксирует пакет записей вместе с контрольной точкой и водяными знаками одной транзакцией"""
+        if manifest and file_id:
+            manifest.checkpoint(file_id, committed_offset, committed_line, rows_inserted, duplicates)
+        self.save_watermarks(commit=False)
+        self.connection.commit()
+    
     def get_or_create_unknown_ids(self):
         """Создает или находит ID для неопределенной службы и должности"""
         cursor = self.connection.cursor()
@@ -205,17 +223,7 @@ class SkudDatabaseIntegrator:
             else:
                 pos_id = pos[0]
         
-        self.connection.commit()
-        return dept_id, pos_id
-        pos = cursor.fetchone()
-        if not pos:
-            cursor.execute("INSERT INTO positions (name) VALUES (?)", ("Неопределено",))
-            pos_id = cursor.lastrowid
-            print("➕ Создана должность 'Неопределено'")
-        else:
-            pos_id = pos[0]
-        
-        self.connection.commit()
+        self.commit()
         return dept_id, pos_id
     
     def get_or_create_employee(self, full_name, card_number=None):
@@ -237,28 +245,35 @@ class SkudDatabaseIntegrator:
                         "UPDATE employees SET card_number = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s AND (card_number IS NULL OR card_number = '')",
                         (card_number, employee_id)
                     )
-                    self.connection.commit()
+                    self.commit()
                 
                 return employee_id
             else:
                 # Получаем ID для неопределенной службы и должности
                 dept_id, pos_id = self.get_or_create_unknown_ids()
                 
-                # Создаем нового сотрудника с неопределенной службой и должностью
+                # Создаем нового сотрудника с неопределенной службой и должностью.
+                # ON CONFLICT: то же ФИО мог только что создать параллельный импорт
                 cursor.execute("""
                     INSERT INTO employees (full_name, department_id, position_id, card_number, is_active)
-                    VALUES (%s, %s, %s, %s, TRUE) RETURNING id
+                    VALUES (%s, %s, %s, %s, TRUE)
+                    ON CONFLICT (full_name) DO NOTHING
+                    RETURNING id
                 """, (full_name, dept_id, pos_id, card_number or ''))
+                created = cursor.fetchone()
+                if created is None:
+                    cursor.execute("SELECT id FROM employees WHERE full_name = %s", (full_name,))
+                    return cursor.fetchone()[0]
                 
-                employee_id = cursor.fetchone()[0]
-                self.connection.commit()
+                employee_id = created[0]
+                self.commit()
                 
                 print(f"➕ Создан новый сотрудник: {full_name} (ID: {employee_id}) со службой/должностью 'Неопределено'")
                 return employee_id
         else:
             # SQLite синтаксис
             # Ищем существующего сотрудника
-            cursor.execute("SELECT id FROM employees WHERE full_name = %s", (full_name,))
+            cursor.execute("SELECT id FROM employees WHERE full_name = ?", (full_name,))
             employee = cursor.fetchone()
             
             if employee:
@@ -270,7 +285,7 @@ class SkudDatabaseIntegrator:
                         "UPDATE employees SET card_number = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND (card_number IS NULL OR card_number = '')",
                         (card_number, employee_id)
                     )
-                    self.connection.commit()
+                    self.commit()
                 
                 return employee_id
             else:
@@ -284,11 +299,10 @@ class SkudDatabaseIntegrator:
                 """, (full_name, dept_id, pos_id, card_number or ''))
                 
                 employee_id = cursor.lastrowid
-                self.connection.commit()
+                self.commit()
                 
                 print(f"➕ Создан новый сотрудник: {full_name} (ID: {employee_id}) со службой/должностью 'Неопределено'")
                 return employee_id
-            return employee_id
     
     def is_duplicate_access_log(self, employee_id, access_datetime, door_location):
         """Проверяет, существует ли уже такая запись доступа"""
@@ -313,8 +327,16 @@ class SkudDatabaseIntegrator:
         
         return cursor.fetchone() is not None
     
-    def add_access_log(self, skud_record):
-        """Добавляет запись доступа в базу данных"""
+    def add_access_log(self, skud_record, check_duplicate=True):
+        """Добавляет запись доступа в базу данных
+
+        check_duplicate=False - вызывающий код уже проверил дубликаты по водяному знаку.
+        Возвращает True для новой записи, False для дубликата или ошибки.
+        """
+        cursor = self.connection.cursor()
+        if self.batch_mode:
+            # Ошибка одной записи не должна откатывать весь пакет
+            cursor.execute("SAVEPOINT access_log_row")
         try:
             # Получаем ID сотрудника
             employee_id = self.get_or_create_employee(
@@ -323,7 +345,7 @@ class SkudDatabaseIntegrator:
             )
             
             # Проверяем на дубликаты
-            if self.is_duplicate_access_log(
+            if check_duplicate and self.is_duplicate_access_log(
                 employee_id, 
                 skud_record.timestamp, 
                 skud_record.door_location
@@ -332,13 +354,7 @@ class SkudDatabaseIntegrator:
             
             cursor = self.connection.cursor()
             
-            # Определяем тип доступа на основе направления - соответствует CHECK constraint в БД
-            if skud_record.direction == "вход":
-                access_type = "ВХОД"
-            elif skud_record.direction == "выход":
-                access_type = "ВЫХОД"
-            else:
-                access_type = "ВХОД"  # По умолчанию
+            access_type = access_type_for(skud_record.direction)
             
             # Вставляем запись доступа
             if self.db_type == "postgresql":
@@ -350,6 +366,7 @@ class SkudDatabaseIntegrator:
                         door_location, 
                         card_number
                     ) VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (employee_id, access_datetime, door_location) DO NOTHING
                 """, (
                     employee_id,
                     skud_record.timestamp,  # PostgreSQL принимает datetime объекты
@@ -366,6 +383,7 @@ class SkudDatabaseIntegrator:
                         door_location, 
                         card_number
                     ) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (employee_id, access_datetime, door_location) DO NOTHING
                 """, (
                     employee_id,
                     skud_record.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
@@ -373,14 +391,88 @@ class SkudDatabaseIntegrator:
                     skud_record.door_location,
                     skud_record.card_number or ''
                 ))
+            # Ту же запись успел записать другой импорт - это дубликат, а не ошибка
+            inserted = cursor.rowcount > 0
             
-            self.connection.commit()
-            return True
+            if self.batch_mode:
+                cursor.execute("RELEASE SAVEPOINT access_log_row")
+            self.commit()
+            if inserted:
+                self.note_committed_event(skud_record)
+            return inserted
             
         except Exception as e:
             print(f"❌ Ошибка добавления записи доступа: {e}")
+            # Сбрасываем прерванную транзакцию, чтобы следующие строки файла могли записаться
+            if self.batch_mode:
+                cursor.execute("ROLLBACK TO SAVEPOINT access_log_row")
+            else:
+                self.connection.rollback()
             return False
     
+    def note_committed_event(self, skud_record):
+        """Запоминает самое позднее записанное в БД событие по каждому источнику (РМ)"""
+        files = self.touched_days.setdefault(skud_record.timestamp.date(), set())
+        if self.source_file:
+            files.add(self.source_file)
+        source = skud_record.workstation
+        if not source:
+            return
+        current = self.committed_high_water.get(source)
+        if current is None or skud_record.timestamp > current:
+            self.committed_high_water[source] = skud_record.timestamp
+    
+    def load_watermarks(self):
+        """Читает водяные знаки источников: {РМ: время последнего записанного события}"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT source, high_water FROM ingest_watermarks")
+        watermarks = {source: self.dialect.to_datetime(high_water) for source, high_water in cursor.fetchall()}
+        self.connection.commit()
+        return watermarks
+    
+    def save_watermarks(self, commit=True):
+        """Сдвигает водяные знаки вперед по событиям, записанным этим интегратором
+
+        Заодно сбрасывает итоги посещаемости (attendance_daily) дней, в которые легли записи,
+        и откладывает эти дни для пересчета data_catalog (refresh_catalog).
+        """
+        if self.touched_days and self.db_type == "postgresql":
+            cursor = self.connection.cursor()
+            invalidate_days(cursor, self.touched_days)
+            if commit:
+                self.connection.commit()
+            for day, files in self.touched_days.items():
+                self.catalog_days.setdefault(day, set()).update(files)
+        self.touched_days = {}
+        if not self.committed_high_water:
+            return
+        cursor = self.connection.cursor()
+        for source, high_water in self.committed_high_water.items():
+            cursor.execute(self.dialect.sql(f"""
+                INSERT INTO ingest_watermarks (source, high_water)
+                VALUES (%s, %s)
+                ON CONFLICT (source) DO UPDATE
+                SET high_water = {self.dialect.greatest('ingest_watermarks.high_water', 'EXCLUDED.high_water')},
+                    updated_at = CURRENT_TIMESTAMP
+            """), self.dialect.params((source, high_water)))
+        if commit:
+            self.connection.commit()
+        self.committed_high_water = {}
+    
+    def preload_access_keys(self, since, until):
+        """Загружает ключи (ФИО, время, дверь) записей окна перекрытия одним запросом"""
+        cursor = self.connection.cursor()
+        cursor.execute(self.dialect.sql("""
+            SELECT e.full_name, al.access_datetime, al.door_location
+            FROM access_logs al
+            JOIN employees e ON al.employee_id = e.id
+            WHERE al.access_datetime >= %s AND al.access_datetime <= %s
+        """), self.dialect.params((since, until)))
+        keys = {(full_name, self.dialect.to_datetime(access_datetime), door_location)
+                for full_name, access_datetime, door_location in cursor.fetchall()}
+        self.connection.commit()
+        return keys
+    
     def import_from_file(self, file_path, limit=None, config_file=None):
         """Импортирует данные из файла СКУД"""
         
@@ -426,10 +518,8 @@ class SkudDatabaseIntegrator:
                     if skud_record:
                         # Проверяем, новый ли это сотрудник
                         cursor = self.connection.cursor()
-                        if self.db_type == "postgresql":
-                            cursor.execute("SELECT id FROM employees WHERE full_name = %s", (skud_record.full_name,))
-                        else:
-                            cursor.execute("SELECT id FROM employees WHERE full_name = %s", (skud_record.full_name,))
+                        cursor.execute(self.dialect.sql("SELECT id FROM employees WHERE full_name = %s"),
+                                       (skud_record.full_name,))
                         existing_employee = cursor.fetchone()
                         
                         # Добавляем запись
@@ -462,7 +552,7 @@ class SkudDatabaseIntegrator:
             return False
         finally:
             if self.connection:
-                self.connection.close()
+                self.close_with_watermarks()
     
     def get_statistics(self):
         """Выводит статистику базы данных после импорта"""
@@ -490,10 +580,10 @@ class SkudDatabaseIntegrator:
         
         # Статистика по сегодняшним записям
         today = datetime.now().date()
-        cursor.execute("""
+        cursor.execute(self.dialect.sql("""
             SELECT COUNT(*) FROM access_logs 
-            WHERE DATE(access_datetime) = ?
-        """, (today,))
+            WHERE DATE(access_datetime) = %s
+        """), self.dialect.params((today,)))
         today_logs = cursor.fetchone()[0]
         
         print(f"\n📊 Статистика базы данных:")
@@ -507,8 +597,325 @@ class SkudDatabaseIntegrator:
         
         self.connection.close()
     
-    def process_skud_file(self, file_path):
-        """Обрабатывает файл СКУД и возвращает результат для API"""
+    def new_ingest_state(self):
+        """Счетчики и кэши дедупликации одного прохода импорта (для ingest_record)"""
+        return {
+            'watermarks': self.load_watermarks(),
+            # {РМ: ключи окна перекрытия под его знаком}
+            'preloaded_keys': {},
+            'run_keys': set(),
+            'new_records': 0,
+            'duplicates': 0,
+            'new_employees': 0,
+            'first_event': None,
+            'last_event': None,
+            'throttle_wait': 0.0,
+            'dedupe': {
+                'above_watermark': 0,
+                'overlap_in_memory': 0,
+                'db_checked': 0,
+                'preloaded_keys': 0
+            }
+        }
+    
+    def classify_record(self, skud_record, state):
+        """Решает, как проверять запись на дубликат
+
+        Дедупликация по водяным знакам: выше знака РМ записей в БД нет,
+        в окне перекрытия под знаком сверяемся с подгруженным набором ключей,
+        а более старые строки проверяются запросом в БД.
+        Возвращает None для дубликата, иначе признак "нужна проверка в БД".
+        """
+        if state['first_event'] is None or skud_record.timestamp < state['first_event']:
+            state['first_event'] = skud_record.timestamp
+        if state['last_event'] is None or skud_record.timestamp > state['last_event']:
+            state['last_event'] = skud_record.timestamp
+
+        watermarks = state['watermarks']
+        dedupe = state['dedupe']
+        key = (skud_record.full_name, skud_record.timestamp, skud_record.door_location)
+        high_water = watermarks.get(skud_record.workstation)
+        check_duplicate = True
+        if high_water is not None and skud_record.timestamp > high_water:
+            dedupe['above_watermark'] += 1
+            check_duplicate = False
+        elif high_water is not None and skud_record.timestamp >= high_water - self.WATERMARK_OVERLAP:
+            # Окно только своего РМ: отставший или выведенный РМ не тянет в память месяцы ключей
+            overlap_keys = state['preloaded_keys'].get(skud_record.workstation)
+            if overlap_keys is None:
+                overlap_keys = self.preload_access_keys(high_water - self.WATERMARK_OVERLAP, high_water)
+                state['preloaded_keys'][skud_record.workstation] = overlap_keys
+                dedupe['preloaded_keys'] += len(overlap_keys)
+            dedupe['overlap_in_memory'] += 1
+            check_duplicate = False
+            if key in overlap_keys:
+                state['duplicates'] += 1
+                return None
+        else:
+            dedupe['db_checked'] += 1
+
+        # Повтор строки внутри самого файла
+        if key in state['run_keys']:
+            state['duplicates'] += 1
+            return None
+        state['run_keys'].add(key)
+        return check_duplicate
+    
+    def ingest_record(self, skud_record, state):
+        """Записывает одну распарсенную запись СКУД с дедупликацией, возвращает True для новой записи"""
+        check_duplicate = self.classify_record(skud_record, state)
+        if check_duplicate is None:
+            return False
+
+        # Проверяем, новый ли это сотрудник
+        cursor = self.connection.cursor()
+        cursor.execute(self.dialect.sql("SELECT id FROM employees WHERE full_name = %s"), (skud_record.full_name,))
+        existing_employee = cursor.fetchone()
+        
+        # Добавляем запись
+        if self.add_access_log(skud_record, check_duplicate=check_duplicate):
+            state['new_records'] += 1
+            
+            # Считаем новых сотрудников
+            if not existing_employee:
+                state['new_employees'] += 1
+            return True
+        state['duplicates'] += 1
+        return False
+    
+    def resolve_employee_ids(self, records, state):
+        """Возвращает {ФИО: id} для записей пакета, создавая недостающих сотрудников
+
+        Известные id кэшируются на время прохода. Новые сотрудники создаются через
+        INSERT ... ON CONFLICT DO NOTHING: если то же ФИО одновременно создает
+        другой импорт, строка не задвоится, а id будет взят из уже созданной.
+        """
+        employee_ids = state.setdefault('employee_ids', {})
+        cursor = self.connection.cursor()
+
+        missing = sorted({r.full_name for r in records} - employee_ids.keys())
+        if missing:
+            cursor.execute("SELECT full_name, id FROM employees WHERE full_name = ANY(%s)", (missing,))
+            employee_ids.update(cursor.fetchall())
+            missing = [name for name in missing if name not in employee_ids]
+
+        if missing:
+            if 'unknown_ids' not in state:
+                state['unknown_ids'] = self.get_or_create_unknown_ids()
+            dept_id, pos_id = state['unknown_ids']
+            cards = {}
+            for r in records:
+                if r.full_name in missing and r.card_number and not cards.get(r.full_name):
+                    cards[r.full_name] = r.card_number
+            created = psycopg2.extras.execute_values(cursor, """
+                INSERT INTO employees (full_name, department_id, position_id, card_number, is_active)
+                VALUES %s
+                ON CONFLICT (full_name) DO NOTHING
+                RETURNING full_name, id
+            """, [(name, dept_id, pos_id, cards.get(name, '')) for name in missing],
+                template="(%s, %s, %s, %s, TRUE)", page_size=self.BULK_PAGE_SIZE, fetch=True)
+            employee_ids.update(created)
+            state['new_employees'] += len(created)
+            for name, employee_id in created:
+                print(f"➕ Создан новый сотрудник: {name} (ID: {employee_id}) со службой/должностью 'Неопределено'")
+            # Сотрудники, созданные параллельным импортом
+            missing = [name for name in missing if name not in employee_ids]
+            if missing:
+                cursor.execute("SELECT full_name, id FROM employees WHERE full_name = ANY(%s)", (missing,))
+                employee_ids.update(cursor.fetchall())
+
+        # Номер карты дописывается сотрудникам, у которых его еще нет
+        cards = {}
+        for r in records:
+            if r.card_number and r.card_number.strip():
+                cards.setdefault(employee_ids[r.full_name], r.card_number)
+        if cards:
+            psycopg2.extras.execute_values(cursor, """
+                UPDATE employees AS e
+                SET card_number = v.card_number, updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v(id, card_number)
+                WHERE e.id = v.id AND (e.card_number IS NULL OR e.card_number = '')
+            """, list(cards.items()), page_size=self.BULK_PAGE_SIZE)
+        return employee_ids
+    
+    def resolve_employee_ids_sqlite(self, records, state):
+        """resolve_employee_ids для SQLite: executemany вместо execute_values"""
+        employee_ids = state.setdefault('employee_ids', {})
+        cursor = self.connection.cursor()
+
+        def select_ids(names):
+            # SQLite ограничивает число параметров запроса
+            for start in range(0, len(names), self.SQLITE_MAX_PARAMS):
+                chunk = names[start:start + self.SQLITE_MAX_PARAMS]
+                cursor.execute(f"SELECT full_name, id FROM employees WHERE full_name IN ({', '.join('?' * len(chunk))})",
+                               chunk)
+                employee_ids.update((row[0], row[1]) for row in cursor.fetchall())
+
+        missing = sorted({r.full_name for r in records} - employee_ids.keys())
+        if missing:
+            select_ids(missing)
+            missing = [name for name in missing if name not in employee_ids]
+
+        if missing:
+            if 'unknown_ids' not in state:
+                state['unknown_ids'] = self.get_or_create_unknown_ids()
+            dept_id, pos_id = state['unknown_ids']
+            cards = {}
+            for r in records:
+                if r.full_name in missing and r.card_number and not cards.get(r.full_name):
+                    cards[r.full_name] = r.card_number
+            changes = self.connection.total_changes
+            cursor.executemany("""
+                INSERT INTO employees (full_name, department_id, position_id, card_number, is_active)
+                VALUES (?, ?, ?, ?, 1)
+                ON CONFLICT (full_name) DO NOTHING
+            """, [(name, dept_id, pos_id, cards.get(name, '')) for name in missing])
+            state['new_employees'] += self.connection.total_changes - changes
+            select_ids(missing)
+            for name in missing:
+                print(f"➕ Создан новый сотрудник: {name} (ID: {employee_ids[name]}) со службой/должностью 'Неопределено'")
+
+        # Номер карты дописывается сотрудникам, у которых его еще нет
+        cards = {}
+        for r in records:
+            if r.card_number and r.card_number.strip():
+                cards.setdefault(employee_ids[r.full_name], r.card_number)
+        if cards:
+            cursor.executemany("""
+                UPDATE employees SET card_number = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND (card_number IS NULL OR card_number = '')
+            """, [(card_number, employee_id) for employee_id, card_number in cards.items()])
+        return employee_ids
+    
+    def write_records_sqlite(self, records, state):
+        """Пакетная запись в SQLite одним executemany; повторы отсекает UNIQUE access_logs"""
+        employee_ids = self.resolve_employee_ids_sqlite(records, state)
+        changes = self.connection.total_changes
+        self.connection.cursor().executemany("""
+            INSERT INTO access_logs (employee_id, access_datetime, access_type, door_location, card_number)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        """, [(
+            employee_ids[r.full_name],
+            self.dialect.param(r.timestamp),
+            access_type_for(r.direction),
+            r.door_location,
+            r.card_number or ''
+        ) for r in records])
+        inserted = self.connection.total_changes - changes
+
+        # Пропущенные вставкой записи уже есть в БД, поэтому водяной знак
+        # можно двигать по всем записям пакета
+        for r in records:
+            self.note_committed_event(r)
+        state['new_records'] += inserted
+        state['duplicates'] += len(records) - inserted
+        return inserted
+    
+    def write_records(self, records, state):
+        """Пакетная запись распарсенных записей, без фиксации транзакции
+
+        Дубликаты отсекаются по водяным знакам, а записи, требующие проверки в БД,
+        сверяются одним запросом на пакет. Возвращает число новых записей.
+        """
+        to_write = []
+        to_check = []
+        for skud_record in records:
+            check_duplicate = self.classify_record(skud_record, state)
+            if check_duplicate is None:
+                continue
+            to_write.append(skud_record)
+            if check_duplicate:
+                to_check.append(skud_record)
+        if not to_write:
+            return 0
+
+        if self.throttle is not None:
+            if self.db_type == "postgresql":
+                # Нагрузку API видно только через ingest_load_signals, если импорт в другом процессе
+                self.throttle.poll_shared(self.connection.cursor())
+            # Ждем своей доли бюджета записи, пока отчеты API под нагрузкой
+            state['throttle_wait'] += self.throttle.acquire(len(to_write))
+
+        if self.db_type != "postgresql":
+            return self.write_records_sqlite(to_write, state)
+
+        employee_ids = self.resolve_employee_ids(to_write, state)
+        cursor = self.connection.cursor()
+
+        if to_check:
+            existing = set(psycopg2.extras.execute_values(cursor, """
+                SELECT al.employee_id, al.access_datetime, al.door_location
+                FROM access_logs al
+                JOIN (VALUES %s) AS v(employee_id, access_datetime, door_location)
+                  ON al.employee_id = v.employee_id
+                 AND al.access_datetime = v.access_datetime
+                 AND al.door_location = v.door_location
+            """, [(employee_ids[r.full_name], r.timestamp, r.door_location) for r in to_check],
+                template="(%s, %s::timestamp, %s)", page_size=self.BULK_PAGE_SIZE, fetch=True))
+            if existing:
+                before = len(to_write)
+                to_write = [r for r in to_write
+                            if (employee_ids[r.full_name], r.timestamp, r.door_location) not in existing]
+                state['duplicates'] += before - len(to_write)
+            if not to_write:
+                return 0
+
+        inserted = psycopg2.extras.execute_values(cursor, """
+            INSERT INTO access_logs (employee_id, access_datetime, access_type, door_location, card_number)
+            VALUES %s
+            ON CONFLICT DO NOTHING
+            RETURNING employee_id, access_datetime, door_location
+        """, [(
+            employee_ids[r.full_name],
+            r.timestamp,
+            access_type_for(r.direction),
+            r.door_location,
+            r.card_number or ''
+        ) for r in to_write], page_size=self.BULK_PAGE_SIZE, fetch=True)
+
+        inserted_keys = set(inserted)
+        for r in to_write:
+            if (employee_ids[r.full_name], r.timestamp, r.door_location) in inserted_keys:
+                self.note_committed_event(r)
+        state['new_records'] += len(inserted)
+        state['duplicates'] += len(to_write) - len(inserted)
+        return len(inserted)
+    
+    def dedupe_summary(self, state):
+        """Статистика дедупликации прохода для details импорта"""
+        dedupe = state['dedupe']
+        return dict(dedupe,
+                    watermark_sources=len(state['watermarks']),
+                    queries_saved=dedupe['above_watermark'] + dedupe['overlap_in_memory'])
+    
+    def throttle_summary(self, state):
+        """Состояние ограничителя записи и время ожидания прохода"""
+        if self.throttle is None:
+            return {'mode': 'off', 'waited_sec': 0.0}
+        return dict(self.throttle.snapshot(), waited_sec=round(state['throttle_wait'], 2))
+    
+    # Сколько строк отправлять одним запросом при пакетной записи
+    BULK_PAGE_SIZE = 1000
+
+    # Сколько параметров передавать в один запрос SQLite (старые сборки ограничены 999)
+    SQLITE_MAX_PARAMS = 500
+
+    # Окно перекрытия под водяным знаком, ключи которого подгружаются в память.
+    # Строки старше окна проверяются на дубликаты по-старому, запросом в БД.
+    WATERMARK_OVERLAP = timedelta(days=1)
+
+    def process_skud_file(self, file_path, job=None, source='api', use_manifest=True,
+                          config_path="postgres_config.ini"):
+        """Обрабатывает файл СКУД и возвращает результат для API
+
+        job - необязательная задача очереди импорта (ingest_jobs.IngestJob):
+        в нее пишется прогресс, и через нее же приходит запрос на отмену.
+        source - откуда пришел файл ('upload', 'folder', 'cli', ...), пишется в манифест.
+        use_manifest - сверять файл с ingest_files: уже загруженный файл пропускается,
+        а файл, продолжающий загруженный, читается с сохраненного смещения.
+        config_path - конфигурация с фильтрами [FILTERING] и настройками конвейера [INGEST].
+        """
         
         if not self.connect():
             return {
@@ -522,68 +929,340 @@ class SkudDatabaseIntegrator:
         print(f"📂 Обработка файла: {file_path}")
 
         # Загружаем конфигурацию
-        config_path = "postgres_config.ini"  # Используем PostgreSQL конфигурацию
         config = create_real_skud_config(config_path)
         
         total_lines = 0
-        new_records = 0
-        duplicates = 0
         errors = 0
-        new_employees = 0
+        cancelled = False
+        started = time.time()
+        state = None
+
+        manifest = None
+        manifest_id = None
+        plan = None
         
         try:
-            with open(file_path, 'r', encoding='windows-1251') as f:
-                for line_num, line in enumerate(f, 1):
-                    total_lines += 1
-                    
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Парсим строку
-                    skud_record = parse_real_skud_line(line, line_num, config)
-                    
-                    if skud_record:
-                        # Проверяем, новый ли это сотрудник
-                        cursor = self.connection.cursor()
-                        cursor.execute("SELECT id FROM employees WHERE full_name = %s", (skud_record.full_name,))
-                        existing_employee = cursor.fetchone()
-                        
-                        # Добавляем запись
-                        if self.add_access_log(skud_record):
-                            new_records += 1
-                            
-                            # Считаем новых сотрудников
-                            if not existing_employee:
-                                new_employees += 1
-                        else:
-                            duplicates += 1
-                    else:
-                        errors += 1
+            if use_manifest and self.db_type == "postgresql":
+                manifest = IngestManifest(self.connection)
+                plan = manifest.plan(file_path)
+                if plan.action == 'skip':
+                    manifest.record_skip(plan, file_path, source)
+                    print(f"⏭ Файл уже загружен ранее (ingest_files #{plan.matched_file_id}), пропускаем")
+                    return {
+                        'success': True,
+                        'skipped': True,
+                        'details': {
+                            'processed_lines': 0,
+                            'new_access_records': 0,
+                            'new_employees': 0,
+                            'duplicates': 0,
+                            'errors': 0,
+                            'manifest': {'action': 'skip', 'matched_file_id': plan.matched_file_id}
+                        }
+                    }
+                manifest_id = manifest.start(plan, file_path, source)
+                if plan.action == 'resume':
+                    print(f"⏩ Продолжаем загрузку от ingest_files #{plan.matched_file_id}: "
+                          f"читаем с байта {plan.offset} (строка {plan.line_number})")
+
+            state = self.new_ingest_state()
+            self.batch_mode = True
+            self.source_file = os.path.basename(file_path)
+
+            start_offset = plan.offset if plan else 0
+            start_line = plan.line_number if plan else 0
+
+            if job is not None:
+                job.report_progress(phase='parsing')
+
+            settings = load_pipeline_settings(config_path)
+            pipeline = IngestPipeline(config, settings['batch_size'], settings['queue_depth'])
+            lines_done = [0]
+
+            def write_batch(batch):
+                # Пакет, водяные знаки и контрольная точка фиксируются одной транзакцией
+                self.write_records(batch.lines, state)
+                self.checkpoint(manifest, manifest_id, batch.committed_offset, batch.committed_line,
+                                state['new_records'], state['duplicates'])
+                lines_done[0] += batch.line_count
+                if job is not None:
+                    job.report_progress(lines_parsed=lines_done[0], rows_inserted=state['new_records'],
+                                        duplicates=state['duplicates'])
+                    job.set_throttle(self.throttle_summary(state))
+
+            run = pipeline.run(file_path, start_offset, start_line, write_batch,
+                               should_stop=(lambda: job.cancel_requested) if job is not None else None)
+
+            total_lines = run['total_lines']
+            errors = run['errors']
+            cancelled = run['cancelled']
+            committed_offset = run['committed_offset']
+            committed_line = run['committed_line']
+            line_num = run['line_count']
             
+            new_records = state['new_records']
+            duplicates = state['duplicates']
+
+            if job is not None:
+                job.report_progress(lines_parsed=total_lines, rows_inserted=new_records, duplicates=duplicates)
+
+            duration_ms = int((time.time() - started) * 1000)
             result = {
-                'success': True,
+                'success': not cancelled,
                 'details': {
                     'processed_lines': total_lines,
                     'new_access_records': new_records,
-                    'new_employees': new_employees,
+                    'new_employees': state['new_employees'],
                     'duplicates': duplicates,
-                    'errors': errors
+                    'errors': errors,
+                    'dedupe': self.dedupe_summary(state),
+                    'throttle': self.throttle_summary(state)
                 }
             }
+            if 'pipeline' in run:
+                result['details']['pipeline'] = run['pipeline']
+            if plan:
+                result['details']['manifest'] = {
+                    'action': plan.action,
+                    'file_id': manifest_id,
+                    'matched_file_id': plan.matched_file_id,
+                    'start_offset': plan.offset
+                }
+
+            if cancelled:
+                if manifest_id:
+                    manifest.fail(manifest_id, 'cancelled', 'Импорт отменен', duration_ms)
+                result['cancelled'] = True
+                result['error'] = 'Импорт отменен'
+                print(f"⏹ Импорт отменен: {new_records} новых записей успели сохраниться")
+                return result
+
+            if manifest_id:
+                manifest.finish(manifest_id, line_num, committed_offset, committed_line,
+                                state['first_event'], state['last_event'], new_records, duplicates, duration_ms)
             
-            print(f"✅ Файл обработан: {new_records} новых записей, {new_employees} новых сотрудников")
+            print(f"✅ Файл обработан: {new_records} новых записей, {state['new_employees']} новых сотрудников")
+            if state['throttle_wait'] >= 1:
+                print(f"🐢 Запись притормаживалась ради отчетов: {state['throttle_wait']:.1f} сек ожидания")
+            if 'pipeline' in run:
+                print(f"⏱ Узкое место конвейера: {run['pipeline']['bottleneck']} "
+                      f"({run['pipeline']['stages'][run['pipeline']['bottleneck']]['busy_sec']} сек работы)")
             return result
             
         except Exception as e:
             print(f"❌ Ошибка обработки файла: {e}")
+            if self.batch_mode:
+                # Незафиксированный пакет откатывается, водяные знаки и каталог по нему не двигаем
+                self.committed_high_water = {}
+                self.touched_days = {}
+            if manifest_id:
+                try:
+                    manifest.fail(manifest_id, 'failed', str(e), int((time.time() - started) * 1000))
+                except Exception as manifest_error:
+                    print(f"⚠️ Не удалось обновить манифест: {manifest_error}")
             return {
                 'success': False,
                 'error': str(e)
             }
         finally:
+            self.batch_mode = False
             if self.connection:
+                self.close_with_watermarks()
+            self.source_file = None
+    
+    def validate_skud_file(self, file_path, employee_names=None, config_path="postgres_config.ini"):
+        """Режим validate: отчет о содержимом файла без подключения к БД и без записи
+
+        employee_names - ФИО из снимка справочника (ingest_validate.load_employee_snapshot).
+        """
+        config = create_real_skud_config(config_path)
+        return validate_skud_file(file_path, config, employee_names)
+    
+    def process_records(self, records, job=None, source='events'):
+        """Записывает пакет уже распарсенных записей (RealSkudRecord) одной транзакцией
+
+        Используется приемом событий /ingest/events; дедупликация та же, что и для файлов.
+        """
+        if not self.connect():
+            return {
+                'success': False,
+                'error': 'Ошибка подключения к базе данных'
+            }
+        
+        self.create_test_tables()
+        started = time.time()
+        
+        try:
+            state = self.new_ingest_state()
+            self.batch_mode = True
+            if job is not None:
+                job.report_progress(phase='parsing')
+            
+            if job is not None and job.cancel_requested:
+                return {'success': False, 'cancelled': True, 'error': 'Импорт отменен'}
+            self.write_records(records, state)
+            
+            self.checkpoint()
+            if job is not None:
+                job.report_progress(lines_parsed=len(records), rows_inserted=state['new_records'],
+                                    duplicates=state['duplicates'])
+                job.set_throttle(self.throttle_summary(state))
+            
+            print(f"📨 Пакет событий ({source}): {state['new_records']} новых записей из {len(records)} "
+                  f"за {time.time() - started:.2f} сек")
+            return {
+                'success': True,
+                'details': {
+                    'processed_lines': len(records),
+                    'new_access_records': state['new_records'],
+                    'new_employees': state['new_employees'],
+                    'duplicates': state['duplicates'],
+                    'errors': 0,
+                    'dedupe': self.dedupe_summary(state),
+                    'throttle': self.throttle_summary(state)
+                }
+            }
+        
+        except Exception as e:
+            print(f"❌ Ошибка записи пакета событий: {e}")
+            self.connection.rollback()
+            self.committed_high_water = {}
+            self.touched_days = {}
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            self.batch_mode = False
+            if self.connection:
+                self.close_with_watermarks()
+    
+    def refresh_catalog(self):
+        """Пересчитывает строки data_catalog дней, записанных с прошлого пересчета"""
+        if self.catalog_days and self.db_type == "postgresql":
+            refresh_days(self.connection.cursor(), self.catalog_days)
+            self.connection.commit()
+        self.catalog_days = {}
+
+    def close_with_watermarks(self):
+        """Сохраняет водяные знаки записанных событий, обновляет data_catalog и закрывает соединение"""
+        try:
+            self.connection.rollback()
+            self.save_watermarks()
+            self.refresh_catalog()
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить водяные знаки: {e}")
+        finally:
+            if not self.keep_connection:
                 self.connection.close()
+    
+    def close(self):
+        """Закрывает соединение (в том числе оставленное открытым keep_connection)"""
+        if self.connection is not None:
+            self.connection.close()
+
+def load_db_config(config_path="postgres_config.ini"):
+    """Параметры подключения для SkudDatabaseIntegrator из секции [DATABASE]"""
+    config = configparser.ConfigParser()
+    config.read(config_path, encoding='utf-8')
+    return {
+        'host': config.get('DATABASE', 'host', fallback='localhost'),
+        'port': config.getint('DATABASE', 'port', fallback=5432),
+        'database': config.get('DATABASE', 'database', fallback='skud_db'),
+        'user': config.get('DATABASE', 'user', fallback='postgres'),
+        'password': config.get('DATABASE', 'password', fallback='password')
+    }
+
+def process_skud_files(file_paths, db_config, workers=3, source='folder', on_result=None, jobs=None, bulk=False,
+                       config_path="postgres_config.ini"):
+    """Параллельный импорт нескольких файлов СКУД (например, выгрузок за неделю после простоя)
+
+    Файлы обрабатывает ограниченный пул потоков; у каждого воркера свой интегратор
+    и одно соединение на все его файлы. Сотрудники создаются через ON CONFLICT,
+    поэтому одно и то же новое ФИО из двух файлов не задвоится, а повторы записей
+    отсекает уникальный ключ access_logs.
+    on_result(file_path, result) вызывается в вызывающем потоке по мере готовности файлов.
+    jobs - необязательный {путь: IngestJob} для прогресса и отмены по каждому файлу.
+    bulk - массовая загрузка (см. SkudDatabaseIntegrator.bulk_mode).
+    config_path - фильтры и настройки конвейера для каждого файла (см. process_skud_file).
+    Возвращает сводку по всем файлам.
+    """
+    local = threading.local()
+    integrators = []
+    integrators_lock = threading.Lock()
+
+    def worker_integrator():
+        if not hasattr(local, 'integrator'):
+            local.integrator = SkudDatabaseIntegrator(db_type="postgresql", **db_config)
+            local.integrator.keep_connection = True
+            if bulk:
+                local.integrator.bulk_mode = True
+                local.integrator.throttle = None
+            with integrators_lock:
+                integrators.append(local.integrator)
+        return local.integrator
+
+    def ingest(file_path):
+        started = time.time()
+        job = jobs.get(file_path) if jobs else None
+        if job is not None and job.cancel_requested:
+            # Отмена пришла до начала файла: не трогаем ни БД, ни манифест
+            return {'success': False, 'cancelled': True, 'error': 'Импорт отменен', 'seconds': 0.0}
+        try:
+            result = worker_integrator().process_skud_file(file_path, job=job, source=source,
+                                                           config_path=config_path)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        result['seconds'] = round(time.time() - started, 2)
+        return result
+
+    summary = {
+        'files': len(file_paths),
+        'succeeded': 0,
+        'skipped': 0,
+        'failed': 0,
+        'cancelled': 0,
+        'processed_lines': 0,
+        'new_access_records': 0,
+        'new_employees': 0,
+        'duplicates': 0,
+        'workers': max(1, min(workers, len(file_paths))),
+        'results': []
+    }
+    started = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=summary['workers'], thread_name_prefix='file-ingest') as executor:
+            futures = {executor.submit(ingest, file_path): file_path for file_path in sorted(file_paths)}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                result = future.result()
+                details = result.get('details', {})
+                if result.get('skipped'):
+                    summary['skipped'] += 1
+                elif result.get('cancelled'):
+                    summary['cancelled'] += 1
+                elif result['success']:
+                    summary['succeeded'] += 1
+                else:
+                    summary['failed'] += 1
+                for key in ('processed_lines', 'new_access_records', 'new_employees', 'duplicates'):
+                    summary[key] += details.get(key, 0)
+                summary['results'].append({
+                    'file': os.path.basename(file_path),
+                    'success': result['success'],
+                    'skipped': result.get('skipped', False),
+                    'cancelled': result.get('cancelled', False),
+                    'new_access_records': details.get('new_access_records', 0),
+                    'seconds': result['seconds'],
+                    'error': result.get('error')
+                })
+                if on_result is not None:
+                    on_result(file_path, result)
+    finally:
+        for integrator in integrators:
+            integrator.close()
+    summary['elapsed_sec'] = round(time.time() - started, 2)
+    return summary
 
 def main():
     """Основная функция для тестирования интеграции"""
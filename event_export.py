@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Выгрузка сырых событий access_logs (PostgreSQL)
+
+    python event_export.py 2025-06-01 2025-06-30 --out june.csv
+    python event_export.py 2025-06-01 2025-06-30 --format ndjson --doors "Турникет 1" | gzip > june.ndjson.gz
+    python event_export.py 2025-06-01 2025-06-30 --employees 12,40 --departments 3
+
+События за период (включительно) вместе с ФИО и отделом сотрудника, в порядке
+времени, с фильтрами по сотрудникам, отделам и дверям. API (/access-events/export)
+читает их серверным курсором пачками по EXPORT_ITERSIZE и отдает потоком, память
+не растет с периодом. Командная строка отдает выгрузку самому PostgreSQL:
+COPY ... TO STDOUT через copy_expert, в тех же колонках и формате.
+
+Форматы: csv (UTF-8 с BOM, разделитель ';', как выгрузка расписания) и ndjson
+(объект JSON на строку).
+
+Коды выхода: 0 - успешно, 2 - ошибка аргументов, 3 - нет подключения к БД.
+"""
+
+import argparse
+import csv
+import io
+import sys
+from datetime import date, datetime, time, timedelta
+
+EXIT_OK = 0
+EXIT_USAGE = 2
+EXIT_NO_DB = 3
+
+FORMATS = ('csv', 'ndjson')
+
+EXPORT_COLUMNS = ('id', 'access_datetime', 'employee_id', 'full_name', 'department_id', 'department_name',
+                  'access_type', 'door_location', 'card_number')
+
+# Строк за одно обращение к серверному курсору
+EXPORT_ITERSIZE = 5000
+
+# Строк в одном куске потока API
+EXPORT_CHUNK_ROWS = 1000
+
+EVENTS_SQL = """
+    SELECT al.id, al.access_datetime, al.employee_id, e.full_name, e.department_id, d.name AS department_name,
+           al.access_type, al.door_location, al.card_number
+    FROM access_logs al
+    JOIN employees e ON e.id = al.employee_id
+    LEFT JOIN departments d ON d.id = e.department_id
+    WHERE al.access_datetime >= %(start)s AND al.access_datetime < %(end)s
+    AND (%(employee_ids)s::int[] IS NULL OR al.employee_id = ANY(%(employee_ids)s::int[]))
+    AND (%(department_ids)s::int[] IS NULL OR e.department_id = ANY(%(department_ids)s::int[]))
+    AND (%(doors)s::text[] IS NULL OR al.door_location = ANY(%(doors)s::text[]))
+    ORDER BY al.access_datetime, al.id
+"""
+
+# NDJSON собирает сам PostgreSQL (row_to_json), Python только склеивает строки
+EVENTS_NDJSON_SQL = f"SELECT row_to_json(events)::text FROM ({EVENTS_SQL}) events"
+
+# COPY в NDJSON: одна колонка с JSON, разделитель и кавычка - управляющие символы,
+# которые JSON всегда экранирует, поэтому строки выходят без изменений
+COPY_NDJSON = "COPY (SELECT row_to_json(events) FROM ({query}) events) TO STDOUT WITH (FORMAT csv, DELIMITER E'\\x1f', QUOTE E'\\x1e')"
+COPY_CSV = "COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER, DELIMITER ';')"
+
+
+def event_filters(start_day, end_day, employee_ids=None, department_ids=None, doors=None):
+    """Параметры EVENTS_SQL; пустой фильтр - без ограничения"""
+    return {
+        'start': datetime.combine(start_day, time.min),
+        'end': datetime.combine(end_day, time.min) + timedelta(days=1),
+        'employee_ids': list(employee_ids) if employee_ids else None,
+        'department_ids': list(department_ids) if department_ids else None,
+        'doors': list(doors) if doors else None
+    }
+
+
+def iter_events(conn, filters, itersize=EXPORT_ITERSIZE, query=EVENTS_SQL):
+    """Кортежи событий (EXPORT_COLUMNS) из серверного курсора
+
+    Соединение переводится в транзакцию на время чтения и возвращается в autocommit.
+    """
+    previous_autocommit = conn.autocommit
+    conn.autocommit = False
+    cursor = conn.cursor(name='event_export')
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, filters)
+        yield from cursor
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.autocommit = previous_autocommit
+
+
+def csv_chunks(rows, chunk_rows=EXPORT_CHUNK_ROWS):
+    """CSV кусками по chunk_rows строк, с BOM и заголовком"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', lineterminator='\n')
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(rows, chunk_rows=EXPORT_CHUNK_ROWS):
+    """NDJSON кусками по chunk_rows строк из строк EVENTS_NDJSON_SQL"""
+    lines = []
+    for (line,) in rows:
+        lines.append(line)
+        if len(lines) == chunk_rows:
+            lines.append('')
+            yield '\n'.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        lines.append('')
+        yield '\n'.join(lines).encode('utf-8')
+
+
+def stream_events(conn, filters, export_format):
+    """Куски выгрузки в формате csv или ndjson"""
+    if export_format == 'csv':
+        return csv_chunks(iter_events(conn, filters))
+    return ndjson_chunks(iter_events(conn, filters, query=EVENTS_NDJSON_SQL))
+
+
+def copy_events(conn, filters, export_format, out):
+    """Выгрузка через COPY TO STDOUT в бинарный поток out (для командной строки)"""
+    cursor = conn.cursor()
+    query = cursor.mogrify(EVENTS_SQL, filters).decode('utf-8')
+    if export_format == 'csv':
+        out.write('\ufeff'.encode('utf-8'))
+        cursor.copy_expert(COPY_CSV.format(query=query), out)
+    else:
+        cursor.copy_expert(COPY_NDJSON.format(query=query), out)
+    conn.rollback()
+
+
+def id_list(value):
+    """Список целых ID из строки через запятую"""
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидаются ID через запятую: {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='event-export', description='Выгрузка сырых событий СКУД')
+    parser.add_argument('start_date', type=date.fromisoformat, help='первый день, ГГГГ-ММ-ДД')
+    parser.add_argument('end_date', type=date.fromisoformat, help='последний день, ГГГГ-ММ-ДД')
+    parser.add_argument('--format', choices=FORMATS, default='csv', help='формат (%(default)s)')
+    parser.add_argument('--employees', type=id_list, help='ID сотрудников через запятую')
+    parser.add_argument('--departments', type=id_list, help='ID отделов через запятую')
+    parser.add_argument('--doors', action='append', help='дверь (точное название); можно повторять')
+    parser.add_argument('--out', help='файл результата (по умолчанию stdout)')
+    parser.add_argument('--config', default='postgres_config.ini', help='подключение, [DATABASE] (%(default)s)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.start_date > args.end_date:
+        print("❌ Начальная дата позже конечной", file=sys.stderr)
+        return EXIT_USAGE
+
+    import psycopg2
+    from database_integrator import load_db_config
+
+    db_config = load_db_config(args.config)
+    try:
+        conn = psycopg2.connect(host=db_config['host'], port=db_config['port'], dbname=db_config['database'],
+                                user=db_config['user'], password=db_config['password'])
+    except psycopg2.OperationalError as e:
+        print(f"❌ Нет подключения к БД: {e}", file=sys.stderr)
+        return EXIT_NO_DB
+
+    filters = event_filters(args.start_date, args.end_date, args.employees, args.departments, args.doors)
+    out = open(args.out, 'wb') if args.out else sys.stdout.buffer
+    try:
+        copy_events(conn, filters, args.format, out)
+    finally:
+        conn.close()
+        if args.out:
+            out.close()
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
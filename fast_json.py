@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Быстрая сериализация JSON для больших ответов отчетов и дашборда
+
+Для обычного dict FastAPI сначала проходит весь ответ jsonable_encoder (на
+чистом Python, по каждому вложенному значению) и только потом вызывает
+json.dumps. На отчетах за период это десятки тысяч словарей. FastJSONResponse
+сериализует содержимое сразу: через orjson, если он установлен, иначе через
+json.dumps с тем же компактным форматом. date, datetime и time пишутся в ISO
+8601, Decimal - числом, ключи-не-строки - строкой, как у jsonable_encoder.
+
+Эндпоинт должен вернуть FastJSONResponse сам: с response_class FastAPI все
+равно вызывает jsonable_encoder для возвращенного dict.
+"""
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость: без нее - стандартный json
+    orjson = None
+
+
+def json_default(value):
+    """Типы, которых нет в JSON, - так же, как их кодирует jsonable_encoder"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_keys(value):
+    """Копия с ключами dict, понятными json.dumps: date, datetime, time - строкой ISO 8601"""
+    if isinstance(value, dict):
+        return {
+            key if key is None or isinstance(key, (str, int, float, bool)) else json_default(key):
+                json_keys(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [json_keys(item) for item in value]
+    return value
+
+
+def dumps(content):
+    """JSON в байтах (UTF-8, без пробелов)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    options = dict(ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=json_default)
+    try:
+        return json.dumps(content, **options).encode('utf-8')
+    except TypeError:
+        # json.dumps не принимает ключи date/datetime/time; копия с такими ключами
+        # строится только при ошибке, чтобы обычные ответы не проходили лишний раз
+        return json.dumps(json_keys(content), **options).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse без прохода jsonable_encoder: содержимое сериализуется dumps"""
+
+    def render(self, content):
+        return dumps(content)
@@ -164,14 +164,15 @@ export function Dashboard() {
   const [birthdayEmployees, setBirthdayEmployees] = useState<any[]>([])
   const [birthdayLoading, setBirthdayLoading] = useState(false)
   const [showPercentage, setShowPercentage] = useState(false)
+  // Списки для модальных окон приходят вместе со статистикой из /dashboard
+  const [dayDetails, setDayDetails] = useState<any | null>(null)
   
   // Получаем сегодняшнюю дату для ограничения выбора
   const today = formatDate(new Date())
 
   useEffect(() => {
     console.log('useEffect triggered, selectedDate:', selectedDate) // Отладка
-    fetchDashboardStats(selectedDate)
-    fetchBirthdays(selectedDate)
+    fetchDashboard(selectedDate)
   }, [selectedDate])
 
   // Закрытие календаря и модального окна при клике вне их области
@@ -233,6 +234,18 @@ export function Dashboard() {
     try {
       setModalLoading(true)
       const targetDate = selectedDate || today
+
+      // Списки уже загружены вместе с дашбордом - без дополнительных запросов
+      if (dayDetails && dayDetails.date === targetDate) {
+        const details = type === 'exceptions' ? dayDetails.exceptions.exceptions
+          : type === 'birthdays' ? dayDetails.birthdays.birthdays
+          : type === 'onTime' ? dayDetails.employeeLists.onTime
+          : dayDetails.employeeLists.late
+        setEmployeeDetails(details || [])
+        setModalType(type)
+        setShowModal(true)
+        return
+      }
       
       // Для исключений используем специальный endpoint
       if (type === 'exceptions') {
@@ -363,6 +376,25 @@ export function Dashboard() {
     window.open(`/employees/${employeeId}`, '_blank')
   }
 
+  // Все виджеты дашборда одним запросом; при ошибке - отдельные эндпоинты
+  const fetchDashboard = async (date?: string) => {
+    try {
+      setLoading(true)
+      setBirthdayLoading(true)
+      const data = await apiRequest(date ? `dashboard?date=${date}` : 'dashboard')
+      setStats(data.stats)
+      setBirthdayEmployees(data.birthdays?.birthdays || [])
+      setDayDetails(data)
+      setLoading(false)
+      setBirthdayLoading(false)
+    } catch (err) {
+      console.error('Ошибка загрузки дашборда, загружаем по частям:', err)
+      setDayDetails(null)
+      fetchDashboardStats(date)
+      fetchBirthdays(date)
+    }
+  }
+
   const fetchDashboardStats = async (date?: string) => {
     try {
       setLoading(true)
@@ -14,8 +14,21 @@ interface UploadResponse {
   success: boolean
   message: string
   stats?: UploadStats
+  job_id?: string
 }
 
+interface IngestJobStatus {
+  id: string
+  phase: 'queued' | 'running' | 'parsing' | 'done' | 'failed' | 'cancelled'
+  lines_parsed: number
+  rows_inserted: number
+  rows_per_second: number
+  errors: string[]
+  details?: UploadStats | null
+}
+
+const FINISHED_PHASES = ['done', 'failed', 'cancelled']
+
 interface LogEntry {
   time: string
   message: string
@@ -28,6 +41,7 @@ export function FileUpload() {
   const [dragOver, setDragOver] = useState(false)
   const [checkingFolder, setCheckingFolder] = useState(false)
   const [logs, setLogs] = useState<LogEntry[]>([])
+  const [job, setJob] = useState<IngestJobStatus | null>(null)
 
   const handleFileUpload = async (file: File) => {
     if (!file.name.endsWith('.txt')) {
@@ -40,6 +54,7 @@ export function FileUpload() {
 
     setUploading(true)
     setResult(null)
+    setJob(null)
 
     try {
       const formData = new FormData()
@@ -68,6 +83,9 @@ export function FileUpload() {
 
       if (response.ok) {
         setResult(data)
+        if (data.job_id) {
+          pollJob(data.job_id)
+        }
       } else {
         setResult({
           success: false,
@@ -84,6 +102,33 @@ export function FileUpload() {
     }
   }
 
+  // Опрос статуса задачи импорта до ее завершения
+  const pollJob = async (jobId: string) => {
+    try {
+      const response = await fetch(`/api/ingest-jobs/${jobId}`)
+      if (!response.ok) {
+        return
+      }
+      const status: IngestJobStatus = await response.json()
+      setJob(status)
+      if (FINISHED_PHASES.includes(status.phase)) {
+        setResult({
+          success: status.phase === 'done',
+          message: status.phase === 'done'
+            ? 'Импорт завершен'
+            : status.phase === 'cancelled'
+              ? 'Импорт отменен'
+              : `Ошибка импорта: ${status.errors.join('; ')}`,
+          stats: status.details || undefined
+        })
+        return
+      }
+      setTimeout(() => pollJob(jobId), 2000)
+    } catch (error) {
+      console.error('Ошибка получения статуса импорта:', error)
+    }
+  }
+
   const handleDrop = (e: React.DragEvent) => {
     e.preventDefault()
     setDragOver(false)
@@ -285,6 +330,14 @@ export function FileUpload() {
                 {result.message}
               </p>
 
+              {job && !FINISHED_PHASES.includes(job.phase) && (
+                <div className="mt-3 space-y-1 text-sm text-green-700">
+                  <p>• Статус: {job.phase}</p>
+                  <p>• Прочитано строк: {job.lines_parsed}</p>
+                  <p>• Добавлено записей: {job.rows_inserted} ({job.rows_per_second} зап/сек)</p>
+                </div>
+              )}
+
               {result.success && result.stats && (
                 <div className="mt-3 space-y-1 text-sm text-green-700">
                   <p>• Обработано строк: {result.stats.processed_lines}</p>
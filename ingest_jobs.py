@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Очередь фоновых задач импорта файлов СКУД
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+
+class IngestQueueFull(Exception):
+    """Очередь импорта переполнена"""
+
+
+class IngestJob:
+    """Состояние одной задачи импорта"""
+
+    # Сколько последних ошибок храним в задаче
+    MAX_ERRORS = 50
+
+    def __init__(self, file_path, filename, source='upload', cleanup=True, records=None):
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        # Уже распарсенные записи (пакет /ingest/events) вместо файла
+        self.records = records
+        self.filename = filename
+        self.source = source
+        self.cleanup = cleanup
+        self.phase = 'queued'
+        self.lines_parsed = 0
+        self.rows_inserted = 0
+        self.duplicates = 0
+        self.errors = []
+        self.details = None
+        # Состояние ограничителя записи на момент последнего пакета
+        self.throttle = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def is_finished(self):
+        return self.phase in ('done', 'failed', 'cancelled')
+
+    def request_cancel(self):
+        """Помечает задачу на отмену (воркер остановится на ближайшей проверке)"""
+        self._cancel_event.set()
+
+    def discard_file(self):
+        """Удаляет файл задачи, если он временный (cleanup=True)"""
+        if self.cleanup and self.file_path and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def set_phase(self, phase):
+        with self._lock:
+            self.phase = phase
+            if phase == 'running' and self.started_at is None:
+                self.started_at = datetime.now()
+            if phase in ('done', 'failed', 'cancelled'):
+                self.finished_at = datetime.now()
+
+    def report_progress(self, lines_parsed=None, rows_inserted=None, duplicates=None, phase=None):
+        """Обновляет счетчики прогресса (вызывается из интегратора)"""
+        with self._lock:
+            if lines_parsed is not None:
+                self.lines_parsed = lines_parsed
+            if rows_inserted is not None:
+                self.rows_inserted = rows_inserted
+            if duplicates is not None:
+                self.duplicates = duplicates
+            if phase is not None:
+                self.phase = phase
+
+    def set_throttle(self, throttle):
+        """Запоминает состояние ограничителя записи (ingest_throttle)"""
+        with self._lock:
+            self.throttle = throttle
+
+    def add_error(self, message):
+        with self._lock:
+            self.errors.append(message)
+            if len(self.errors) > self.MAX_ERRORS:
+                self.errors.pop(0)
+
+    def rows_per_second(self):
+        if not self.started_at:
+            return 0.0
+        end = self.finished_at or datetime.now()
+        elapsed = (end - self.started_at).total_seconds()
+        if elapsed <= 0:
+            return 0.0
+        return round(self.rows_inserted / elapsed, 1)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'filename': self.filename,
+                'source': self.source,
+                'phase': self.phase,
+                'lines_parsed': self.lines_parsed,
+                'rows_inserted': self.rows_inserted,
+                'duplicates': self.duplicates,
+                'rows_per_second': self.rows_per_second(),
+                'errors': list(self.errors),
+                'details': self.details,
+                'throttle': self.throttle,
+                'cancel_requested': self.cancel_requested,
+                'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+                'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None,
+            }
+
+
+class IngestJobQueue:
+    """Ограниченная очередь задач импорта с пулом воркеров"""
+
+    def __init__(self, handler, workers=2, max_depth=10, history_size=200):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.history_size = history_size
+        self._queue = queue.Queue(maxsize=self.max_depth)
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._threads = []
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Запускает воркеры (повторный вызов ничего не делает)"""
+        if self._threads:
+            return
+        self._stop_event.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'ingest-worker-{i + 1}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """Останавливает воркеры; текущим задачам отправляется отмена"""
+        self._stop_event.set()
+        with self._jobs_lock:
+            for job in self._jobs.values():
+                if not job.is_finished:
+                    job.request_cancel()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, job):
+        """Ставит задачу в очередь; при переполнении выбрасывает IngestQueueFull"""
+        # Сначала регистрируем: воркер может взять задачу раньше, чем submit вернется
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._jobs_lock:
+                self._jobs.pop(job.id, None)
+            raise IngestQueueFull(f"Очередь импорта заполнена ({self.max_depth} задач)")
+        return job
+
+    def get(self, job_id):
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._jobs_lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Отменяет задачу: ожидающая снимается сразу, выполняющаяся - на ближайшей проверке"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.is_finished:
+            return job
+        job.request_cancel()
+        if job.phase == 'queued':
+            job.set_phase('cancelled')
+        return job
+
+    def _trim_history(self):
+        # Удаляем самые старые завершенные задачи, чтобы история не росла бесконечно
+        if len(self._jobs) <= self.history_size:
+            return
+        for job_id in list(self._jobs.keys()):
+            if len(self._jobs) <= self.history_size:
+                break
+            if self._jobs[job_id].is_finished:
+                del self._jobs[job_id]
+
+    def _worker_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if job.cancel_requested:
+                    if not job.is_finished:
+                        job.set_phase('cancelled')
+                    # Обработчик не вызывался - временный файл удаляем сами
+                    try:
+                        job.discard_file()
+                    except OSError as e:
+                        job.add_error(str(e))
+                    continue
+                job.set_phase('running')
+                started = time.time()
+                try:
+                    self.handler(job)
+                except Exception as e:
+                    job.add_error(str(e))
+                    job.set_phase('failed')
+                else:
+                    if not job.is_finished:
+                        job.set_phase('cancelled' if job.cancel_requested else 'done')
+                print(f"📦 Задача импорта {job.id} ({job.filename}): {job.phase} за {time.time() - started:.2f} сек")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Манифест импортированных файлов СКУД (таблица ingest_files)
+
+По хешу содержимого определяет, что делать с файлом:
+- skip   - точно такой же файл уже загружен;
+- resume - файл продолжает уже загруженный (тот же префикс) или его загрузка была прервана,
+           читаем с сохраненного смещения (контрольной точки);
+- new    - файл неизвестен, читаем целиком.
+
+Незавершенная загрузка помечена владельцем (хост:PID:метка запуска процесса)
+и отметкой жизни, которую обновляет каждая контрольная точка. Прерванными
+при старте считаются только загрузки умерших владельцев.
+"""
+
+import hashlib
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+# Размер блока чтения при хешировании
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Сколько последних загруженных файлов проверять как возможный префикс нового
+PREFIX_CANDIDATES_LIMIT = 100
+
+# Загрузка владельца с другого хоста без контрольной точки дольше этого считается брошенной
+HEARTBEAT_STALE_SECONDS = 600
+
+# Метка запуска: PID после перезапуска контейнера может совпасть, метка - нет
+BOOT_ID = uuid.uuid4().hex[:12]
+
+
+def process_owner():
+    """Владелец загрузок этого процесса: хост:PID:метка запуска"""
+    return f"{socket.gethostname()}:{os.getpid()}:{BOOT_ID}"
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_is_dead(owner, heartbeat_stale):
+    """Можно ли считать загрузку владельца owner прерванной
+
+    Владелец на этом хосте проверяется по PID, на другом - по отметке жизни.
+    """
+    if not owner:
+        return True  # загрузка до миграции 13
+    if owner == process_owner():
+        return False
+    host, pid, _ = owner.rsplit(':', 2)
+    # os.kill на Windows завершает процесс, а не проверяет его - там только отметка жизни
+    if host == socket.gethostname() and os.name != 'nt':
+        # Наш PID с другой меткой - прошлый запуск этого же процесса
+        return int(pid) == os.getpid() or not pid_alive(int(pid))
+    return heartbeat_stale
+
+
+@dataclass
+class IngestPlan:
+    """Решение манифеста по файлу"""
+    action: str                 # 'skip' | 'resume' | 'new'
+    content_hash: str
+    file_size: int
+    offset: int = 0             # байтовое смещение, с которого читать файл
+    line_number: int = 0        # сколько строк уже пройдено до offset
+    matched_file_id: Optional[int] = None
+
+
+def hash_file(file_path, prefix_sizes=()):
+    """Считает sha256 файла и (за тот же проход) хеши префиксов указанной длины
+
+    Возвращает (hex-хеш, размер, {длина_префикса: hex-хеш}).
+    """
+    sizes = sorted(set(size for size in prefix_sizes if size > 0))
+    prefix_hashes = {}
+    digest = hashlib.sha256()
+    position = 0
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            start = 0
+            # Снимаем хеш префикса, если его граница попала в этот блок
+            while sizes and sizes[0] <= position + len(chunk):
+                cut = sizes.pop(0) - position
+                digest.update(chunk[start:cut])
+                start = cut
+                prefix_hashes[position + cut] = digest.copy().hexdigest()
+            digest.update(chunk[start:])
+            position += len(chunk)
+    return digest.hexdigest(), position, prefix_hashes
+
+
+class IngestManifest:
+    """Работа с таблицей ingest_files через соединение интегратора (PostgreSQL)"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def plan(self, file_path):
+        """Определяет, нужно ли загружать файл и с какого места"""
+        cursor = self.connection.cursor()
+        file_size = os.path.getsize(file_path)
+
+        # Загруженные ранее файлы меньшего размера - кандидаты в префиксы
+        cursor.execute("""
+            SELECT id, content_hash, file_size, committed_offset, committed_line
+            FROM ingest_files
+            WHERE status = 'done' AND file_size < %s AND committed_offset > 0
+            ORDER BY finished_at DESC
+            LIMIT %s
+        """, (file_size, PREFIX_CANDIDATES_LIMIT))
+        candidates = cursor.fetchall()
+
+        content_hash, file_size, prefix_hashes = hash_file(
+            file_path, [row[2] for row in candidates]
+        )
+
+        cursor.execute("""
+            SELECT id FROM ingest_files
+            WHERE content_hash = %s AND file_size = %s AND status = 'done'
+            ORDER BY finished_at DESC
+            LIMIT 1
+        """, (content_hash, file_size))
+        identical = cursor.fetchone()
+        # Прерванная загрузка этого же файла - продолжаем с последней контрольной точки
+        cursor.execute("""
+            SELECT id, committed_offset, committed_line FROM ingest_files
+            WHERE content_hash = %s AND file_size = %s AND status = 'interrupted'
+              AND committed_offset > 0
+            ORDER BY committed_offset DESC
+            LIMIT 1
+        """, (content_hash, file_size))
+        interrupted = cursor.fetchone()
+        self.connection.commit()
+        if identical:
+            return IngestPlan('skip', content_hash, file_size, matched_file_id=identical[0])
+
+        # Самый длинный известный префикс дает наибольшую экономию
+        best = None
+        if interrupted:
+            best = IngestPlan('resume', content_hash, file_size,
+                              offset=interrupted[1], line_number=interrupted[2],
+                              matched_file_id=interrupted[0])
+        for file_id, known_hash, known_size, committed_offset, committed_line in candidates:
+            if prefix_hashes.get(known_size) != known_hash:
+                continue
+            if best is None or committed_offset > best.offset:
+                best = IngestPlan('resume', content_hash, file_size,
+                                  offset=committed_offset, line_number=committed_line,
+                                  matched_file_id=file_id)
+        if best:
+            return best
+
+        return IngestPlan('new', content_hash, file_size)
+
+    def start(self, plan, file_path, source):
+        """Регистрирует начало загрузки файла, возвращает id записи манифеста"""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            INSERT INTO ingest_files (
+                content_hash, file_size, source, file_name, file_path,
+                status, resumed_from, committed_offset, committed_line, owner, heartbeat_at
+            ) VALUES (%s, %s, %s, %s, %s, 'running', %s, %s, %s, %s, CURRENT_TIMESTAMP)
+            RETURNING id
+        """, (
+            plan.content_hash, plan.file_size, source,
+            os.path.basename(file_path), os.path.abspath(file_path),
+            plan.offset if plan.action == 'resume' else None,
+            plan.offset, plan.line_number, process_owner()
+        ))
+        file_id = cursor.fetchone()[0]
+        self.connection.commit()
+        return file_id
+
+    def record_skip(self, plan, file_path, source):
+        """Фиксирует пропуск файла-дубликата (для истории загрузок)"""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            INSERT INTO ingest_files (
+                content_hash, file_size, source, file_name, file_path,
+                status, committed_offset, finished_at, duration_ms
+            ) VALUES (%s, %s, %s, %s, %s, 'skipped', %s, CURRENT_TIMESTAMP, 0)
+        """, (
+            plan.content_hash, plan.file_size, source,
+            os.path.basename(file_path), os.path.abspath(file_path), plan.file_size
+        ))
+        self.connection.commit()
+
+    def checkpoint(self, file_id, committed_offset, committed_line, rows_inserted, duplicates):
+        """Записывает контрольную точку загрузки
+
+        Не фиксирует транзакцию: вызывающий код коммитит ее вместе с пакетом записей,
+        поэтому после сбоя смещение в манифесте всегда соответствует данным в БД.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            UPDATE ingest_files
+            SET committed_offset = %s, committed_line = %s, rows_inserted = %s, duplicates = %s,
+                heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (committed_offset, committed_line, rows_inserted, duplicates, file_id))
+
+    def recover_interrupted(self):
+        """Помечает прерванными незавершенные загрузки умерших процессов (при старте сервера)
+
+        Загрузки этого процесса и живых процессов (CLI-импорт, другой экземпляр API)
+        не трогаются: владелец на этом хосте проверяется по PID, на другом брошенной
+        считается загрузка без контрольной точки дольше HEARTBEAT_STALE_SECONDS.
+        Возвращает список (id, source, file_name, file_path, committed_offset) таких загрузок.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT id, owner,
+                   heartbeat_at IS NULL OR heartbeat_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+            FROM ingest_files
+            WHERE status = 'running'
+        """, (HEARTBEAT_STALE_SECONDS,))
+        dead = [file_id for file_id, owner, stale in cursor.fetchall() if owner_is_dead(owner, stale)]
+        rows = []
+        if dead:
+            cursor.execute("""
+                UPDATE ingest_files
+                SET status = 'interrupted', finished_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s) AND status = 'running'
+                RETURNING id, source, file_name, file_path, committed_offset
+            """, (dead,))
+            rows = cursor.fetchall()
+        self.connection.commit()
+        return rows
+
+    def finish(self, file_id, line_count, committed_offset, committed_line,
+               first_event, last_event, rows_inserted, duplicates, duration_ms):
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            UPDATE ingest_files
+            SET status = 'done',
+                line_count = %s,
+                committed_offset = %s,
+                committed_line = %s,
+                first_event = %s,
+                last_event = %s,
+                rows_inserted = %s,
+                duplicates = %s,
+                finished_at = CURRENT_TIMESTAMP,
+                duration_ms = %s
+            WHERE id = %s
+        """, (line_count, committed_offset, committed_line, first_event, last_event,
+              rows_inserted, duplicates, duration_ms, file_id))
+        self.connection.commit()
+
+    def fail(self, file_id, status, error, duration_ms):
+        """Помечает загрузку как неуспешную ('failed' или 'cancelled')"""
+        self.connection.rollback()
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            UPDATE ingest_files
+            SET status = %s, error = %s, finished_at = CURRENT_TIMESTAMP, duration_ms = %s
+            WHERE id = %s
+        """, (status, error, duration_ms, file_id))
+        self.connection.commit()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Конвейерный импорт файла СКУД: чтение -> декодирование -> разбор/фильтрация -> запись
+
+Каждая стадия работает в своем потоке и передает пакеты строк следующей
+через ограниченную очередь, поэтому разбор следующего пакета идет,
+пока предыдущий пишется в БД (psycopg2 отпускает GIL на время запроса).
+Запись (сопоставление сотрудников, дедупликация, вставка) выполняется
+в вызывающем потоке на соединении интегратора.
+
+По каждой стадии собирается время работы и ожидания: стадия с наибольшим
+временем работы - узкое место, остальные большую часть времени ждут ее.
+"""
+
+import configparser
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from real_skud_parser import parse_real_skud_line
+
+# Маркер конца потока пакетов
+_END = object()
+
+
+def load_pipeline_settings(config_path='postgres_config.ini'):
+    """Размер пакета, глубина очередей и число параллельных файлов из секции [INGEST]"""
+    config = configparser.ConfigParser()
+    config.read(config_path, encoding='utf-8')
+    return {
+        'batch_size': config.getint('INGEST', 'batch_size', fallback=1000),
+        'queue_depth': config.getint('INGEST', 'pipeline_queue_depth', fallback=4),
+        'file_workers': max(1, config.getint('INGEST', 'file_workers', fallback=3))
+    }
+
+
+class PipelineStopped(Exception):
+    """Конвейер остановлен (ошибка в другой стадии или отмена)"""
+
+
+class StageStats:
+    """Время работы и ожидания стадии"""
+
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.wait_input = 0.0
+        self.wait_output = 0.0
+        self.batches = 0
+        self.items = 0
+
+    def to_dict(self):
+        return {
+            'busy_sec': round(self.busy, 3),
+            'wait_input_sec': round(self.wait_input, 3),
+            'wait_output_sec': round(self.wait_output, 3),
+            'batches': self.batches,
+            'items': self.items
+        }
+
+
+class LineBatch:
+    """Пакет строк файла и позиция, до которой его можно зафиксировать"""
+
+    def __init__(self, first_line, lines, committed_offset, committed_line):
+        self.first_line = first_line            # номер первой строки пакета
+        self.lines = lines                      # bytes -> str -> RealSkudRecord по стадиям
+        self.committed_offset = committed_offset  # смещение после последней полной строки
+        self.committed_line = committed_line
+        self.line_count = len(lines)
+        self.errors = 0
+
+
+class IngestPipeline:
+    """Конвейер импорта одного файла"""
+
+    def __init__(self, config, batch_size=1000, queue_depth=4, encoding='windows-1251'):
+        self.config = config
+        self.batch_size = max(1, batch_size)
+        self.queue_depth = max(1, queue_depth)
+        self.encoding = encoding
+        self.stats = {name: StageStats(name) for name in ('read', 'decode', 'parse', 'write')}
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, out_queue, item, stats):
+        started = time.time()
+        while not self._stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.2)
+                stats.wait_output += time.time() - started
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def _get(self, in_queue, stats):
+        started = time.time()
+        while not self._stop.is_set():
+            try:
+                item = in_queue.get(timeout=0.2)
+                stats.wait_input += time.time() - started
+                return item
+            except queue.Empty:
+                continue
+        raise PipelineStopped()
+
+    def _run_stage(self, target, *args):
+        try:
+            target(*args)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _read(self, file_path, offset, line_number, out_queue):
+        stats = self.stats['read']
+        committed_offset, committed_line = offset, line_number
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                started = time.time()
+                lines = []
+                first_line = line_number + 1
+                for raw_line in f:
+                    lines.append(raw_line)
+                    line_number += 1
+                    offset += len(raw_line)
+                    if raw_line.endswith(b'\n'):
+                        committed_offset, committed_line = offset, line_number
+                    if len(lines) >= self.batch_size:
+                        break
+                stats.busy += time.time() - started
+                if not lines:
+                    break
+                stats.batches += 1
+                stats.items += len(lines)
+                self._put(out_queue, LineBatch(first_line, lines, committed_offset, committed_line), stats)
+        self._put(out_queue, _END, stats)
+
+    def _decode(self, in_queue, out_queue):
+        stats = self.stats['decode']
+        while True:
+            batch = self._get(in_queue, stats)
+            if batch is _END:
+                break
+            started = time.time()
+            batch.lines = [raw_line.decode(self.encoding, errors='replace').strip() for raw_line in batch.lines]
+            stats.busy += time.time() - started
+            stats.batches += 1
+            stats.items += batch.line_count
+            self._put(out_queue, batch, stats)
+        self._put(out_queue, _END, stats)
+
+    def _parse(self, in_queue, out_queue):
+        stats = self.stats['parse']
+        while True:
+            batch = self._get(in_queue, stats)
+            if batch is _END:
+                break
+            started = time.time()
+            records = []
+            for line_number, line in enumerate(batch.lines, batch.first_line):
+                if not line:
+                    continue
+                skud_record = parse_real_skud_line(line, line_number, self.config)
+                if skud_record:
+                    records.append(skud_record)
+                else:
+                    batch.errors += 1
+            batch.lines = records
+            stats.busy += time.time() - started
+            stats.batches += 1
+            stats.items += len(records)
+            self._put(out_queue, batch, stats)
+        self._put(out_queue, _END, stats)
+
+    def run(self, file_path, offset, line_number, write_batch, should_stop=None):
+        """Прогоняет файл через конвейер
+
+        write_batch(batch) вызывается в текущем потоке для каждого разобранного пакета
+        (batch.lines - список RealSkudRecord) и должен записать и зафиксировать его.
+        should_stop() проверяется перед каждым пакетом (отмена задачи).
+        Возвращает итог: строки, ошибки разбора, последняя зафиксированная позиция, время стадий.
+        """
+        raw_queue = queue.Queue(maxsize=self.queue_depth)
+        text_queue = queue.Queue(maxsize=self.queue_depth)
+        parsed_queue = queue.Queue(maxsize=self.queue_depth)
+        threads = [
+            threading.Thread(target=self._run_stage, args=(self._read, file_path, offset, line_number, raw_queue),
+                             name='ingest-read', daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._decode, raw_queue, text_queue),
+                             name='ingest-decode', daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._parse, text_queue, parsed_queue),
+                             name='ingest-parse', daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        result = {
+            'total_lines': 0,
+            'errors': 0,
+            'cancelled': False,
+            'committed_offset': offset,
+            'committed_line': line_number,
+            'line_count': line_number
+        }
+        stats = self.stats['write']
+        started = time.time()
+        try:
+            while True:
+                batch = self._get(parsed_queue, stats)
+                if batch is _END:
+                    break
+                if should_stop is not None and should_stop():
+                    result['cancelled'] = True
+                    break
+                batch_started = time.time()
+                write_batch(batch)
+                stats.busy += time.time() - batch_started
+                stats.batches += 1
+                stats.items += len(batch.lines)
+                result['total_lines'] += batch.line_count
+                result['errors'] += batch.errors
+                result['committed_offset'] = batch.committed_offset
+                result['committed_line'] = batch.committed_line
+                result['line_count'] = batch.first_line + batch.line_count - 1
+        except PipelineStopped:
+            pass
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        elapsed = time.time() - started
+        stages = {name: stage.to_dict() for name, stage in self.stats.items()}
+        result['pipeline'] = {
+            'batch_size': self.batch_size,
+            'queue_depth': self.queue_depth,
+            'elapsed_sec': round(elapsed, 3),
+            'stages': stages,
+            'bottleneck': max(self.stats.values(), key=lambda stage: stage.busy).name
+        }
+        return result
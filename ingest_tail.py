@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Слежение за растущими файлами выгрузки СКУД (tail-режим)
+
+РМ СКУД дописывает события в файл текущего дня в течение всего дня.
+TailFollower периодически читает только новые полные строки каждого файла
+и записывает их через интегратор. Позиция чтения хранится в таблице
+ingest_tail_offsets и фиксируется одной транзакцией с записями.
+
+Ротация (файл заменен новым) определяется по идентификатору файла и хешу
+его начала, усечение - по размеру меньше сохраненного смещения.
+В обоих случаях файл перечитывается с начала, повторы отсекает дедупликация.
+
+Файл, который с прошлого прохода не менялся (тот же идентификатор, размер и
+время изменения), не читается и не сверяется с БД; если изменений нет ни в
+одном файле, проход не подключается к БД. Дочитанный файл, не менявшийся
+дольше idle_after_seconds (выгрузки прошлых дней), выводится из слежения:
+его проверяют не каждый проход, а раз в RETIRED_RECHECK_SECONDS.
+"""
+
+import glob
+import hashlib
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from real_skud_parser import parse_real_skud_line, create_real_skud_config
+
+# Сколько байт начала файла хешировать для определения ротации
+HEAD_BYTES = 4096
+
+# Дочитанный файл без изменений дольше этого выводится из слежения, сек
+IDLE_AFTER_SECONDS = 3600
+
+# Как часто проверять файлы, выведенные из слежения, сек
+RETIRED_RECHECK_SECONDS = 300
+
+
+def file_identity(stat_result):
+    """Идентификатор файла в ФС (на ФС без inode будет '0:0', тогда работает только хеш начала)"""
+    return f"{stat_result.st_dev}:{stat_result.st_ino}"
+
+
+def file_signature(stat_result):
+    """Идентификатор, размер и время изменения: совпали - файл с прошлого прохода не менялся"""
+    return file_identity(stat_result), stat_result.st_size, stat_result.st_mtime_ns
+
+
+def head_hash(file_path, size):
+    """sha256 первых size байт файла"""
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read(size)).hexdigest()
+
+
+class TailFollower:
+    """Дочитывает новые строки файлов выгрузки из папки"""
+
+    def __init__(self, integrator_factory, folder, pattern='*.txt', config_path='postgres_config.ini',
+                 idle_after_seconds=IDLE_AFTER_SECONDS):
+        self.integrator_factory = integrator_factory
+        self.folder = folder
+        self.pattern = pattern
+        self.config = create_real_skud_config(config_path)
+        self.idle_after_seconds = idle_after_seconds
+        # Подпись файла (file_signature) после последнего успешного дочитывания
+        self.followed = {}
+        # Файлы, выведенные из слежения: {путь: время следующей проверки}
+        self.retired = {}
+
+    def changed_files(self, now=None):
+        """Файлы папки, изменившиеся с прошлого прохода: [(путь, stat)]"""
+        now = now or time.time()
+        files = [os.path.abspath(path) for path in sorted(glob.glob(os.path.join(self.folder, self.pattern)))]
+        present = set(files)
+        for known in (self.followed, self.retired):
+            for path in [path for path in known if path not in present]:
+                del known[path]
+
+        changed = []
+        for file_path in files:
+            if self.retired.get(file_path, 0) > now:
+                continue
+            try:
+                stat_result = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            if self.followed.get(file_path) == file_signature(stat_result):
+                if now - stat_result.st_mtime > self.idle_after_seconds:
+                    self.retired[file_path] = now + RETIRED_RECHECK_SECONDS
+                continue
+            self.retired.pop(file_path, None)
+            changed.append((file_path, stat_result))
+        return changed
+
+    def poll(self):
+        """Один проход по папке; возвращает {имя файла: число новых записей}"""
+        changed = self.changed_files()
+        if not changed:
+            return {}
+
+        integrator = self.integrator_factory()
+        if not integrator.connect():
+            raise RuntimeError('Ошибка подключения к базе данных')
+        results = {}
+        try:
+            integrator.create_test_tables()
+            for file_path, stat_result in changed:
+                inserted = self.follow_file(integrator, file_path, stat_result)
+                self.followed[file_path] = file_signature(stat_result)
+                if inserted is not None:
+                    results[os.path.basename(file_path)] = inserted
+        finally:
+            integrator.batch_mode = False
+            integrator.close_with_watermarks()
+        return results
+
+    def load_offset(self, connection, file_path):
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT file_identity, head_hash, head_size, byte_offset, line_number
+            FROM ingest_tail_offsets WHERE file_path = %s
+        """, (file_path,))
+        row = cursor.fetchone()
+        connection.commit()
+        return row
+
+    def follow_file(self, integrator, file_path, stat_result=None):
+        """Дочитывает один файл (до размера из stat_result); None - новых полных строк нет"""
+        connection = integrator.connection
+        file_path = os.path.abspath(file_path)
+        stat_result = stat_result or os.stat(file_path)
+        identity = file_identity(stat_result)
+        size = stat_result.st_size
+
+        saved = self.load_offset(connection, file_path)
+        offset, line_number, rotated = 0, 0, False
+        if saved:
+            saved_identity, saved_head_hash, saved_head_size, offset, line_number = saved
+            if size < offset:
+                # Файл усечен: перечитываем с начала
+                rotated = True
+            elif saved_identity != identity or (
+                    saved_head_size and head_hash(file_path, saved_head_size) != saved_head_hash):
+                # На месте файла уже другой файл (ротация)
+                rotated = True
+            if rotated:
+                print(f"🔄 {os.path.basename(file_path)}: файл заменен или усечен, читаем с начала")
+                offset, line_number = 0, 0
+
+        if size <= offset:
+            return None
+
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read(size - offset)
+        # Неполная последняя строка дочитается на следующем проходе
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return None
+        chunk = chunk[:end + 1]
+
+        integrator.batch_mode = True
+        integrator.source_file = os.path.basename(file_path)
+        state = integrator.new_ingest_state()
+        started = time.time()
+        try:
+            records = []
+            for raw_line in chunk.split(b'\n')[:-1]:
+                line_number += 1
+                line = raw_line.decode('windows-1251', errors='replace').strip()
+                if not line:
+                    continue
+                skud_record = parse_real_skud_line(line, line_number, self.config)
+                if skud_record:
+                    records.append(skud_record)
+            integrator.write_records(records, state)
+
+            new_offset = offset + len(chunk)
+            head_size = min(HEAD_BYTES, new_offset)
+            cursor = connection.cursor()
+            cursor.execute("""
+                INSERT INTO ingest_tail_offsets (
+                    file_path, file_identity, head_hash, head_size, byte_offset, line_number,
+                    rows_inserted, rotations, updated_at
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (file_path) DO UPDATE
+                SET file_identity = EXCLUDED.file_identity,
+                    head_hash = EXCLUDED.head_hash,
+                    head_size = EXCLUDED.head_size,
+                    byte_offset = EXCLUDED.byte_offset,
+                    line_number = EXCLUDED.line_number,
+                    rows_inserted = ingest_tail_offsets.rows_inserted + EXCLUDED.rows_inserted,
+                    rotations = ingest_tail_offsets.rotations + EXCLUDED.rotations,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (file_path, identity, head_hash(file_path, head_size), head_size,
+                  new_offset, line_number, state['new_records'], 1 if rotated else 0))
+            # Записи, водяные знаки и новое смещение фиксируются вместе
+            integrator.checkpoint()
+        except Exception:
+            connection.rollback()
+            integrator.committed_high_water = {}
+            integrator.touched_days = {}
+            raise
+        finally:
+            integrator.batch_mode = False
+            integrator.source_file = None
+
+        if state['new_records']:
+            print(f"📈 {os.path.basename(file_path)}: +{state['new_records']} записей "
+                  f"(дубликатов {state['duplicates']}) за {time.time() - started:.2f} сек")
+        return state['new_records']
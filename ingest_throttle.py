@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ограничение скорости записи импорта, чтобы массовые загрузки не мешали отчетам
+
+Бюджет записи (строк в секунду) общий для всех импортов процесса.
+Он подстраивается под задержку отчетных запросов API и исчерпание пула
+соединений API: при перегрузке бюджет уменьшается вдвое, при нормальной
+нагрузке постепенно возвращается к максимуму.
+В ночные часы (night_hours) ограничение снимается.
+
+Замеры видны только процессу API, поэтому API раз в PUBLISH_INTERVAL секунд
+публикует их в таблицу ingest_load_signals (publish), а импорт в других
+процессах (skud_ingest backfill, parse_data.py) читает ее (poll_shared).
+Если API не запущен или не публикует сигнал, импорт из командной строки
+ничем не ограничен; backfill --bulk ограничитель не использует вовсе.
+"""
+
+import configparser
+import threading
+import time
+from datetime import datetime
+
+# Как часто пересматривать бюджет, сек
+ADJUST_INTERVAL = 1.0
+
+# Через сколько секунд без новых замеров сигнал считается устаревшим
+SIGNAL_STALE_AFTER = 30.0
+
+# Вес нового замера в скользящем среднем
+EWMA_ALPHA = 0.3
+
+# Сколько секунд после исчерпания пула API считается перегруженным
+POOL_EXHAUSTED_WINDOW = 10.0
+
+# Как часто API публикует сигнал и импорт перечитывает его из ingest_load_signals, сек
+PUBLISH_INTERVAL = 5.0
+SHARED_POLL_INTERVAL = 5.0
+
+# Строки процессов, не обновлявших сигнал дольше суток, удаляются при публикации
+SIGNAL_RETENTION_SECONDS = 86400
+
+
+def parse_night_hours(value):
+    """'22-6' -> (22, 6); пустая строка - ночного режима нет"""
+    value = (value or '').strip()
+    if not value:
+        return None
+    start, end = value.split('-')
+    return int(start) % 24, int(end) % 24
+
+
+class LatencySignal:
+    """Скользящее среднее замеров (мс) с отметкой времени последнего замера"""
+
+    def __init__(self):
+        self.value = 0.0
+        self.updated_at = 0.0
+
+    def observe(self, ms):
+        if self.updated_at == 0.0:
+            self.value = ms
+        else:
+            self.value = EWMA_ALPHA * ms + (1 - EWMA_ALPHA) * self.value
+        self.updated_at = time.time()
+
+    def current(self):
+        """Среднее или 0, если замеров давно не было (нагрузки нет)"""
+        if time.time() - self.updated_at > SIGNAL_STALE_AFTER:
+            return 0.0
+        return self.value
+
+
+class IngestThrottle:
+    """Общий для процесса бюджет записи импорта"""
+
+    def __init__(self, enabled=True, max_rows_per_second=5000, min_rows_per_second=200,
+                 target_report_latency_ms=800, night_hours=None):
+        self.enabled = enabled
+        self.max_rate = float(max_rows_per_second)
+        self.min_rate = float(min(min_rows_per_second, max_rows_per_second))
+        self.target_report_latency_ms = target_report_latency_ms
+        self.night_hours = night_hours
+        self.rate = self.max_rate
+        self.report_latency = LatencySignal()
+        # Время последнего исчерпания пула API (getconn не ждет, а сразу отказывает)
+        self.pool_exhausted_at = 0.0
+        # Сигнал других процессов из ingest_load_signals (см. poll_shared)
+        self.shared_report_latency_ms = 0.0
+        self.shared_pool_exhausted = False
+        self._shared_polled_at = 0.0
+        self.throttled_seconds = 0.0
+        self._clock = 0.0
+        self._last_adjust = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_path='postgres_config.ini'):
+        """Настройки из секции [THROTTLE]"""
+        config = configparser.ConfigParser()
+        config.read(config_path, encoding='utf-8')
+        return cls(
+            enabled=config.getboolean('THROTTLE', 'enabled', fallback=True),
+            max_rows_per_second=config.getint('THROTTLE', 'max_rows_per_second', fallback=5000),
+            min_rows_per_second=config.getint('THROTTLE', 'min_rows_per_second', fallback=200),
+            target_report_latency_ms=config.getint('THROTTLE', 'target_report_latency_ms', fallback=800),
+            night_hours=parse_night_hours(config.get('THROTTLE', 'night_hours', fallback='22-6'))
+        )
+
+    def is_night(self, now=None):
+        if not self.night_hours:
+            return False
+        hour = (now or datetime.now()).hour
+        start, end = self.night_hours
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def mode(self):
+        if not self.enabled:
+            return 'off'
+        if self.is_night():
+            return 'night'
+        return 'adaptive'
+
+    def observe_report_latency(self, ms):
+        """Замер длительности отчетного запроса API"""
+        with self._lock:
+            self.report_latency.observe(ms)
+
+    def observe_pool_exhausted(self):
+        """Пул соединений API исчерпан: запрос обслужен отдельным соединением"""
+        with self._lock:
+            self.pool_exhausted_at = time.time()
+
+    def pool_exhausted(self, now=None):
+        return (now or time.time()) - self.pool_exhausted_at < POOL_EXHAUSTED_WINDOW
+
+    def publish(self, cursor, source):
+        """Записывает замеры процесса в ingest_load_signals (вызывает API по расписанию)"""
+        with self._lock:
+            now = time.time()
+            report_latency_ms = self.report_latency.current()
+            exhausted_ago = now - self.pool_exhausted_at if self.pool_exhausted(now) else None
+        cursor.execute("""
+            INSERT INTO ingest_load_signals (source, report_latency_ms, pool_exhausted_at, updated_at)
+            VALUES (%s, %s,
+                    clock_timestamp()::timestamp - make_interval(secs => %s),
+                    clock_timestamp()::timestamp)
+            ON CONFLICT (source) DO UPDATE SET
+                report_latency_ms = EXCLUDED.report_latency_ms,
+                pool_exhausted_at = EXCLUDED.pool_exhausted_at,
+                updated_at = EXCLUDED.updated_at
+        """, (source, report_latency_ms, exhausted_ago))
+        cursor.execute("""
+            DELETE FROM ingest_load_signals
+            WHERE updated_at < clock_timestamp()::timestamp - make_interval(secs => %s)
+        """, (SIGNAL_RETENTION_SECONDS,))
+
+    def poll_shared(self, cursor):
+        """Перечитывает сигнал других процессов не чаще раза в SHARED_POLL_INTERVAL секунд
+
+        Берутся только свежие строки (не старше SIGNAL_STALE_AFTER): худшая задержка
+        отчетов и было ли недавно исчерпание пула. Время - часы сервера БД, поэтому
+        расхождение часов между хостами не мешает.
+        """
+        now = time.time()
+        if now - self._shared_polled_at < SHARED_POLL_INTERVAL:
+            return
+        self._shared_polled_at = now
+        cursor.execute("""
+            SELECT COALESCE(MAX(report_latency_ms), 0),
+                   COALESCE(BOOL_OR(pool_exhausted_at >
+                                    clock_timestamp()::timestamp - make_interval(secs => %s)), FALSE)
+            FROM ingest_load_signals
+            WHERE updated_at > clock_timestamp()::timestamp - make_interval(secs => %s)
+        """, (POOL_EXHAUSTED_WINDOW, SIGNAL_STALE_AFTER))
+        report_latency_ms, pool_exhausted = cursor.fetchone()
+        with self._lock:
+            self.shared_report_latency_ms = float(report_latency_ms)
+            self.shared_pool_exhausted = bool(pool_exhausted)
+
+    def _adjust(self, now):
+        # AIMD: при перегрузке бюджет делится пополам, без нее растет на 20%
+        if now - self._last_adjust < ADJUST_INTERVAL:
+            return
+        self._last_adjust = now
+        report_latency_ms = max(self.report_latency.current(), self.shared_report_latency_ms)
+        overloaded = (report_latency_ms > self.target_report_latency_ms or
+                      self.pool_exhausted(now) or self.shared_pool_exhausted)
+        if overloaded:
+            self.rate = max(self.min_rate, self.rate / 2)
+        else:
+            self.rate = min(self.max_rate, self.rate * 1.2)
+
+    def acquire(self, rows):
+        """Резервирует запись rows строк; при необходимости ждет. Возвращает время ожидания, сек"""
+        if rows <= 0 or self.mode() != 'adaptive':
+            return 0.0
+        with self._lock:
+            now = time.time()
+            self._adjust(now)
+            start = max(now, self._clock)
+            self._clock = start + rows / self.rate
+            delay = start - now
+            self.throttled_seconds += delay
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def snapshot(self):
+        """Текущее состояние для статуса задачи импорта"""
+        with self._lock:
+            mode = self.mode()
+            return {
+                'mode': mode,
+                'rows_per_second_limit': round(self.rate) if mode == 'adaptive' else None,
+                'max_rows_per_second': round(self.max_rate),
+                'report_latency_ms': round(self.report_latency.current(), 1),
+                'shared_report_latency_ms': round(self.shared_report_latency_ms, 1),
+                'pool_exhausted': self.pool_exhausted() or self.shared_pool_exhausted,
+                'throttled_seconds_total': round(self.throttled_seconds, 2)
+            }
+
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+
+def get_throttle():
+    """Общий ограничитель процесса (создается при первом обращении)"""
+    global _throttle
+    with _throttle_lock:
+        if _throttle is None:
+            _throttle = IngestThrottle.from_config()
+        return _throttle
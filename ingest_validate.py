@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Проверка файла выгрузки СКУД без записи в БД (режим validate)
+
+Файл разбирается и фильтруется так же, как при импорте, записи дедуплицируются
+внутри файла, ФИО сверяются со снимком справочника сотрудников.
+База данных не нужна: снимок справочника - файл (см. load_employee_snapshot).
+"""
+
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from real_skud_parser import classify_real_skud_line, SKIP_EXCLUDED
+
+# Сколько неизвестных ФИО перечислять в отчете
+UNKNOWN_NAMES_LIMIT = 50
+
+
+def load_employee_snapshot(path):
+    """ФИО из снимка справочника сотрудников
+
+    Поддерживаются текстовый файл (одно ФИО в строке) и JSON: список строк
+    или любые вложенные объекты с полем full_name (например, ответ GET /employees).
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if not path.lower().endswith('.json'):
+            return {line.strip() for line in f if line.strip()}
+        data = json.load(f)
+
+    names = set()
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            names.add(item.strip())
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            if isinstance(item.get('full_name'), str):
+                names.add(item['full_name'].strip())
+            else:
+                stack.extend(value for value in item.values() if isinstance(value, (list, dict)))
+    names.discard('')
+    return names
+
+
+def validate_skud_file(file_path, config, employee_names=None, encoding='windows-1251'):
+    """Разбирает файл и возвращает отчет о его содержимом, ничего не записывая
+
+    employee_names - множество ФИО справочника; None - сверка не выполняется.
+    """
+    size = os.path.getsize(file_path)
+    events_by_type = Counter()
+    skipped = Counter()
+    excluded_names = Counter()
+    doors = Counter()
+    workstations = Counter()
+    directions = Counter()
+    names = Counter()
+    seen_keys = set()
+    duplicates = 0
+    records = 0
+    total_lines = 0
+    first_event = None
+    last_event = None
+
+    started = time.time()
+    with open(file_path, 'rb') as f:
+        for line_number, raw_line in enumerate(f, 1):
+            total_lines += 1
+            line = raw_line.decode(encoding, errors='replace').strip()
+            if not line:
+                skipped['empty'] += 1
+                continue
+            skud_record, reason, event_type = classify_real_skud_line(line, line_number, config)
+            if event_type is not None:
+                events_by_type[event_type] += 1
+            if skud_record is None:
+                skipped[reason] += 1
+                if reason == SKIP_EXCLUDED:
+                    excluded_names[line.split('\t')[8].strip()] += 1
+                continue
+
+            key = (skud_record.full_name, skud_record.timestamp, skud_record.door_location)
+            if key in seen_keys:
+                duplicates += 1
+                continue
+            seen_keys.add(key)
+            records += 1
+            names[skud_record.full_name] += 1
+            doors[skud_record.door_location] += 1
+            workstations[skud_record.workstation or '-'] += 1
+            directions[skud_record.direction] += 1
+            if first_event is None or skud_record.timestamp < first_event:
+                first_event = skud_record.timestamp
+            if last_event is None or skud_record.timestamp > last_event:
+                last_event = skud_record.timestamp
+    elapsed = time.time() - started
+
+    employees = {'distinct': len(names), 'snapshot_size': None, 'known': None, 'unknown': None,
+                 'unknown_records': None, 'unknown_names': []}
+    if employee_names is not None:
+        unknown = sorted(name for name in names if name not in employee_names)
+        employees.update(
+            snapshot_size=len(employee_names),
+            known=len(names) - len(unknown),
+            unknown=len(unknown),
+            unknown_records=sum(names[name] for name in unknown),
+            unknown_names=unknown[:UNKNOWN_NAMES_LIMIT]
+        )
+
+    return {
+        'file': file_path,
+        'size_bytes': size,
+        'lines': total_lines,
+        'records': records,
+        'duplicates_in_file': duplicates,
+        'events_by_type': dict(events_by_type.most_common()),
+        'skipped': dict(skipped),
+        'excluded_rows': skipped[SKIP_EXCLUDED],
+        'excluded_by_name': dict(excluded_names.most_common()),
+        'employees': employees,
+        'time_range': {
+            'first': first_event.strftime('%Y-%m-%d %H:%M:%S') if first_event else None,
+            'last': last_event.strftime('%Y-%m-%d %H:%M:%S') if last_event else None
+        },
+        'doors': dict(doors.most_common()),
+        'workstations': dict(workstations.most_common()),
+        'directions': dict(directions),
+        'parse_seconds': round(elapsed, 3),
+        'lines_per_second': round(total_lines / elapsed, 1) if elapsed > 0 else None,
+        'mb_per_second': round(size / 1048576 / elapsed, 2) if elapsed > 0 else None
+    }
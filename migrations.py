@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Версионные миграции схемы PostgreSQL
+
+Каждая миграция - номер, имя и список идемпотентных SQL-команд. Применяются
+один раз, по порядку, под advisory-блокировкой; номер применённой миграции
+записывается в schema_migrations. При старте сравнивается только версия.
+"""
+
+import threading
+import time
+
+# Ключ pg_advisory_lock, общий для всех процессов, применяющих миграции
+MIGRATIONS_LOCK_KEY = 7240501
+
+MIGRATIONS = [
+    (1, 'base_tables', [
+        """
+        CREATE TABLE IF NOT EXISTS departments (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL UNIQUE,
+            priority INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS positions (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL UNIQUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            id SERIAL PRIMARY KEY,
+            full_name VARCHAR(255) NOT NULL UNIQUE,
+            full_name_expanded VARCHAR(255),
+            birth_date DATE,
+            department_id INTEGER REFERENCES departments(id),
+            position_id INTEGER REFERENCES positions(id),
+            card_number VARCHAR(50),
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS access_logs (
+            id SERIAL PRIMARY KEY,
+            employee_id INTEGER NOT NULL REFERENCES employees(id),
+            access_datetime TIMESTAMP NOT NULL,
+            access_type VARCHAR(10) NOT NULL CHECK (access_type IN ('ВХОД', 'ВЫХОД', 'IN', 'OUT')),
+            door_location TEXT,
+            card_number VARCHAR(50),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(employee_id, access_datetime, door_location)
+        )
+        """,
+    ]),
+    (2, 'employee_exceptions', [
+        """
+        CREATE TABLE IF NOT EXISTS employee_exceptions (
+            id SERIAL PRIMARY KEY,
+            employee_id INTEGER NOT NULL REFERENCES employees(id),
+            exception_date DATE NOT NULL,
+            reason TEXT NOT NULL,
+            exception_type TEXT DEFAULT 'no_lateness_check',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by TEXT DEFAULT 'system',
+            UNIQUE(employee_id, exception_date)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_employee_exceptions_date ON employee_exceptions (employee_id, exception_date)",
+    ]),
+    (3, 'auth_tables', [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            full_name VARCHAR(100),
+            role INTEGER DEFAULT 3,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            created_by INTEGER REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS roles (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(50) UNIQUE NOT NULL,
+            description TEXT,
+            permissions TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            token_hash TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (4, 'department_links_and_whitelist', [
+        """
+        CREATE TABLE IF NOT EXISTS department_positions (
+            id SERIAL PRIMARY KEY,
+            department_id INTEGER NOT NULL REFERENCES departments(id),
+            position_id INTEGER NOT NULL REFERENCES positions(id),
+            UNIQUE(department_id, position_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS whitelist_departments (
+            id SERIAL PRIMARY KEY,
+            department_id INTEGER NOT NULL REFERENCES departments(id),
+            reason TEXT NOT NULL,
+            exception_type TEXT DEFAULT 'no_lateness_check',
+            is_permanent BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by TEXT DEFAULT 'system',
+            UNIQUE(department_id)
+        )
+        """,
+    ]),
+    (5, 'svod_report_employees', [
+        """
+        CREATE TABLE IF NOT EXISTS svod_report_employees (
+            id SERIAL PRIMARY KEY,
+            employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+            order_index INTEGER DEFAULT 0,
+            position_override VARCHAR(255),
+            report_date DATE,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # Таблицы, созданные старыми версиями (create_svod_table.sql / migrate_svod_table.sql)
+        "ALTER TABLE svod_report_employees ADD COLUMN IF NOT EXISTS order_index INTEGER DEFAULT 0",
+        "ALTER TABLE svod_report_employees ADD COLUMN IF NOT EXISTS position_override VARCHAR(255)",
+        "ALTER TABLE svod_report_employees ADD COLUMN IF NOT EXISTS report_date DATE",
+        "ALTER TABLE svod_report_employees ALTER COLUMN report_date DROP NOT NULL",
+        "ALTER TABLE svod_report_employees ALTER COLUMN report_date DROP DEFAULT",
+        "ALTER TABLE svod_report_employees ALTER COLUMN employee_id DROP NOT NULL",
+        "ALTER TABLE svod_report_employees DROP CONSTRAINT IF EXISTS svod_report_employees_employee_id_key",
+    ]),
+    (6, 'legacy_columns', [
+        # Колонки, которых нет в базах, созданных до появления этих полей
+        "ALTER TABLE departments ADD COLUMN IF NOT EXISTS priority INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_departments_priority ON departments(priority)",
+        "ALTER TABLE employees ADD COLUMN IF NOT EXISTS full_name_expanded VARCHAR(255)",
+        "ALTER TABLE employees ADD COLUMN IF NOT EXISTS birth_date DATE",
+    ]),
+    (7, 'access_logs_indexes', [
+        # Отчеты фильтруют по DATE(access_datetime) - нужен индекс по выражению
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_date ON access_logs ((DATE(access_datetime)))",
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_datetime ON access_logs (access_datetime)",
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_employee_datetime ON access_logs (employee_id, access_datetime)",
+        "CREATE INDEX IF NOT EXISTS idx_user_sessions_token_hash ON user_sessions (token_hash)",
+    ]),
+    (8, 'ingest_files', [
+        # Манифест загруженных файлов СКУД (ingest_manifest.py)
+        """
+        CREATE TABLE IF NOT EXISTS ingest_files (
+            id SERIAL PRIMARY KEY,
+            content_hash CHAR(64) NOT NULL,
+            file_size BIGINT NOT NULL,
+            source VARCHAR(50) NOT NULL,
+            file_name VARCHAR(255),
+            file_path TEXT,
+            status VARCHAR(20) NOT NULL DEFAULT 'running',
+            line_count INTEGER,
+            committed_offset BIGINT DEFAULT 0,
+            committed_line INTEGER DEFAULT 0,
+            resumed_from BIGINT,
+            first_event TIMESTAMP,
+            last_event TIMESTAMP,
+            rows_inserted INTEGER DEFAULT 0,
+            duplicates INTEGER DEFAULT 0,
+            error TEXT,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            duration_ms INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ingest_files_hash ON ingest_files (content_hash, file_size)",
+        "CREATE INDEX IF NOT EXISTS idx_ingest_files_status_finished ON ingest_files (status, finished_at DESC)",
+    ]),
+    (9, 'ingest_watermarks', [
+        # Водяной знак по источнику (РМ): позже high_water записей этого источника в БД нет
+        """
+        CREATE TABLE IF NOT EXISTS ingest_watermarks (
+            source VARCHAR(100) PRIMARY KEY,
+            high_water TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (10, 'ingest_tail_offsets', [
+        # Позиция чтения растущих файлов выгрузки (ingest_tail.py)
+        """
+        CREATE TABLE IF NOT EXISTS ingest_tail_offsets (
+            file_path TEXT PRIMARY KEY,
+            file_identity VARCHAR(100),
+            head_hash CHAR(64),
+            head_size INTEGER DEFAULT 0,
+            byte_offset BIGINT NOT NULL DEFAULT 0,
+            line_number INTEGER NOT NULL DEFAULT 0,
+            rows_inserted BIGINT DEFAULT 0,
+            rotations INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (11, 'attendance_daily', [
+        # Итоги посещаемости по дням для недельного тренда дашборда (attendance_daily.py);
+        # строка дня удаляется, когда меняются его записи или исключения, и пересчитывается при чтении
+        """
+        CREATE TABLE IF NOT EXISTS attendance_daily (
+            day DATE PRIMARY KEY,
+            total_employees INTEGER NOT NULL,
+            present_count INTEGER NOT NULL,
+            late_count INTEGER NOT NULL,
+            exceptions_count INTEGER NOT NULL,
+            birthdays_count INTEGER NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (12, 'data_catalog', [
+        # Покрытие данных по дням (data_catalog.py): ведет импорт, читают отчеты и /health
+        """
+        CREATE TABLE IF NOT EXISTS data_catalog (
+            day DATE PRIMARY KEY,
+            row_count BIGINT NOT NULL,
+            employee_count INTEGER NOT NULL,
+            first_event TIMESTAMP NOT NULL,
+            last_event TIMESTAMP NOT NULL,
+            source_files TEXT[] NOT NULL DEFAULT '{}',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # Заполнение по уже загруженным записям; источники - завершенные загрузки из ingest_files
+        """
+        INSERT INTO data_catalog (day, row_count, employee_count, first_event, last_event, source_files)
+        SELECT d.day, d.row_count, d.employee_count, d.first_event, d.last_event,
+               ARRAY(
+                   SELECT DISTINCT f.file_name FROM ingest_files f
+                   WHERE f.status = 'done' AND f.file_name IS NOT NULL
+                   AND f.first_event < d.day + 1 AND f.last_event >= d.day
+                   ORDER BY 1
+               )
+        FROM (
+            SELECT DATE(access_datetime) AS day, COUNT(*) AS row_count,
+                   COUNT(DISTINCT employee_id) AS employee_count,
+                   MIN(access_datetime) AS first_event, MAX(access_datetime) AS last_event
+            FROM access_logs
+            GROUP BY DATE(access_datetime)
+        ) d
+        ON CONFLICT (day) DO NOTHING
+        """,
+    ]),
+    (13, 'ingest_files_owner', [
+        # Владелец незавершенной загрузки (процесс) и отметка жизни: восстановление
+        # прерванных загрузок не трогает загрузки живых процессов
+        "ALTER TABLE ingest_files ADD COLUMN IF NOT EXISTS owner VARCHAR(255)",
+        "ALTER TABLE ingest_files ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP",
+    ]),
+    (14, 'ingest_load_signals', [
+        # Замеры нагрузки API для ограничителя записи импорта в других процессах (ingest_throttle)
+        """
+        CREATE TABLE IF NOT EXISTS ingest_load_signals (
+            source VARCHAR(255) PRIMARY KEY,
+            report_latency_ms REAL NOT NULL DEFAULT 0,
+            pool_exhausted_at TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Версия, уже проверенная в этом процессе: повторные вызовы ensure_schema бесплатны
+_verified_version = None
+_verified_lock = threading.Lock()
+
+
+def _create_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+    """)
+
+
+def get_schema_version(conn):
+    """Текущая версия схемы (0, если миграции еще не применялись)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cursor.fetchone()[0]
+
+
+def apply_migrations(conn):
+    """Применяет недостающие миграции под advisory-блокировкой, возвращает номера примененных"""
+    previous_autocommit = conn.autocommit
+    if previous_autocommit:
+        conn.autocommit = False
+    cursor = conn.cursor()
+    applied = []
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+        try:
+            _create_migrations_table(cursor)
+            conn.commit()
+            # Другой процесс мог применить миграции, пока мы ждали блокировку
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+            for version, name, statements in MIGRATIONS:
+                if version in done:
+                    continue
+                started = time.time()
+                try:
+                    for statement in statements:
+                        cursor.execute(statement)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+                        (version, name, int((time.time() - started) * 1000))
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied.append(version)
+                print(f"🗄 Миграция {version:03d}_{name} применена за {time.time() - started:.2f} сек")
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_KEY,))
+            conn.commit()
+    finally:
+        if previous_autocommit:
+            conn.autocommit = True
+    return applied
+
+
+def ensure_schema(conn):
+    """Проверяет версию схемы и при необходимости применяет миграции
+
+    В рамках процесса проверка выполняется один раз; после этого вызов ничего не стоит.
+    """
+    global _verified_version
+    if _verified_version == LATEST_VERSION:
+        return []
+    with _verified_lock:
+        if _verified_version == LATEST_VERSION:
+            return []
+        applied = []
+        version = get_schema_version(conn)
+        if not conn.autocommit:
+            conn.commit()
+        if version < LATEST_VERSION:
+            applied = apply_migrations(conn)
+        _verified_version = LATEST_VERSION
+        return applied
+
+
+def main():
+    """Ручной запуск миграций: python migrations.py"""
+    import configparser
+    import psycopg2
+
+    config = configparser.ConfigParser()
+    config.read('postgres_config.ini', encoding='utf-8')
+    conn = psycopg2.connect(
+        host=config.get('DATABASE', 'host', fallback='localhost'),
+        port=config.getint('DATABASE', 'port', fallback=5432),
+        dbname=config.get('DATABASE', 'database', fallback='skud_db'),
+        user=config.get('DATABASE', 'user', fallback='postgres'),
+        password=config.get('DATABASE', 'password', fallback='password')
+    )
+    try:
+        print(f"📋 Текущая версия схемы: {get_schema_version(conn)} (последняя: {LATEST_VERSION})")
+        conn.commit()
+        applied = apply_migrations(conn)
+        if applied:
+            print(f"✅ Применено миграций: {len(applied)}")
+        else:
+            print("✅ Схема актуальна")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
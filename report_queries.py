@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Отчетные запросы по access_logs, одинаковые для PostgreSQL и SQLite
+
+Повторяют основу отчетов API (расписание дня, история сотрудника, посещаемость
+по дням), но через sql_dialect, поэтому их можно выполнять и на встроенной
+SQLite-базе: для бенчмарков и работы без сервера PostgreSQL.
+"""
+
+from datetime import datetime, time, timedelta
+
+from sql_dialect import exit_condition
+
+
+def latest_access_date(connection, dialect):
+    """Последний день, за который есть записи доступа"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT MAX(DATE(access_datetime)) FROM access_logs")
+    row = cursor.fetchone()
+    return dialect.to_date(row[0]) if row else None
+
+
+def daily_schedule(connection, dialect, day):
+    """Первый вход и последний выход каждого сотрудника за день"""
+    access_time = dialect.time_of('al.access_datetime')
+    is_exit = exit_condition('al.door_location')
+    cursor = connection.cursor()
+    cursor.execute(dialect.sql(f"""
+        SELECT al.employee_id, e.full_name, e.department_id,
+               MIN(CASE WHEN {is_exit} THEN NULL ELSE {access_time} END) AS first_entry,
+               MAX(CASE WHEN {is_exit} THEN {access_time} END) AS last_exit,
+               COUNT(*) AS events
+        FROM access_logs al
+        JOIN employees e ON al.employee_id = e.id
+        WHERE al.access_datetime >= %s AND al.access_datetime < %s
+        GROUP BY al.employee_id, e.full_name, e.department_id
+        ORDER BY e.full_name
+    """), dialect.params(day_bounds(day)))
+    return [{
+        'employee_id': row[0],
+        'full_name': row[1],
+        'department_id': row[2],
+        'first_entry': dialect.to_time(row[3]),
+        'last_exit': dialect.to_time(row[4]),
+        'events': row[5]
+    } for row in cursor.fetchall()]
+
+
+def employee_history(connection, dialect, employee_id, start_day, end_day):
+    """Приход/уход сотрудника по дням за период (включительно)"""
+    access_time = dialect.time_of('access_datetime')
+    is_exit = exit_condition('door_location')
+    cursor = connection.cursor()
+    cursor.execute(dialect.sql(f"""
+        SELECT DATE(access_datetime) AS access_date,
+               MIN(CASE WHEN {is_exit} THEN NULL ELSE {access_time} END) AS first_entry,
+               MAX(CASE WHEN {is_exit} THEN {access_time} END) AS last_exit,
+               COUNT(*) AS events
+        FROM access_logs
+        WHERE employee_id = %s AND access_datetime >= %s AND access_datetime < %s
+        GROUP BY DATE(access_datetime)
+        ORDER BY access_date
+    """), dialect.params((employee_id, day_bounds(start_day)[0], day_bounds(end_day)[1])))
+    return [{
+        'date': dialect.to_date(row[0]),
+        'first_entry': dialect.to_time(row[1]),
+        'last_exit': dialect.to_time(row[2]),
+        'events': row[3]
+    } for row in cursor.fetchall()]
+
+
+def daily_attendance(connection, dialect, start_day, end_day):
+    """Число пришедших сотрудников и событий по дням за период (включительно)"""
+    cursor = connection.cursor()
+    cursor.execute(dialect.sql("""
+        SELECT DATE(access_datetime) AS access_date,
+               COUNT(DISTINCT employee_id) AS employees,
+               COUNT(*) AS events
+        FROM access_logs
+        WHERE access_datetime >= %s AND access_datetime < %s
+        GROUP BY DATE(access_datetime)
+        ORDER BY access_date
+    """), dialect.params((day_bounds(start_day)[0], day_bounds(end_day)[1])))
+    return [{
+        'date': dialect.to_date(row[0]),
+        'employees': row[1],
+        'events': row[2]
+    } for row in cursor.fetchall()]
+
+
+def day_bounds(day):
+    """[начало дня, начало следующего дня) - диапазон вместо DATE(col) = ..., чтобы работал индекс"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарки СКУД: разбор, импорт и отчеты API с бюджетом регрессий
+
+    python skud_bench.py run                                  # все части, сравнение с bench_baseline.json
+    python skud_bench.py run --parts parser,ingest --repeat 5
+    python skud_bench.py run --sizes 30,365,1095 --employees 500
+    python skud_bench.py run --save-baseline                  # принять результат как новую базу
+    python skud_bench.py compare bench_results/bench_20250101_120000.json
+
+Части:
+    parser - parse_real_skud_line на строку и разбор файла конвейером (без записи);
+    ingest - import_from_file (по строке), process_skud_file (пакетами) и то же в режиме bulk;
+    api    - задержка /employee-schedule, /employee-schedule-range, /dashboard-stats, /svod-report
+             и /dashboard (без кэша) на наборах данных растущего размера (дни истории, skud_workload);
+             сериализация ответа /employee-schedule-range за весь набор (до 366 дней, per_page=100):
+             стандартный путь FastAPI (jsonable_encoder + JSONResponse) и FastJSONResponse.
+
+Данные генерируются skud_workload с фиксированным seed. Импорт и отчеты идут
+в отдельную базу <database>_bench на сервере из --config (создается при
+необходимости), рабочая база не затрагивается. Эндпоинты вызываются в процессе
+через TestClient с подмененной авторизацией.
+
+Результат пишется в JSON (bench_results/). При сравнении метрика считается
+регрессией, если ухудшилась больше порога (--threshold, по умолчанию 25%).
+Пороги отдельных метрик задаются масками: --metric-threshold 'api.*=0.5'
+или секцией "thresholds" в файле базы. Разница меньше шумового минимума
+(NOISE_FLOOR) не считается регрессией.
+
+Коды выхода: 0 - без регрессий, 1 - есть регрессии, 2 - ошибка аргументов, 3 - нет подключения к БД.
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from real_skud_parser import classify_real_skud_line, create_real_skud_config
+from skud_workload import Workload, write_files
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_USAGE = 2
+EXIT_NO_DB = 3
+
+DEFAULT_BASELINE = 'bench_baseline.json'
+RESULTS_DIR = 'bench_results'
+DEFAULT_THRESHOLD = 0.25
+
+# Изменения меньше этого (в единицах метрики) - шум, а не регрессия
+NOISE_FLOOR = {'ms': 2.0, 'us': 0.5}
+
+# Последний день наборов данных (пятница): отчеты за него всегда рабочий день
+DATASET_END = date(2025, 6, 27)
+SEED = 20250627
+
+# Сотрудников в своде для /svod-report
+SVOD_EMPLOYEES = 50
+
+
+def metric(value, unit, better):
+    return {'value': round(value, 3), 'unit': unit, 'better': better}
+
+
+def best_of(func, repeat):
+    """Время каждого из repeat запусков, сек"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+@contextlib.contextmanager
+def quiet(verbose=False):
+    """Импорт и API много печатают - в отчете бенчмарка это только мешает"""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def make_day_file(folder, employees):
+    """Файл выгрузки за один рабочий день (с шумом и хвостом предыдущего дня)"""
+    workload = Workload(employees=employees, days=2, start=DATASET_END - timedelta(days=1), seed=SEED)
+    write_files(workload, folder)
+    return os.path.join(folder, f"{DATASET_END:%Y.%m.%d}.txt")
+
+
+def bench_parser(file_path, repeat):
+    config = create_real_skud_config('postgres_config.ini')
+    with open(file_path, 'r', encoding='windows-1251') as f:
+        lines = [line.rstrip('\n') for line in f]
+
+    def parse_lines():
+        for line_number, line in enumerate(lines, 1):
+            classify_real_skud_line(line, line_number, config)
+
+    per_line = min(best_of(parse_lines, repeat)) / len(lines)
+
+    from ingest_pipeline import IngestPipeline
+
+    def parse_file():
+        IngestPipeline(config).run(file_path, 0, 0, lambda batch: None)
+
+    file_seconds = min(best_of(parse_file, repeat))
+    return {
+        'parser.line_us': metric(per_line * 1e6, 'us', 'lower'),
+        'parser.file_lines_per_sec': metric(len(lines) / file_seconds, 'lines/s', 'higher'),
+    }
+
+
+class BenchDatabase:
+    """Отдельная база <database>_bench для импорта и отчетов"""
+
+    def __init__(self, db_config, database=None):
+        self.server_config = dict(db_config)
+        self.db_config = dict(db_config, database=database or f"{db_config['database']}_bench")
+
+    def connect(self):
+        import psycopg2
+        conn = psycopg2.connect(**self.db_config)
+        conn.autocommit = True
+        return conn
+
+    def prepare(self):
+        """Создает базу (если нет) и применяет миграции"""
+        import psycopg2
+        from psycopg2 import sql
+        import migrations
+
+        server = psycopg2.connect(**self.server_config)
+        server.autocommit = True
+        try:
+            cursor = server.cursor()
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (self.db_config['database'],))
+            if not cursor.fetchone():
+                # template0: кодировка UTF8 независимо от локали, с которой инициализирован сервер
+                cursor.execute(sql.SQL("CREATE DATABASE {} TEMPLATE template0 ENCODING 'UTF8'").format(
+                    sql.Identifier(self.db_config['database'])))
+        finally:
+            server.close()
+        conn = self.connect()
+        try:
+            with quiet():
+                migrations.apply_migrations(conn)
+        finally:
+            conn.close()
+
+    def reset_access_logs(self):
+        conn = self.connect()
+        try:
+            conn.cursor().execute(
+                "TRUNCATE access_logs, ingest_watermarks, ingest_files, ingest_tail_offsets, attendance_daily, data_catalog"
+            )
+        finally:
+            conn.close()
+
+    def integrator(self):
+        from database_integrator import SkudDatabaseIntegrator
+        integrator = SkudDatabaseIntegrator(db_type="postgresql", **self.db_config)
+        # Меряем пропускную способность записи, а не настройку ограничителя
+        integrator.throttle = None
+        return integrator
+
+
+def bench_ingest(database, file_path, repeat, verbose=False):
+    def per_row():
+        database.integrator().import_from_file(file_path, config_file='postgres_config.ini')
+
+    def batch(bulk=False):
+        integrator = database.integrator()
+        integrator.bulk_mode = bulk
+        result = integrator.process_skud_file(file_path, source='bench', use_manifest=False)
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'импорт не удался'))
+
+    modes = [('per_row', per_row), ('batch', batch), ('bulk', lambda: batch(bulk=True))]
+    results = {}
+    rows = None
+    for name, run in modes:
+        samples = []
+        for attempt in range(repeat + 1):
+            database.reset_access_logs()
+            with quiet(verbose):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+            # Первый прогон создает сотрудников - его не учитываем
+            if attempt:
+                samples.append(elapsed)
+        if rows is None:
+            conn = database.connect()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM access_logs")
+            rows = cursor.fetchone()[0]
+            conn.close()
+        results[f'ingest.{name}_rows_per_sec'] = metric(rows / min(samples), 'rows/s', 'higher')
+    return results
+
+
+def load_dataset(database, days, employees, verbose=False):
+    """Набор данных: days дней истории до DATASET_END и свод из первых сотрудников"""
+    from skud_workload import load_database
+
+    database.reset_access_logs()
+    workload = Workload(employees=employees, days=days, start=DATASET_END - timedelta(days=days - 1), seed=SEED)
+    with quiet(verbose):
+        stats = load_database(workload, database.integrator())
+    conn = database.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM svod_report_employees")
+        cursor.execute("""
+            INSERT INTO svod_report_employees (employee_id, order_index)
+            SELECT id, ROW_NUMBER() OVER (ORDER BY full_name) FROM employees ORDER BY full_name LIMIT %s
+        """, (SVOD_EMPLOYEES,))
+        cursor.execute("ANALYZE access_logs")
+    finally:
+        conn.close()
+    return stats['rows']
+
+
+def api_client(database):
+    """TestClient для clean_api, подключенный к базе бенчмарка, без авторизации"""
+    from fastapi.testclient import TestClient
+    import clean_api
+
+    clean_api.close_db_pool()
+    clean_api.get_db_params = lambda: {
+        'host': database.db_config['host'],
+        'port': database.db_config['port'],
+        'user': database.db_config['user'],
+        'password': database.db_config['password'],
+        'dbname': database.db_config['database']
+    }
+    clean_api.app.dependency_overrides[clean_api.get_current_user] = lambda: {
+        'id': 0, 'username': 'bench', 'role': 'root'
+    }
+    # Без with: события старта (планировщик, проверка папки) бенчмарку не нужны
+    return TestClient(clean_api.app)
+
+
+def bench_json(days, repeat):
+    """Сериализация ответа /employee-schedule-range за весь набор: до и после FastJSONResponse"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    import clean_api
+    from fast_json import FastJSONResponse
+
+    start_dt = DATASET_END - timedelta(days=min(days, 366) - 1)
+    conn = clean_api.get_db_connection()
+    try:
+        employees = list(clean_api.iter_schedule_range(conn, start_dt, DATASET_END))
+    finally:
+        conn.close()
+    payload = clean_api.schedule_range_payload(employees, start_dt.isoformat(), DATASET_END.isoformat(), 1, 100)
+    span = (DATASET_END - start_dt).days + 1
+
+    default_ms = min(best_of(lambda: JSONResponse(jsonable_encoder(payload)), repeat)) * 1000
+    fast_ms = min(best_of(lambda: FastJSONResponse(payload), repeat)) * 1000
+    return {
+        f'api.{days}d.schedule_range_{span}d.encode_default_ms': metric(default_ms, 'ms', 'lower'),
+        f'api.{days}d.schedule_range_{span}d.encode_fast_ms': metric(fast_ms, 'ms', 'lower'),
+    }
+
+
+def bench_api(database, sizes, employees, repeat, verbose=False):
+    day = DATASET_END.isoformat()
+    endpoints = [
+        ('employee_schedule', f'/employee-schedule?date={day}'),
+        ('employee_schedule_range', f'/employee-schedule-range?start_date={DATASET_END - timedelta(days=29)}'
+                                    f'&end_date={day}'),
+        ('dashboard_stats', f'/dashboard-stats?date={day}'),
+        ('svod_report', f'/svod-report?date={day}'),
+        ('dashboard', f'/dashboard?date={day}'),
+    ]
+    client = api_client(database)
+    import clean_api
+    results = {}
+    for days in sizes:
+        rows = load_dataset(database, days, employees, verbose)
+        print(f"📦 Набор {days} дн.: {rows} записей доступа", file=sys.stderr)
+        for name, url in endpoints:
+            def call():
+                # Меряем построение ответа, а не кэш дашборда
+                clean_api.invalidate_dashboard_cache()
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url}: HTTP {response.status_code} {response.text[:200]}")
+            with quiet(verbose):
+                call()  # прогрев: пул соединений, кэш справочников
+                samples = best_of(call, repeat)
+            results[f'api.{days}d.{name}.p50_ms'] = metric(statistics.median(samples) * 1000, 'ms', 'lower')
+            results[f'api.{days}d.{name}.p95_ms'] = metric(percentile(samples, 0.95) * 1000, 'ms', 'lower')
+        with quiet(verbose):
+            results.update(bench_json(days, repeat))
+    return results
+
+
+def threshold_for(name, default, thresholds):
+    """Порог метрики: последняя подходящая маска, иначе общий"""
+    value = default
+    for pattern, ratio in thresholds.items():
+        if fnmatch.fnmatchcase(name, pattern):
+            value = ratio
+    return value
+
+
+def compare(results, baseline, default_threshold=DEFAULT_THRESHOLD, thresholds=None):
+    """Сравнивает метрики с базой; возвращает строки (метрика, база, сейчас, изменение, порог, регрессия)"""
+    thresholds = dict(baseline.get('thresholds', {}), **(thresholds or {}))
+    rows = []
+    for name, base in sorted(baseline.get('metrics', {}).items()):
+        current = results.get('metrics', {}).get(name)
+        if current is None or not base['value']:
+            continue
+        if base['better'] == 'lower':
+            worse_by = current['value'] - base['value']
+        else:
+            worse_by = base['value'] - current['value']
+        change = worse_by / base['value']
+        limit = threshold_for(name, default_threshold, thresholds)
+        noise = NOISE_FLOOR.get(base['unit'], 0)
+        regressed = change > limit and worse_by > noise
+        rows.append((name, base['value'], current['value'], change, limit, regressed))
+    return rows
+
+
+def print_comparison(rows):
+    for name, base, current, change, limit, regressed in rows:
+        mark = '❌' if regressed else '✅'
+        print(f"{mark} {name}: {base} -> {current} ({(current - base) / base:+.1%}, порог {limit:.0%})")
+    regressions = sum(1 for row in rows if row[5])
+    if regressions:
+        print(f"\n❌ Регрессий: {regressions} из {len(rows)}")
+    else:
+        print(f"\n✅ Без регрессий ({len(rows)} метрик)")
+    return regressions
+
+
+def parse_thresholds(values):
+    thresholds = {}
+    for value in values or []:
+        pattern, _, ratio = value.partition('=')
+        thresholds[pattern] = float(ratio)
+    return thresholds
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def command_run(args):
+    from database_integrator import load_db_config
+
+    parts = [part.strip() for part in args.parts.split(',') if part.strip()]
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    results = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'employees': args.employees,
+            'sizes': sizes,
+            'repeat': args.repeat,
+            'parts': parts
+        },
+        'metrics': {}
+    }
+
+    with tempfile.TemporaryDirectory() as folder:
+        day_file = make_day_file(folder, args.employees)
+        if 'parser' in parts:
+            print("⏱ Разбор...", file=sys.stderr)
+            results['metrics'].update(bench_parser(day_file, args.repeat))
+
+        if 'ingest' in parts or 'api' in parts:
+            database = BenchDatabase(load_db_config(args.config), args.database)
+            try:
+                database.prepare()
+            except Exception as e:
+                print(f"❌ Нет подключения к БД: {e}", file=sys.stderr)
+                return EXIT_NO_DB
+            if 'ingest' in parts:
+                print("⏱ Импорт...", file=sys.stderr)
+                results['metrics'].update(bench_ingest(database, day_file, args.repeat, args.verbose))
+            if 'api' in parts:
+                print("⏱ Отчеты API...", file=sys.stderr)
+                results['metrics'].update(bench_api(database, sizes, args.employees, args.repeat, args.verbose))
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    write_json(out, results)
+    for name, value in sorted(results['metrics'].items()):
+        print(f"   {name}: {value['value']} {value['unit']}")
+    print(f"💾 Результат: {out}")
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"📌 База обновлена: {args.baseline}")
+        return EXIT_OK
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ Базы {args.baseline} нет - сравнение пропущено (--save-baseline, чтобы создать)")
+        return EXIT_OK
+    rows = compare(results, load_json(args.baseline), args.threshold, parse_thresholds(args.metric_threshold))
+    return EXIT_REGRESSION if print_comparison(rows) else EXIT_OK
+
+
+def command_compare(args):
+    if not os.path.exists(args.result) or not os.path.exists(args.baseline):
+        print("❌ Нет файла результата или базы", file=sys.stderr)
+        return EXIT_USAGE
+    rows = compare(load_json(args.result), load_json(args.baseline), args.threshold,
+                   parse_thresholds(args.metric_threshold))
+    return EXIT_REGRESSION if print_comparison(rows) else EXIT_OK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='skud-bench', description='Бенчмарки разбора, импорта и отчетов СКУД')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_thresholds(command):
+        command.add_argument('--baseline', default=DEFAULT_BASELINE, help='файл базы (%(default)s)')
+        command.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                             help='допустимое ухудшение, доля (%(default)s)')
+        command.add_argument('--metric-threshold', action='append', metavar='МАСКА=ДОЛЯ',
+                             help="порог для метрик по маске, например 'api.*=0.5'")
+
+    run = subparsers.add_parser('run', help='прогнать бенчмарки и сравнить с базой')
+    run.add_argument('--parts', default='parser,ingest,api', help='части через запятую (%(default)s)')
+    run.add_argument('--sizes', default='30,365', help='размеры наборов для api, дней истории (%(default)s)')
+    run.add_argument('--employees', type=int, default=300, help='сотрудников в данных (%(default)s)')
+    run.add_argument('--repeat', type=int, default=5, help='повторов каждого замера (%(default)s)')
+    run.add_argument('--config', default='postgres_config.ini', help='сервер PostgreSQL, [DATABASE] (%(default)s)')
+    run.add_argument('--database', help='имя базы бенчмарка (по умолчанию <database>_bench)')
+    run.add_argument('--out', help=f'файл результата (по умолчанию {RESULTS_DIR}/bench_<время>.json)')
+    run.add_argument('--save-baseline', action='store_true', help='записать результат как новую базу')
+    run.add_argument('--verbose', action='store_true', help='не скрывать вывод импорта и API')
+    add_thresholds(run)
+
+    compare_command = subparsers.add_parser('compare', help='сравнить сохраненный результат с базой')
+    compare_command.add_argument('result', help='JSON-результат run')
+    add_thresholds(compare_command)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        if args.repeat < 1:
+            parser.error('--repeat должен быть не меньше 1')
+        return command_run(args)
+    return command_compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Командная строка импорта СКУД
+
+    python skud_ingest.py validate prishel_txt/*.txt --employees employees.json
+    python skud_ingest.py validate archive.txt --json
+    python skud_ingest.py backfill archive/2025.*.txt --workers 4 --bulk
+    python skud_ingest.py backfill data_input --move-to processed_real_skud --json
+
+validate разбирает файлы без записи и без подключения к БД и печатает отчет:
+события по типам, исключенные строки, неизвестные сотрудники, период,
+двери и скорость разбора.
+
+backfill загружает файлы в PostgreSQL параллельно (см. process_skud_files).
+Уже загруженные файлы пропускаются, прерванные продолжаются с контрольной
+точки манифеста ingest_files, поэтому команду можно просто перезапускать
+(например, из cron). Ctrl+C останавливает загрузку на границе пакета.
+
+Скорость записи backfill подстраивается под нагрузку API, которую сервер
+публикует в таблицу ingest_load_signals (см. ingest_throttle). Если API не
+запущен, загрузка идет без ограничения; --bulk отключает ограничитель всегда.
+
+Коды выхода: 0 - успешно (в том числе нет новых файлов), 1 - часть файлов не обработана,
+2 - ошибка аргументов, 3 - нет подключения к БД, 130 - прервано.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from real_skud_parser import create_real_skud_config
+from ingest_validate import load_employee_snapshot, validate_skud_file
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_NO_DB = 3
+EXIT_INTERRUPTED = 130
+
+# Сколько неизвестных ФИО печатать в текстовом отчете
+PRINT_NAMES_LIMIT = 20
+
+
+def expand_paths(patterns):
+    """Файлы по путям, маскам и папкам (из папки берутся *.txt)"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(glob.glob(os.path.join(pattern, '*.txt'))))
+        else:
+            matches = sorted(glob.glob(pattern))
+            files.extend(matches if matches else [pattern])
+    # Один и тот же файл по двум маскам обрабатываем один раз
+    return list(dict.fromkeys(files))
+
+
+def print_validation(report):
+    print(f"\n📄 {report['file']} ({report['size_bytes'] / 1048576:.1f} МБ)")
+    print(f"   Строк: {report['lines']} | Записей: {report['records']} | "
+          f"Повторов в файле: {report['duplicates_in_file']}")
+    print(f"   Период: {report['time_range']['first']} - {report['time_range']['last']}")
+    print("   События по типам:")
+    for event_type, count in report['events_by_type'].items():
+        print(f"      {event_type}: {count}")
+    if report['skipped']:
+        print("   Пропущено строк: " + ", ".join(f"{reason}={count}" for reason, count in report['skipped'].items()))
+    print(f"   Исключено фильтрами: {report['excluded_rows']}")
+    employees = report['employees']
+    if employees['unknown'] is None:
+        print(f"   Сотрудников в файле: {employees['distinct']} (справочник не задан)")
+    else:
+        print(f"   Сотрудников в файле: {employees['distinct']} | Нет в справочнике: {employees['unknown']} "
+              f"({employees['unknown_records']} записей)")
+        for name in employees['unknown_names'][:PRINT_NAMES_LIMIT]:
+            print(f"      ❓ {name}")
+        if employees['unknown'] > PRINT_NAMES_LIMIT:
+            print(f"      ... и еще {employees['unknown'] - PRINT_NAMES_LIMIT} (полный список: --json)")
+    print(f"   Дверей: {len(report['doors'])} | РМ: {', '.join(report['workstations'])}")
+    print(f"   ⏱ Разбор: {report['parse_seconds']} сек, {report['lines_per_second']} строк/сек, "
+          f"{report['mb_per_second']} МБ/сек")
+
+
+def cmd_validate(args):
+    files = expand_paths(args.paths)
+    employee_names = None
+    if args.employees:
+        try:
+            employee_names = load_employee_snapshot(args.employees)
+        except (OSError, ValueError) as e:
+            print(f"❌ Не удалось прочитать справочник {args.employees}: {e}", file=sys.stderr)
+            return EXIT_USAGE
+
+    config = create_real_skud_config(args.config)
+    reports = []
+    failed = 0
+    for file_path in files:
+        try:
+            report = validate_skud_file(file_path, config, employee_names, args.encoding)
+        except OSError as e:
+            failed += 1
+            report = {'file': file_path, 'error': str(e)}
+            if not args.json:
+                print(f"❌ {file_path}: {e}", file=sys.stderr)
+        else:
+            if not args.json:
+                print_validation(report)
+        reports.append(report)
+
+    if args.json:
+        json.dump({'files': reports, 'failed': failed}, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+class ProgressBar:
+    """Строка прогресса в stderr: файлы, строки и скорость записи"""
+
+    WIDTH = 30
+
+    def __init__(self, jobs, stream=sys.stderr, interval=0.5):
+        self.jobs = jobs
+        self.stream = stream
+        self.interval = interval
+        self.files_done = 0
+        self.started = time.time()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='ingest-progress', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.render()
+        self.stream.write('\n')
+        self.stream.flush()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.render()
+
+    def render(self):
+        jobs = list(self.jobs.values())
+        rows = sum(job.rows_inserted for job in jobs)
+        lines = sum(job.lines_parsed for job in jobs)
+        elapsed = max(time.time() - self.started, 0.001)
+        filled = int(self.WIDTH * self.files_done / max(len(jobs), 1))
+        self.stream.write(f"\r[{'#' * filled}{'.' * (self.WIDTH - filled)}] {self.files_done}/{len(jobs)} файлов | "
+                          f"{lines} строк | {rows} записей | {rows / elapsed:.0f} записей/сек ")
+        self.stream.flush()
+
+
+def move_file(file_path, target_folder):
+    """Перемещает загруженный файл (существующий одноименный заменяется)"""
+    os.makedirs(target_folder, exist_ok=True)
+    target = os.path.join(target_folder, os.path.basename(file_path))
+    if os.path.exists(target):
+        os.remove(target)
+    shutil.move(file_path, target)
+    return target
+
+
+def cmd_backfill(args):
+    if args.validate_only:
+        return cmd_validate(args)
+
+    files = expand_paths(args.paths)
+    missing = [file_path for file_path in files if not os.path.isfile(file_path)]
+    files = [file_path for file_path in files if os.path.isfile(file_path)]
+    for file_path in missing:
+        print(f"❌ Файл не найден: {file_path}", file=sys.stderr)
+    if not files:
+        # Пустая папка для cron - не ошибка
+        print("📭 Нет файлов для загрузки", file=sys.stderr)
+        if args.json:
+            json.dump({'files': 0, 'missing': missing}, sys.stdout, ensure_ascii=False)
+            print()
+        return EXIT_PARTIAL if missing else EXIT_OK
+
+    # psycopg2 нужен только для загрузки: validate работает и без него
+    from database_integrator import SkudDatabaseIntegrator, process_skud_files, load_db_config
+    from ingest_jobs import IngestJob
+    from ingest_pipeline import load_pipeline_settings
+
+    db_config = load_db_config(args.config)
+    probe = SkudDatabaseIntegrator(db_type="postgresql", **db_config)
+    with contextlib.redirect_stdout(sys.stderr):
+        connected = probe.connect()
+    if not connected:
+        return EXIT_NO_DB
+    probe.close()
+
+    out = sys.stdout
+    workers = args.workers or load_pipeline_settings(args.config)['file_workers']
+    jobs = {file_path: IngestJob(file_path, os.path.basename(file_path), source=args.source, cleanup=False)
+            for file_path in files}
+    show_progress = not args.json and not args.no_progress and sys.stderr.isatty()
+    progress = ProgressBar(jobs) if show_progress else None
+    interrupted = threading.Event()
+
+    def on_interrupt(signum, frame):
+        # Файлы в работе остановятся на границе пакета, остальные не начнутся
+        interrupted.set()
+        for job in jobs.values():
+            job.request_cancel()
+
+    def on_file_done(file_path, result):
+        if progress is not None:
+            progress.files_done += 1
+        moved_to = None
+        if args.move_to and result['success']:
+            moved_to = move_file(file_path, args.move_to)
+        result['moved_to'] = moved_to
+        if args.json:
+            return
+        details = result.get('details', {})
+        if progress is not None:
+            # Стираем строку прогресса перед выводом итога файла
+            sys.stderr.write('\r\033[K')
+        if result.get('skipped'):
+            print(f"⏭ {file_path}: уже загружен", file=out)
+        elif result['success']:
+            print(f"✅ {file_path}: +{details.get('new_access_records', 0)} записей, "
+                  f"дубликатов {details.get('duplicates', 0)}, {result['seconds']:.2f} сек"
+                  + (f" -> {moved_to}" if moved_to else ""), file=out)
+        elif result.get('cancelled'):
+            print(f"⏹ {file_path}: остановлен, продолжится при следующем запуске", file=out)
+        else:
+            print(f"❌ {file_path}: {result.get('error', 'неизвестная ошибка')}", file=out)
+
+    previous_handler = signal.signal(signal.SIGINT, on_interrupt)
+    # Построчный вывод интегратора нужен только с --verbose
+    chatter = sys.stderr if args.verbose else open(os.devnull, 'w')
+    if progress is not None:
+        progress.start()
+    try:
+        with contextlib.redirect_stdout(chatter):
+            summary = process_skud_files(files, db_config, workers=workers, source=args.source,
+                                         on_result=on_file_done, jobs=jobs, bulk=args.bulk,
+                                         config_path=args.config)
+    finally:
+        if progress is not None:
+            progress.stop()
+        signal.signal(signal.SIGINT, previous_handler)
+        if chatter is not sys.stderr:
+            chatter.close()
+
+    summary['missing'] = missing
+    summary['bulk'] = args.bulk
+    summary['interrupted'] = interrupted.is_set()
+    summary['rows_per_second'] = (round(summary['new_access_records'] / summary['elapsed_sec'], 1)
+                                  if summary['elapsed_sec'] else 0.0)
+    if args.json:
+        json.dump(summary, out, ensure_ascii=False, indent=2)
+        print(file=out)
+    else:
+        print(f"\n📊 Файлов: {summary['files']} | загружено {summary['succeeded']}, пропущено {summary['skipped']}, "
+              f"остановлено {summary['cancelled']}, с ошибкой {summary['failed'] + len(missing)}", file=out)
+        print(f"   Новых записей: {summary['new_access_records']} | новых сотрудников: {summary['new_employees']} | "
+              f"дубликатов: {summary['duplicates']}", file=out)
+        print(f"   ⏱ {summary['elapsed_sec']} сек, {summary['rows_per_second']} записей/сек, "
+              f"воркеров: {summary['workers']}", file=out)
+
+    if interrupted.is_set():
+        return EXIT_INTERRUPTED
+    if summary['failed'] or missing:
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='skud-ingest', description='Импорт выгрузок СКУД')
+    parser.add_argument('--config', default='postgres_config.ini',
+                        help='конфигурация: [DATABASE], фильтры [FILTERING], конвейер [INGEST] (%(default)s)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    validate = subparsers.add_parser('validate', help='проверить файлы без записи в БД')
+    validate.add_argument('paths', nargs='+', help='файлы, маски или папки')
+    validate.add_argument('--employees', help='снимок справочника: txt (ФИО в строке) или JSON')
+    validate.add_argument('--encoding', default='windows-1251', help='кодировка файлов (%(default)s)')
+    validate.add_argument('--json', action='store_true', help='вывести отчет в JSON')
+    validate.set_defaults(handler=cmd_validate)
+
+    backfill = subparsers.add_parser('backfill', help='загрузить файлы в БД (параллельно, с продолжением)')
+    backfill.add_argument('paths', nargs='+', help='файлы, маски или папки')
+    backfill.add_argument('--workers', type=int, help='файлов одновременно (по умолчанию [INGEST] file_workers)')
+    backfill.add_argument('--bulk', action='store_true',
+                          help='массовая загрузка: без ограничителя записи (не уступает отчетам API), '
+                               'synchronous_commit=off')
+    backfill.add_argument('--validate-only', action='store_true', help='только проверить файлы (как validate)')
+    backfill.add_argument('--move-to', help='куда перемещать успешно загруженные и пропущенные файлы')
+    backfill.add_argument('--source', default='cli', help='источник в манифесте ingest_files (%(default)s)')
+    backfill.add_argument('--employees', help='снимок справочника для --validate-only')
+    backfill.add_argument('--encoding', default='windows-1251', help='кодировка файлов для --validate-only')
+    backfill.add_argument('--json', action='store_true', help='вывести итог в JSON')
+    backfill.add_argument('--no-progress', action='store_true', help='не показывать строку прогресса')
+    backfill.add_argument('--verbose', action='store_true', help='подробный вывод импорта по файлам (в stderr)')
+    backfill.set_defaults(handler=cmd_backfill)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Воспроизведение файла выгрузки СКУД через /ingest/events
+
+Отправляет строки файла пакетами с заданной скоростью, как это делала бы РМ.
+При 429 ждет Retry-After и повторяет пакет. Используется для проверки
+и нагрузочного тестирования приема событий.
+
+Пример:
+    python skud_replay.py prishel_txt/2025.10.23.txt --url http://localhost:8003 --rate 500 --batch 200
+"""
+
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def read_lines(file_path, encoding):
+    """Строки выгрузки без пустых (заголовок отсеет сервер)"""
+    with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.strip():
+                yield line
+
+
+def post_batch(url, lines, timeout):
+    """Отправляет пакет; возвращает (HTTP-статус, тело ответа, Retry-After)"""
+    body = json.dumps({'lines': lines}, ensure_ascii=False).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read().decode('utf-8')), None
+    except urllib.error.HTTPError as e:
+        retry_after = e.headers.get('Retry-After')
+        try:
+            payload = json.loads(e.read().decode('utf-8'))
+        except ValueError:
+            payload = {}
+        return e.code, payload, float(retry_after) if retry_after else None
+
+
+def replay(file_path, url, rate, batch_size, encoding='windows-1251', timeout=30, max_retries=30):
+    """Отправляет файл пакетами; rate - строк в секунду (0 - без ограничения)"""
+    endpoint = url.rstrip('/') + '/ingest/events'
+    stats = {'batches': 0, 'lines': 0, 'accepted': 0, 'rejected': 0, 'throttled': 0, 'failed': 0}
+    started = time.time()
+    batch = []
+
+    def send(lines):
+        for attempt in range(max_retries + 1):
+            status, payload, retry_after = post_batch(endpoint, lines, timeout)
+            if status == 429:
+                stats['throttled'] += 1
+                time.sleep(retry_after or 1)
+                continue
+            if status >= 400:
+                stats['failed'] += 1
+                print(f"❌ Пакет отклонен ({status}): {payload.get('detail', payload)}")
+                return
+            stats['batches'] += 1
+            stats['accepted'] += payload.get('accepted', 0)
+            stats['rejected'] += payload.get('rejected', 0)
+            return
+        stats['failed'] += 1
+        print(f"❌ Пакет не принят после {max_retries} повторов (очередь переполнена)")
+
+    for line in read_lines(file_path, encoding):
+        batch.append(line)
+        stats['lines'] += 1
+        if len(batch) >= batch_size:
+            send(batch)
+            batch = []
+            if rate > 0:
+                # Держим заданный темп: ждем, пока "реальное" время догонит отправленные строки
+                delay = stats['lines'] / rate - (time.time() - started)
+                if delay > 0:
+                    time.sleep(delay)
+    if batch:
+        send(batch)
+
+    elapsed = time.time() - started
+    stats['seconds'] = round(elapsed, 2)
+    stats['lines_per_second'] = round(stats['lines'] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Воспроизведение выгрузки СКУД через /ingest/events')
+    parser.add_argument('file', help='файл выгрузки СКУД (.txt)')
+    parser.add_argument('--url', default='http://localhost:8003', help='адрес API (по умолчанию %(default)s)')
+    parser.add_argument('--rate', type=float, default=200, help='строк в секунду, 0 - без ограничения (%(default)s)')
+    parser.add_argument('--batch', type=int, default=100, help='строк в пакете (%(default)s)')
+    parser.add_argument('--encoding', default='windows-1251', help='кодировка файла (%(default)s)')
+    args = parser.parse_args()
+
+    print(f"📤 Воспроизведение {args.file} -> {args.url}/ingest/events "
+          f"({args.rate or 'без ограничения'} строк/сек, пакет {args.batch})")
+    stats = replay(args.file, args.url, args.rate, args.batch, args.encoding)
+    print(f"✅ Отправлено строк: {stats['lines']} за {stats['seconds']} сек ({stats['lines_per_second']} строк/сек)")
+    print(f"   Пакетов: {stats['batches']} | Принято событий: {stats['accepted']} | "
+          f"Отклонено строк: {stats['rejected']} | 429: {stats['throttled']} | Ошибок: {stats['failed']}")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Генератор синтетической нагрузки СКУД
+
+Пишет файлы выгрузки в формате РМ (cp1251, 10 колонок через табуляцию,
+как ждет parse_real_skud_line) или сразу загружает те же события в БД,
+чтобы получить многолетнюю access_logs для бенчмарков запросов.
+Одинаковые параметры и seed дают одинаковые данные.
+
+Кроме проходов сотрудников генерируется шум реальных выгрузок: открытие
+и закрытие дверей, включение реле турникетов, служебные учетные записи
+(охрана, водители - их отсекают фильтры), отказы в доступе, отметки даты.
+Ночные смены переходят через полночь, а каждый файл начинается с хвоста
+предыдущего дня (overlap_minutes), как при выгрузке "с запасом".
+
+Примеры:
+    python skud_workload.py files --out workload_txt --employees 300 --days 5
+    python skud_workload.py load --employees 2000 --days 1095 --start 2023-01-01
+    python skud_workload.py load --sqlite bench.db --employees 500 --days 365
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from attendance_daily import invalidate_days
+from data_catalog import refresh_days
+
+HEADER = "РМ\tВремя\tСобытие\tЗона\tДверь\tОписание\tАдрес\tЗона доступа\tХозорган\tКомментарий"
+ACCESS_GRANTED = 'Доступ предоставлен'
+
+SURNAMES = [
+    'Абдрахманов', 'Ахметов', 'Байжанов', 'Волков', 'Григорьев', 'Давлетов', 'Ержанов', 'Жумабаев',
+    'Закиров', 'Иванов', 'Калиев', 'Козлов', 'Лебедев', 'Мамедов', 'Новиков', 'Омаров', 'Петров',
+    'Рахимов', 'Сидоров', 'Тулегенов', 'Умаров', 'Федоров', 'Хасенов', 'Цой', 'Шарипов', 'Юсупов',
+    'Ян', 'Морозов', 'Кузнецов', 'Сергеев', 'Нургалиев', 'Есенов', 'Бекова', 'Ильина', 'Смирнова',
+    'Кравченко', 'Мусина', 'Алиева', 'Оспанова', 'Тимофеева'
+]
+INITIALS = 'АБВГДЕЖЗИКЛМНОПРСТУФХШЭЮЯ'
+
+# Служебные учетные записи: фильтр [FILTERING] exclude_employees их отсекает
+SERVICE_ACCOUNTS = ['Охрана М.', '1 пост о.', '2 пост о.', 'Водитель 1 В.', 'Дежурный В.']
+
+# Прибор турникетов в адресе (3/1/<прибор>/<считыватель>)
+TURNSTILE_DEVICE = 40
+
+
+def make_names(count, rng):
+    """Уникальные ФИО вида "Фамилия И.О." """
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(SURNAMES)} {rng.choice(INITIALS)}.{rng.choice(INITIALS)}.")
+    return sorted(names)
+
+
+def format_timestamp(ts):
+    """Время как в выгрузке РМ: час без ведущего нуля"""
+    return f"{ts.day:02}.{ts.month:02}.{ts.year} {ts.hour}:{ts.minute:02}:{ts.second:02}"
+
+
+class Workload:
+    """Детерминированный поток событий СКУД по дням"""
+
+    def __init__(self, employees=300, doors=6, days=5, events_per_person=6, start=None, seed=42,
+                 workstation='DESKTOP-SYNTH01', overlap_minutes=60, night_shift_share=0.03,
+                 absence_rate=0.05, noise=True):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.events_per_person = max(2, events_per_person)
+        self.start = start or date(2025, 1, 1)
+        self.workstation = workstation
+        self.overlap = timedelta(minutes=overlap_minutes)
+        self.absence_rate = absence_rate
+        self.noise = noise
+        self.names = make_names(employees, self.rng)
+        # Внутренние двери по этажам/лестницам; турникеты - вход и выход
+        self.doors = [f"{floor} эт - {stair} лст" for floor in range(1, 10) for stair in range(1, 4)][:max(1, doors)]
+        self.profiles = [{
+            'name': name,
+            'arrival': self.rng.gauss(0, 15),              # сдвиг прихода от 8:45, мин
+            'stay': self.rng.gauss(9 * 60 + 20, 25),         # длительность дня, мин
+            'night': self.rng.random() < night_shift_share,
+            'doors': self.rng.sample(range(len(self.doors)), min(2, len(self.doors)))
+        } for name in self.names]
+
+    def _line(self, ts, event, zone='-', door='-', description='-', address='-', access_zone='-', name='-'):
+        return (ts, event, zone, door, description, address, access_zone, name)
+
+    def _turnstile(self, ts, name, is_exit):
+        if is_exit:
+            access = self._line(ts, ACCESS_GRANTED, door='Турникет (выход)',
+                                description='21: Выход   Турникет (выход),   Считыватель 2, Прибор 41',
+                                address=f'3/1/{TURNSTILE_DEVICE + 1}/2', name=name)
+        else:
+            access = self._line(ts, ACCESS_GRANTED, door='Турникет 2',
+                                description='20: Вход   Турникет 2,   Считыватель 1, Прибор 40',
+                                address=f'3/1/{TURNSTILE_DEVICE}/1', name=name)
+        events = [access]
+        if self.noise:
+            relay = '[162] СКУД 1 эт'
+            events.append(self._line(ts, 'Включение реле', zone=relay, description='Реле 1, Прибор 40',
+                                     address='3/1/40/1'))
+            events.append(self._line(ts + timedelta(seconds=1), 'Выключение реле', zone=relay,
+                                     description='Реле 1, Прибор 40', address='3/1/40/1'))
+        return events
+
+    def _door_pass(self, ts, name, door_index):
+        door = self.doors[door_index]
+        address = f'3/1/{22 + door_index}/1'
+        events = [self._line(ts, ACCESS_GRANTED, door=door, description=f'{4 + door_index}: Вход   {door}',
+                             address=address, name=name)]
+        if self.noise:
+            events.append(self._line(ts + timedelta(seconds=2), 'Дверь открыта', door=door,
+                                     description=f'{4 + door_index}: Вход   {door}', address=address, access_zone='2'))
+            events.append(self._line(ts + timedelta(seconds=8), 'Дверь закрыта', door=door,
+                                     description=f'{4 + door_index}: Вход   {door}', address=address, access_zone='2'))
+        return events
+
+    def _person_day(self, day, profile):
+        rng = self.rng
+        if profile['night']:
+            arrival = datetime.combine(day, datetime.min.time()) + timedelta(hours=20, minutes=profile['arrival'])
+            stay = 12 * 60
+        else:
+            arrival = datetime.combine(day, datetime.min.time()) + timedelta(hours=8, minutes=45 + profile['arrival'])
+            stay = profile['stay']
+        arrival += timedelta(seconds=rng.randint(0, 59), minutes=rng.gauss(0, 7))
+        departure = arrival + timedelta(minutes=stay + rng.gauss(0, 20))
+
+        events = self._turnstile(arrival, profile['name'], is_exit=False)
+        inner = self.events_per_person - 2
+        span = max((departure - arrival).total_seconds() - 120, 60)
+        for offset in sorted(rng.uniform(60, span) for _ in range(inner)):
+            events.extend(self._door_pass(arrival + timedelta(seconds=int(offset)), profile['name'],
+                                          rng.choice(profile['doors'])))
+        events.extend(self._turnstile(departure, profile['name'], is_exit=True))
+        return events
+
+    def _day_noise(self, day):
+        rng = self.rng
+        midnight = datetime.combine(day, datetime.min.time())
+        events = [(midnight, 'Отметка даты', '-', '-', 'С2000М', '3/1/0/0', '-', '-')]
+        # Обходы охраны и служебные проезды ночью
+        for account in SERVICE_ACCOUNTS:
+            for _ in range(rng.randint(1, 4)):
+                ts = midnight + timedelta(seconds=rng.randint(0, 6 * 3600))
+                events.extend(self._door_pass(ts, account, rng.randrange(len(self.doors))))
+        for _ in range(rng.randint(0, 5)):
+            ts = midnight + timedelta(seconds=rng.randint(7 * 3600, 20 * 3600))
+            events.append(self._line(ts, 'Доступ отклонен', door='Турникет 2',
+                                     description='20: Вход   Турникет 2,   Считыватель 1, Прибор 40',
+                                     address='3/1/40/1', name=rng.choice(self.names)))
+        for _ in range(rng.randint(0, 10)):
+            ts = midnight + timedelta(seconds=rng.randint(0, 86399))
+            events.append(self._line(ts, 'Восстановление контакта с устройством',
+                                     description=f'Прибор {rng.randint(40, 45)}', address='3/1/0/0'))
+        return events
+
+    def days_events(self):
+        """Итерирует (день, события дня по времени); события после полуночи переносятся в следующий день"""
+        carry = defaultdict(list)
+        for day_index in range(self.days):
+            day = self.start + timedelta(days=day_index)
+            events = carry.pop(day, [])
+            if self.noise:
+                events.extend(self._day_noise(day))
+            if day.weekday() < 5:
+                for profile in self.profiles:
+                    if self.rng.random() < self.absence_rate:
+                        continue
+                    for event in self._person_day(day, profile):
+                        if event[0].date() == day:
+                            events.append(event)
+                        else:
+                            carry[event[0].date()].append(event)
+            events.sort(key=lambda event: event[0])
+            yield day, events
+        # Хвост ночных смен последнего дня
+        for day in sorted(carry):
+            yield day, sorted(carry[day], key=lambda event: event[0])
+
+    def format_line(self, event):
+        ts, event_type, zone, door, description, address, access_zone, name = event
+        return "\t".join([self.workstation, format_timestamp(ts), event_type, zone, door, description,
+                          address, access_zone, name, '-'])
+
+    def access_rows(self, events, excluded=()):
+        """События, которые импорт записал бы в access_logs: (ФИО, время, тип, дверь)"""
+        for ts, event_type, zone, door, description, address, access_zone, name in events:
+            if event_type != ACCESS_GRANTED or name == '-' or name in excluded:
+                continue
+            yield name, ts, 'ВЫХОД' if 'Выход' in description else 'ВХОД', door
+
+
+def write_files(workload, out_dir):
+    """Файл выгрузки на каждый день: YYYY.MM.DD.txt"""
+    os.makedirs(out_dir, exist_ok=True)
+    stats = {'files': 0, 'lines': 0, 'access_events': 0, 'bytes': 0}
+    previous_tail = []
+    for day, events in workload.days_events():
+        lines = [HEADER]
+        lines.extend(workload.format_line(event) for event in previous_tail)
+        lines.extend(workload.format_line(event) for event in events)
+        data = ("\n".join(lines) + "\n").encode('cp1251')
+        with open(os.path.join(out_dir, f"{day:%Y.%m.%d}.txt"), 'wb') as f:
+            f.write(data)
+        stats['files'] += 1
+        stats['lines'] += len(lines)
+        stats['bytes'] += len(data)
+        stats['access_events'] += sum(1 for event in events if event[1] == ACCESS_GRANTED)
+        # Следующий файл начинается с последних overlap_minutes этого дня
+        boundary = datetime.combine(day + timedelta(days=1), datetime.min.time()) - workload.overlap
+        previous_tail = [event for event in events if event[0] >= boundary] if workload.overlap else []
+    return stats
+
+
+def load_database(workload, integrator, chunk_days=31):
+    """Загружает события в access_logs напрямую (без файлов), пачками по chunk_days дней
+
+    Сотрудники создаются с отделом/должностью "Неопределено", как при импорте.
+    PostgreSQL: COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING,
+    поэтому повторный запуск с тем же seed ничего не задваивает.
+    """
+    if not integrator.connect():
+        raise RuntimeError('Ошибка подключения к базе данных')
+    integrator.create_test_tables()
+    connection = integrator.connection
+    dialect = integrator.dialect
+    postgres = integrator.db_type == "postgresql"
+    dept_id, pos_id = integrator.get_or_create_unknown_ids()
+
+    cursor = connection.cursor()
+    for name in workload.names:
+        cursor.execute(dialect.sql("""
+            INSERT INTO employees (full_name, department_id, position_id, card_number, is_active)
+            VALUES (%s, %s, %s, '', TRUE)
+            ON CONFLICT (full_name) DO NOTHING
+        """), (name, dept_id, pos_id))
+    cursor.execute("SELECT full_name, id FROM employees")
+    employee_ids = {row[0]: row[1] for row in cursor.fetchall()}
+    connection.commit()
+
+    if postgres:
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS workload_stage (
+                employee_id INTEGER, access_datetime TIMESTAMP, access_type VARCHAR(10),
+                door_location VARCHAR(255), card_number VARCHAR(50)
+            ) ON COMMIT DELETE ROWS
+        """)
+
+    stats = {'days': 0, 'rows': 0, 'inserted': 0}
+    started = time.time()
+    excluded = set(SERVICE_ACCOUNTS)
+    chunk = []
+
+    def flush():
+        if not chunk:
+            return
+        if postgres:
+            buffer = io.StringIO()
+            for employee_id, ts, access_type, door in chunk:
+                buffer.write(f"{employee_id}\t{ts:%Y-%m-%d %H:%M:%S}\t{access_type}\t{door}\t\n")
+            buffer.seek(0)
+            cursor.copy_expert("COPY workload_stage FROM STDIN", buffer)
+            cursor.execute("""
+                INSERT INTO access_logs (employee_id, access_datetime, access_type, door_location, card_number)
+                SELECT employee_id, access_datetime, access_type, door_location, card_number FROM workload_stage
+                ON CONFLICT DO NOTHING
+            """)
+            stats['inserted'] += cursor.rowcount
+        else:
+            changes = connection.total_changes
+            cursor.executemany("""
+                INSERT INTO access_logs (employee_id, access_datetime, access_type, door_location, card_number)
+                VALUES (?, ?, ?, ?, '')
+                ON CONFLICT DO NOTHING
+            """, [(employee_id, dialect.param(ts), access_type, door) for employee_id, ts, access_type, door in chunk])
+            stats['inserted'] += connection.total_changes - changes
+        connection.commit()
+        stats['rows'] += len(chunk)
+        chunk.clear()
+
+    days = set()
+    for day, events in workload.days_events():
+        for name, ts, access_type, door in workload.access_rows(events, excluded):
+            chunk.append((employee_ids[name], ts, access_type, door))
+        days.add(day)
+        stats['days'] += 1
+        if stats['days'] % chunk_days == 0:
+            flush()
+            print(f"📈 {day}: {stats['rows']} строк, {stats['rows'] / (time.time() - started):.0f} строк/сек")
+    flush()
+    if postgres:
+        # Итоги посещаемости загруженных дней пересчитаются при чтении, каталог - сразу
+        invalidate_days(cursor, days)
+        refresh_days(cursor, days)
+        connection.commit()
+    integrator.close()
+    stats['seconds'] = round(time.time() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор синтетических выгрузок СКУД')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_spec(command):
+        command.add_argument('--employees', type=int, default=300, help='сотрудников (%(default)s)')
+        command.add_argument('--doors', type=int, default=6, help='внутренних дверей (%(default)s)')
+        command.add_argument('--days', type=int, default=5, help='дней (%(default)s)')
+        command.add_argument('--events-per-person', type=int, default=6,
+                             help='проходов сотрудника за день, включая турникеты (%(default)s)')
+        command.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 1),
+                             help='первый день, ГГГГ-ММ-ДД (%(default)s)')
+        command.add_argument('--seed', type=int, default=42, help='seed генератора (%(default)s)')
+        command.add_argument('--workstation', default='DESKTOP-SYNTH01', help='имя РМ (%(default)s)')
+        command.add_argument('--overlap-minutes', type=int, default=60,
+                             help='сколько минут предыдущего дня повторять в начале файла (%(default)s)')
+        command.add_argument('--no-noise', action='store_true', help='только проходы сотрудников')
+
+    files = subparsers.add_parser('files', help='записать файлы выгрузки (cp1251)')
+    add_spec(files)
+    files.add_argument('--out', default='workload_txt', help='папка для файлов (%(default)s)')
+
+    load = subparsers.add_parser('load', help='загрузить события прямо в БД')
+    add_spec(load)
+    load.add_argument('--config', default='postgres_config.ini', help='[DATABASE] для PostgreSQL (%(default)s)')
+    load.add_argument('--sqlite', help='загрузить во встроенную SQLite-базу по этому пути')
+    args = parser.parse_args()
+
+    workload = Workload(
+        employees=args.employees, doors=args.doors, days=args.days, events_per_person=args.events_per_person,
+        start=args.start, seed=args.seed, workstation=args.workstation,
+        overlap_minutes=args.overlap_minutes, noise=not args.no_noise
+    )
+
+    if args.command == 'files':
+        stats = write_files(workload, args.out)
+        print(f"✅ Файлов: {stats['files']} в {args.out} | строк: {stats['lines']} | "
+              f"проходов: {stats['access_events']} | {stats['bytes'] / 1048576:.1f} МБ")
+        return 0
+
+    from database_integrator import SkudDatabaseIntegrator, load_db_config
+    if args.sqlite:
+        integrator = SkudDatabaseIntegrator(db_type="sqlite", db_path=args.sqlite)
+    else:
+        integrator = SkudDatabaseIntegrator(db_type="postgresql", **load_db_config(args.config))
+    stats = load_database(workload, integrator)
+    print(f"✅ Дней: {stats['days']} | строк: {stats['rows']} | новых: {stats['inserted']} | "
+          f"{stats['seconds']} сек")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Различия SQL между PostgreSQL и встроенным SQLite
+
+Запросы пишутся в синтаксисе PostgreSQL (%s-параметры); диалект переводит
+плейсхолдеры, подставляет выражения, которых нет в другой СУБД, и приводит
+значения параметров и результатов (в SQLite время хранится текстом).
+"""
+
+from datetime import date, datetime, time
+
+# Формат, в котором SQLite хранит access_datetime (сравнивается как строка)
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class PostgresDialect:
+    name = 'postgresql'
+
+    def sql(self, query):
+        return query
+
+    def param(self, value):
+        return value
+
+    def params(self, values):
+        return tuple(self.param(value) for value in values)
+
+    def time_of(self, column):
+        return f"CAST({column} AS TIME)"
+
+    def greatest(self, left, right):
+        return f"GREATEST({left}, {right})"
+
+    def to_datetime(self, value):
+        return value
+
+    def to_date(self, value):
+        return value
+
+    def to_time(self, value):
+        return value
+
+
+class SqliteDialect(PostgresDialect):
+    name = 'sqlite'
+
+    def sql(self, query):
+        return query.replace('%s', '?')
+
+    def param(self, value):
+        if isinstance(value, datetime):
+            return value.strftime(SQLITE_DATETIME_FORMAT)
+        if isinstance(value, (date, time)):
+            return value.isoformat()
+        return value
+
+    def time_of(self, column):
+        return f"TIME({column})"
+
+    def greatest(self, left, right):
+        # Многоаргументный MAX в SQLite - скалярная функция, как GREATEST
+        return f"MAX({left}, {right})"
+
+    def to_datetime(self, value):
+        if value is None or isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(value)
+
+    def to_date(self, value):
+        if value is None or isinstance(value, date):
+            return value
+        return date.fromisoformat(value[:10])
+
+    def to_time(self, value):
+        if value is None or isinstance(value, time):
+            return value
+        return time.fromisoformat(value)
+
+
+def exit_condition(column):
+    """Дверь выхода: по названию, как в отчетах API
+
+    LOWER в SQLite не понижает кириллицу, поэтому варианты регистра перечислены явно.
+    """
+    return f"({column} LIKE '%%выход%%' OR {column} LIKE '%%Выход%%' OR {column} LIKE '%%ВЫХОД%%')"
+
+
+def dialect_for(db_type):
+    """Диалект для SkudDatabaseIntegrator.db_type"""
+    return PostgresDialect() if db_type == "postgresql" else SqliteDialect()
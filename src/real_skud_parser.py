@@ -8,7 +8,7 @@
 import re
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import configparser
 
 @dataclass
@@ -20,23 +20,56 @@ class RealSkudRecord:
     door_location: str
     event_type: str
     direction: str
+    workstation: str = ''  # РМ, с которой выгружено событие (источник для водяного знака)
 
-def parse_real_skud_line(line: str, line_number: int = 0, config: Dict[str, Any] = None) -> Optional[RealSkudRecord]:
+def is_excluded(full_name: str, door_location: str, description: str = '', config: Dict[str, Any] = None) -> bool:
+    """Проверяет исключения из конфигурации (охрана, служебные двери)"""
+    if not config:
+        return False
+
+    # Исключаем определенных сотрудников (охранники)
+    exclude_employees = config.get('exclude_employees', [])
+    if isinstance(exclude_employees, str):
+        exclude_employees = [name.strip() for name in exclude_employees.split(',')]
+    
+    if full_name in exclude_employees:
+        return True
+        
+    # Исключаем определенные двери/места
+    exclude_doors = config.get('exclude_doors', [])
+    if isinstance(exclude_doors, str):
+        exclude_doors = [door_name.strip() for door_name in exclude_doors.split(',')]
+        
+    for excluded_door in exclude_doors:
+        if excluded_door in door_location or excluded_door in description:
+            return True
+    return False
+
+# Причины, по которым строка выгрузки не дает записи (classify_real_skud_line)
+SKIP_HEADER = 'header'
+SKIP_MALFORMED = 'malformed'
+SKIP_EVENT_TYPE = 'event_type'
+SKIP_NO_NAME = 'no_name'
+SKIP_EXCLUDED = 'excluded'
+SKIP_BAD_TIMESTAMP = 'bad_timestamp'
+
+def classify_real_skud_line(line: str, line_number: int = 0, config: Dict[str, Any] = None) -> Tuple[Optional[RealSkudRecord], Optional[str], Optional[str]]:
     """
-    Парсит строку реального формата СКУД
+    Разбирает строку реального формата СКУД с указанием причины отказа
     
     Реальный формат: РМ\tВремя\tСобытие\tЗона\tДверь\tОписание\tАдрес\tЗона доступа\tХозорган\tКомментарий
+    Возвращает (запись, причина пропуска, тип события): запись или причина всегда None.
     """
     try:
         # Убираем лишние пробелы и разделяем по табуляциям
         parts = [part.strip() for part in line.split('\t')]
         
         if len(parts) < 10:
-            return None
+            return None, SKIP_MALFORMED, None
             
         # Пропускаем заголовок
         if parts[0] == 'РМ' or parts[1] == 'Время':
-            return None
+            return None, SKIP_HEADER, None
             
         workstation = parts[0]  # РМ (рабочая машина)
         datetime_str = parts[1]  # Время
@@ -51,34 +84,22 @@ def parse_real_skud_line(line: str, line_number: int = 0, config: Dict[str, Any]
         
         # Фильтруем только события доступа
         if event_type != 'Доступ предоставлен':
-            return None
+            return None, SKIP_EVENT_TYPE, event_type
             
         # Если нет ФИО сотрудника, пропускаем
         if not full_name or full_name == '-':
-            return None
+            return None, SKIP_NO_NAME, event_type
             
         # ФИЛЬТРАЦИЯ: Проверяем конфигурацию для исключений
-        if config:
-            # Исключаем определенных сотрудников (охранники)
-            exclude_employees = config.get('exclude_employees', [])
-            if isinstance(exclude_employees, str):
-                exclude_employees = [name.strip() for name in exclude_employees.split(',')]
-            
-            if full_name in exclude_employees:
-                return None
-                
-            # Исключаем определенные двери/места
-            exclude_doors = config.get('exclude_doors', [])
-            if isinstance(exclude_doors, str):
-                exclude_doors = [door_name.strip() for door_name in exclude_doors.split(',')]
-                
-            door_location = door if door and door != '-' else description
-            for excluded_door in exclude_doors:
-                if excluded_door in door_location or excluded_door in description:
-                    return None
+        door_location = door if door and door != '-' else description
+        if is_excluded(full_name, door_location, description, config):
+            return None, SKIP_EXCLUDED, event_type
         
         # Парсим дату и время
-        timestamp = datetime.strptime(datetime_str, "%d.%m.%Y %H:%M:%S")
+        try:
+            timestamp = datetime.strptime(datetime_str, "%d.%m.%Y %H:%M:%S")
+        except ValueError:
+            return None, SKIP_BAD_TIMESTAMP, event_type
         
         # Определяем направление из описания
         direction = "вход" if "Вход" in description else "выход" if "Выход" in description else "неизвестно"
@@ -91,19 +112,75 @@ def parse_real_skud_line(line: str, line_number: int = 0, config: Dict[str, Any]
             if card_match:
                 card_number = card_match.group(1)
         
-        # Определяем место прохода
-        door_location = door if door and door != '-' else description
-        
         return RealSkudRecord(
             timestamp=timestamp,
             full_name=full_name,
             card_number=card_number,
             door_location=door_location,
             event_type=event_type,
-            direction=direction
-        )
+            direction=direction,
+            workstation=workstation if workstation != '-' else ''
+        ), None, event_type
         
     except (ValueError, IndexError) as e:
+        return None, SKIP_MALFORMED, None
+
+def parse_real_skud_line(line: str, line_number: int = 0, config: Dict[str, Any] = None) -> Optional[RealSkudRecord]:
+    """
+    Парсит строку реального формата СКУД
+    
+    Возвращает запись или None, если строка не является событием доступа сотрудника.
+    """
+    return classify_real_skud_line(line, line_number, config)[0]
+
+def record_from_dict(data: Dict[str, Any], config: Dict[str, Any] = None) -> Optional[RealSkudRecord]:
+    """
+    Собирает запись из уже распарсенного JSON (поля RealSkudRecord)
+    
+    timestamp принимается в формате выгрузки (%d.%m.%Y %H:%M:%S) или ISO 8601.
+    Время - местное, как в выгрузке: метка со смещением (+03:00, Z) отклоняется,
+    ее нельзя сравнить с наивными водяными знаками. К записи применяются те же
+    фильтры, что и к строкам выгрузки.
+    """
+    try:
+        full_name = (data.get('full_name') or '').strip()
+        if not full_name or full_name == '-':
+            return None
+        
+        event_type = data.get('event_type') or 'Доступ предоставлен'
+        if event_type != 'Доступ предоставлен':
+            return None
+        
+        raw_timestamp = data.get('timestamp')
+        if isinstance(raw_timestamp, datetime):
+            timestamp = raw_timestamp
+        else:
+            try:
+                timestamp = datetime.strptime(str(raw_timestamp), "%d.%m.%Y %H:%M:%S")
+            except ValueError:
+                timestamp = datetime.fromisoformat(str(raw_timestamp))
+        if timestamp.tzinfo is not None:
+            return None
+        
+        door_location = (data.get('door_location') or '').strip()
+        if is_excluded(full_name, door_location, '', config):
+            return None
+        
+        direction = data.get('direction') or 'неизвестно'
+        if direction not in ('вход', 'выход', 'неизвестно'):
+            direction = 'неизвестно'
+        
+        return RealSkudRecord(
+            timestamp=timestamp,
+            full_name=full_name,
+            card_number=str(data.get('card_number') or ''),
+            door_location=door_location,
+            event_type=event_type,
+            direction=direction,
+            workstation=(data.get('workstation') or '').strip()
+        )
+    
+    except (ValueError, TypeError, AttributeError):
         return None
 
 def create_real_skud_config(config_file_path: str = None) -> Dict[str, Any]:
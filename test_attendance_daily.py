@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Тесты хранимых итогов посещаемости (attendance_daily) на PostgreSQL
+
+Нужен сервер из SKUD_TEST_CONFIG (по умолчанию postgres_config.ini): тест
+работает в отдельной базе <database>_pytest, без сервера пропускается.
+"""
+
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import pytest
+
+from attendance_daily import compute_day, invalidate_days
+from database_integrator import load_db_config
+from skud_bench import BenchDatabase, api_client
+
+DAY = date(2025, 6, 26)
+
+
+@pytest.fixture
+def database():
+    import psycopg2
+
+    db_config = load_db_config(os.environ.get('SKUD_TEST_CONFIG', 'postgres_config.ini'))
+    database = BenchDatabase(db_config, f"{db_config['database']}_pytest")
+    try:
+        database.prepare()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"нет PostgreSQL: {e}")
+    conn = database.connect()
+    try:
+        conn.cursor().execute(
+            "TRUNCATE access_logs, attendance_daily, data_catalog, employees RESTART IDENTITY CASCADE"
+        )
+    finally:
+        conn.close()
+    return database
+
+
+def stored_day(database, day):
+    conn = database.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT total_employees, present_count FROM attendance_daily WHERE day = %s", (day,))
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def test_employee_edit_recomputes_stored_day(database):
+    """Деактивация через PUT /employees/{id} сбрасывает сохраненный день, он пересчитывается"""
+    conn = database.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO employees (full_name) VALUES ('Тестов Т.Т.') RETURNING id")
+        employee_id = cursor.fetchone()[0]
+        cursor.execute("""
+            INSERT INTO access_logs (employee_id, access_datetime, access_type, door_location)
+            VALUES (%s, %s, 'ВХОД', '3 эт')
+        """, (employee_id, datetime(2025, 6, 26, 8, 30)))
+    finally:
+        conn.close()
+
+    client = api_client(database)
+    assert client.get('/dashboard-stats?date=2025-06-27').status_code == 200
+    assert stored_day(database, DAY) == (1, 1)
+
+    response = client.put(f'/employees/{employee_id}', json={'is_active': False})
+    assert response.status_code == 200
+    assert stored_day(database, DAY) is None
+
+    assert client.get('/dashboard-stats?date=2025-06-27').status_code == 200
+    assert stored_day(database, DAY) == (0, 0)
+
+
+def test_recompute_waits_for_concurrent_ingest(database):
+    """Пересчет дня во время незафиксированного импорта не сохраняет итог без новых записей"""
+    conn = database.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO employees (full_name) VALUES ('Тестов Т.Т.') RETURNING id")
+        employee_id = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    ingest = database.connect()
+    ingest.autocommit = False
+    reader = database.connect()
+    try:
+        cursor = ingest.cursor()
+        cursor.execute("""
+            INSERT INTO access_logs (employee_id, access_datetime, access_type, door_location)
+            VALUES (%s, %s, 'ВХОД', '3 эт')
+        """, (employee_id, datetime(2025, 6, 26, 8, 30)))
+        invalidate_days(cursor, [DAY])
+
+        computed = {}
+        thread = threading.Thread(target=lambda: computed.update(compute_day(reader, DAY)))
+        thread.start()
+        time.sleep(0.3)
+        assert thread.is_alive()
+        ingest.commit()
+        thread.join(5)
+    finally:
+        ingest.close()
+        reader.close()
+
+    assert computed['present_count'] == 1
+    assert stored_day(database, DAY) == (1, 1)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Тесты выгрузки сырых событий (без сервера PostgreSQL)
+"""
+
+import argparse
+from datetime import date, datetime
+
+import pytest
+
+from event_export import EXPORT_COLUMNS, csv_chunks, event_filters, id_list, ndjson_chunks
+
+ROWS = [
+    (1, datetime(2025, 6, 26, 8, 30), 7, 'Иванов И.И.', 3, 'Отдел; один', 'ВХОД', '3 эт', ''),
+    (2, datetime(2025, 6, 26, 18, 5), 7, 'Иванов И.И.', 3, 'Отдел; один', 'ВЫХОД', 'Выход 1 эт', ''),
+    (3, datetime(2025, 6, 27, 8, 45), 9, 'Петров П.П.', None, None, 'ВХОД', None, '0042'),
+]
+
+
+def test_csv_chunks_bom_header_and_boundaries():
+    chunks = list(csv_chunks(iter(ROWS), chunk_rows=2))
+    assert len(chunks) == 2
+    assert chunks[0].startswith('\ufeff'.encode('utf-8'))
+    assert not chunks[1].startswith('\ufeff'.encode('utf-8'))
+
+    lines = b''.join(chunks).decode('utf-8-sig').split('\n')
+    assert lines[0] == ';'.join(EXPORT_COLUMNS)
+    assert lines[1] == '1;2025-06-26 08:30:00;7;Иванов И.И.;3;"Отдел; один";ВХОД;3 эт;'
+    assert lines[3] == '3;2025-06-27 08:45:00;9;Петров П.П.;;;ВХОД;;0042'
+    assert lines[4] == ''
+
+    # Без строк - только BOM и заголовок
+    assert list(csv_chunks(iter([]))) == [('\ufeff' + ';'.join(EXPORT_COLUMNS) + '\n').encode('utf-8')]
+
+
+def test_ndjson_chunks_end_every_line_with_newline():
+    rows = [('{"id": %d}' % i,) for i in range(1, 6)]
+    chunks = list(ndjson_chunks(iter(rows), chunk_rows=2))
+    assert chunks == [b'{"id": 1}\n{"id": 2}\n', b'{"id": 3}\n{"id": 4}\n', b'{"id": 5}\n']
+    assert list(ndjson_chunks(iter([]))) == []
+
+
+def test_event_filters_and_id_list():
+    filters = event_filters(date(2025, 6, 1), date(2025, 6, 30), employee_ids=[], department_ids=(3, 4),
+                            doors=None)
+    assert filters['start'] == datetime(2025, 6, 1)
+    assert filters['end'] == datetime(2025, 7, 1)
+    assert filters['employee_ids'] is None
+    assert filters['department_ids'] == [3, 4]
+    assert filters['doors'] is None
+
+    assert id_list('12, 40,') == [12, 40]
+    with pytest.raises(argparse.ArgumentTypeError):
+        id_list('12,abc')
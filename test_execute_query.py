@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Тесты execute_query на курсоре-заглушке (без сервера PostgreSQL)
+"""
+
+from clean_api import execute_query
+
+COLUMNS = ('id', 'full_name')
+ROWS = [(1, 'Иванов И.И.'), (2, 'Петров П.П.'), (3, 'Сидоров С.С.')]
+
+
+class FakeCursor:
+    """Курсор с заданным результатом; description, как у серверного курсора, - после первой выборки"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.description = None
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def _fetched(self, rows):
+        self.description = [(column,) for column in COLUMNS]
+        return rows
+
+    def fetchone(self):
+        return self._fetched(self.rows.pop(0) if self.rows else None)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return self._fetched(rows)
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return self._fetched(rows)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.autocommit = True
+        self.rows = rows
+        self.cursors = []
+        self.rollbacks = 0
+
+    def cursor(self, name=None):
+        cursor = FakeCursor(self.rows)
+        cursor.name = name
+        self.cursors.append(cursor)
+        return cursor
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_row_modes_and_fetch_one():
+    conn = FakeConnection(ROWS)
+    assert execute_query(conn, "SELECT ?", fetch_all=True) == [
+        {'id': 1, 'full_name': 'Иванов И.И.'}, {'id': 2, 'full_name': 'Петров П.П.'},
+        {'id': 3, 'full_name': 'Сидоров С.С.'}
+    ]
+    assert conn.cursors[0].query == "SELECT %s"
+    named = execute_query(conn, "SELECT 1", fetch_all=True, row='namedtuple')
+    assert [(r.id, r.full_name) for r in named] == ROWS
+    assert execute_query(conn, "SELECT 1", fetch_all=True, row='tuple') == ROWS
+    assert execute_query(conn, "SELECT 1", fetch_one=True, row='namedtuple').full_name == 'Иванов И.И.'
+    assert execute_query(FakeConnection([]), "SELECT 1", fetch_one=True) is None
+
+
+def test_columnar_output():
+    assert execute_query(FakeConnection(ROWS), "SELECT 1", fetch_all=True, columnar=True) == {
+        'id': [1, 2, 3], 'full_name': ['Иванов И.И.', 'Петров П.П.', 'Сидоров С.С.']
+    }
+    assert execute_query(FakeConnection([]), "SELECT 1", fetch_all=True, columnar=True) == {
+        'id': [], 'full_name': []
+    }
+
+
+def test_server_side_iterator_restores_autocommit():
+    """Генератор возвращает autocommit и закрывает курсор и после дочитывания, и после close()"""
+    conn = FakeConnection(ROWS)
+    rows = execute_query(conn, "SELECT 1", row='tuple', iterate=True, server_side=True, fetch_size=2)
+    assert list(rows) == ROWS
+    assert conn.cursors[0].name == 'execute_query' and conn.cursors[0].closed
+    assert conn.autocommit is True and conn.rollbacks == 1
+
+    conn = FakeConnection(ROWS)
+    rows = execute_query(conn, "SELECT 1", iterate=True, server_side=True, fetch_size=2)
+    assert next(rows) == {'id': 1, 'full_name': 'Иванов И.И.'}
+    assert conn.autocommit is False
+    rows.close()
+    assert conn.cursors[0].closed
+    assert conn.autocommit is True and conn.rollbacks == 1
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Тесты быстрой сериализации ответов API
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+from fast_json import FastJSONResponse
+
+PAYLOAD = {
+    'date': date(2025, 6, 27),
+    'employees': [{
+        'full_name': 'Иванов И.И.',
+        'first_event': datetime(2025, 6, 27, 8, 59, 1),
+        'last_exit': time(18, 5, 30),
+        'work_hours': 9.108333333333333,
+        'late_minutes': Decimal('3'),
+        'rate': Decimal('97.5'),
+        'doors': ('Турникет 1', 'Турникет 2'),
+        'exception': None
+    }],
+    'total_count': 1
+}
+
+
+def test_same_bytes_as_default_response():
+    """Те же байты, что jsonable_encoder + JSONResponse, с orjson и без него"""
+    expected = JSONResponse(jsonable_encoder(PAYLOAD)).body
+    assert FastJSONResponse(PAYLOAD).body == expected
+
+    orjson = fast_json.orjson
+    fast_json.orjson = None
+    try:
+        assert FastJSONResponse(PAYLOAD).body == expected
+    finally:
+        fast_json.orjson = orjson
+
+
+def test_date_keys_without_orjson():
+    """Ключи-даты (например, итоги по дням) пишутся строкой ISO и без orjson"""
+    payload = {'days': {date(2025, 6, 26): 3, date(2025, 6, 27): [{time(9, 0): Decimal('1.5')}]}, 1: None}
+    expected = JSONResponse(jsonable_encoder(payload)).body
+
+    orjson = fast_json.orjson
+    fast_json.orjson = None
+    try:
+        assert FastJSONResponse(payload).body == expected
+    finally:
+        fast_json.orjson = orjson
+    if orjson is not None:
+        assert FastJSONResponse(payload).body == expected
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Тесты очереди задач импорта
+"""
+
+import threading
+import time
+
+from ingest_jobs import IngestJob, IngestJobQueue, IngestQueueFull
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_job_runs_and_reports_progress():
+    """Задача проходит через воркер и сохраняет счетчики"""
+    def handler(job):
+        job.report_progress(lines_parsed=10, rows_inserted=7, duplicates=3)
+
+    ingest_queue = IngestJobQueue(handler, workers=1, max_depth=2)
+    ingest_queue.start()
+    try:
+        job = ingest_queue.submit(IngestJob('/tmp/a.txt', 'a.txt', cleanup=False))
+        assert wait_for(lambda: job.is_finished)
+        status = ingest_queue.get(job.id).to_dict()
+        assert status['phase'] == 'done'
+        assert status['rows_inserted'] == 7
+        assert status['lines_parsed'] == 10
+    finally:
+        ingest_queue.stop()
+
+
+def test_queue_depth_limit_and_cancel(tmp_path):
+    """Переполненная очередь отклоняет задачи, ожидающие задачи отменяются сразу"""
+    release = threading.Event()
+
+    def handler(job):
+        release.wait(5)
+
+    ingest_queue = IngestJobQueue(handler, workers=1, max_depth=1)
+    ingest_queue.start()
+    try:
+        running = ingest_queue.submit(IngestJob('/tmp/a.txt', 'a.txt', cleanup=False))
+        assert wait_for(lambda: running.phase == 'running')
+        upload = tmp_path / 'b.txt'
+        upload.write_text('data')
+        waiting = ingest_queue.submit(IngestJob(str(upload), 'b.txt'))
+
+        try:
+            ingest_queue.submit(IngestJob('/tmp/c.txt', 'c.txt', cleanup=False))
+            assert False, "Ожидалось переполнение очереди"
+        except IngestQueueFull:
+            pass
+        assert [job.filename for job in ingest_queue.list_jobs()] == ['a.txt', 'b.txt']
+
+        ingest_queue.cancel(waiting.id)
+        assert waiting.phase == 'cancelled'
+
+        ingest_queue.cancel(running.id)
+        assert running.cancel_requested
+        release.set()
+        assert wait_for(lambda: running.is_finished)
+        assert running.phase == 'cancelled'
+        # Отмененная в очереди задача до обработчика не доходит, но ее временный файл удаляется
+        assert wait_for(lambda: not upload.exists())
+    finally:
+        release.set()
+        ingest_queue.stop()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Тесты хеширования файлов и владельцев загрузок для манифеста импорта
+"""
+
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+
+import ingest_manifest
+from ingest_manifest import hash_file, owner_is_dead, process_owner
+
+
+def test_prefix_hashes_match_hash_of_prefix(tmp_path, monkeypatch):
+    """Хеши префиксов, снятые за один проход, совпадают с хешами отдельных файлов"""
+    monkeypatch.setattr(ingest_manifest, 'HASH_CHUNK_SIZE', 7)
+    data = b"".join(f"line {i}\tdoor\tevent\n".encode() for i in range(50))
+    path = tmp_path / "export.txt"
+    path.write_bytes(data)
+
+    full_hash, size, prefixes = hash_file(path, [10, 64, 500, len(data) + 100])
+
+    assert size == len(data)
+    assert full_hash == hashlib.sha256(data).hexdigest()
+    for prefix_size in (10, 64, 500):
+        assert prefixes[prefix_size] == hashlib.sha256(data[:prefix_size]).hexdigest()
+    assert len(data) + 100 not in prefixes
+
+
+def test_only_dead_owners_are_recovered():
+    """Свои и живые загрузки не считаются прерванными, загрузки умерших процессов - да"""
+    host = socket.gethostname()
+    finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+    finished.wait()
+
+    assert not owner_is_dead(process_owner(), heartbeat_stale=True)
+    # CLI-импорт на этом хосте жив, даже если давно не было контрольной точки
+    assert not owner_is_dead(f"{host}:{os.getppid()}:boot", heartbeat_stale=True)
+    assert owner_is_dead(f"{host}:{finished.pid}:boot", heartbeat_stale=False)
+    # Тот же PID, другая метка - прошлый запуск этого процесса
+    assert owner_is_dead(f"{host}:{os.getpid()}:previous", heartbeat_stale=False)
+    # Другой хост - только по отметке жизни
+    assert not owner_is_dead("other-host:1:boot", heartbeat_stale=False)
+    assert owner_is_dead("other-host:1:boot", heartbeat_stale=True)
+    assert owner_is_dead(None, heartbeat_stale=False)
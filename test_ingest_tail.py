@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Тесты выбора файлов tail-режима (без сервера PostgreSQL)
+"""
+
+import os
+import time
+
+from ingest_tail import RETIRED_RECHECK_SECONDS, TailFollower, file_signature
+
+
+def test_unchanged_and_idle_files_are_not_reread(tmp_path):
+    """Неизменившийся файл пропускается, давно не менявшийся выводится из слежения до перепроверки"""
+    today = tmp_path / 'today.txt'
+    old = tmp_path / 'old.txt'
+    today.write_bytes(b'line\n')
+    old.write_bytes(b'line\n')
+    day_ago = time.time() - 86400
+    os.utime(old, (day_ago, day_ago))
+
+    follower = TailFollower(None, str(tmp_path), idle_after_seconds=3600)
+    changed = follower.changed_files()
+    assert [os.path.basename(path) for path, _ in changed] == ['old.txt', 'today.txt']
+    for path, stat_result in changed:
+        follower.followed[path] = file_signature(stat_result)
+
+    assert follower.changed_files() == []
+    assert list(follower.retired) == [str(old)]
+
+    today.write_bytes(b'line\nline\n')
+    assert [os.path.basename(path) for path, _ in follower.changed_files()] == ['today.txt']
+
+    # Выведенный из слежения файл снова проверяется по истечении RETIRED_RECHECK_SECONDS
+    old.write_bytes(b'rotated\n')
+    assert [path for path, _ in follower.changed_files()] == [str(today)]
+    later = time.time() + RETIRED_RECHECK_SECONDS + 1
+    assert [os.path.basename(path) for path, _ in follower.changed_files(later)] == ['old.txt', 'today.txt']
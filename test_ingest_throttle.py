@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Тесты ограничителя записи импорта
+"""
+
+from datetime import datetime
+
+from ingest_throttle import IngestThrottle, parse_night_hours
+
+
+def test_budget_shrinks_under_slow_reports_and_paces_writes():
+    """Медленные отчеты снижают бюджет вдвое, запись сверх бюджета ждет"""
+    throttle = IngestThrottle(max_rows_per_second=1000, min_rows_per_second=100,
+                              target_report_latency_ms=500, night_hours=None)
+    throttle.observe_report_latency(2000)
+
+    assert throttle.acquire(50) == 0.0
+    assert throttle.snapshot()['rows_per_second_limit'] == 500
+    # Первые 50 строк заняли 0.1 сек бюджета - следующий пакет ждет их
+    assert throttle.acquire(10) > 0.05
+
+
+def test_night_hours_and_disabled_lift_limit():
+    assert parse_night_hours('22-6') == (22, 6)
+    assert parse_night_hours('') is None
+
+    throttle = IngestThrottle(max_rows_per_second=1, night_hours=(22, 6))
+    assert throttle.is_night(datetime(2025, 10, 23, 23, 0))
+    assert throttle.is_night(datetime(2025, 10, 23, 5, 59))
+    assert not throttle.is_night(datetime(2025, 10, 23, 12, 0))
+
+    disabled = IngestThrottle(enabled=False, max_rows_per_second=1)
+    assert disabled.acquire(1000) == 0.0
+    assert disabled.snapshot()['mode'] == 'off'
+
+
+class SignalCursor:
+    """Курсор, возвращающий заданную строку ingest_load_signals"""
+
+    def __init__(self, row):
+        self.row = row
+        self.queries = 0
+
+    def execute(self, query, params=None):
+        self.queries += 1
+
+    def fetchone(self):
+        return self.row
+
+
+def test_shared_signal_and_pool_exhaustion_shrink_budget():
+    """Сигнал API из другого процесса и исчерпание пула снижают бюджет"""
+    throttle = IngestThrottle(max_rows_per_second=1000, target_report_latency_ms=500, night_hours=None)
+    cursor = SignalCursor((2000.0, False))
+    throttle.poll_shared(cursor)
+    throttle.poll_shared(cursor)
+    assert cursor.queries == 1
+    throttle.acquire(1)
+    assert throttle.snapshot()['rows_per_second_limit'] == 500
+
+    exhausted = IngestThrottle(max_rows_per_second=1000, night_hours=None)
+    exhausted.observe_pool_exhausted()
+    exhausted.acquire(1)
+    snapshot = exhausted.snapshot()
+    assert snapshot['pool_exhausted']
+    assert snapshot['rows_per_second_limit'] == 500
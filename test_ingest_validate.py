@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Тесты режима validate (без БД)
+"""
+
+import json
+
+from ingest_validate import load_employee_snapshot, validate_skud_file
+
+CONFIG = {'exclude_employees': ['Охрана М.'], 'exclude_doors': []}
+
+
+def make_line(time, event, name, door='2 эт'):
+    return "\t".join(['DESKTOP-1', f'23.10.2025 {time}', event, '-', door, 'Вход 2 эт', '1', '2', name, '-'])
+
+
+def test_validate_report(tmp_path):
+    lines = [
+        "РМ\tВремя\tСобытие\tЗона\tДверь\tОписание\tАдрес\tЗона доступа\tХозорган\tКомментарий",
+        make_line('08:00:00', 'Доступ предоставлен', 'Иванов И.И.'),
+        make_line('08:00:00', 'Доступ предоставлен', 'Иванов И.И.'),
+        make_line('08:05:00', 'Доступ предоставлен', 'Петров П.П.', '3 эт'),
+        make_line('08:06:00', 'Доступ предоставлен', 'Охрана М.'),
+        make_line('08:07:00', 'Дверь открыта', '-'),
+    ]
+    file_path = tmp_path / 'day.txt'
+    file_path.write_bytes(("\n".join(lines) + "\n").encode('windows-1251'))
+    snapshot = tmp_path / 'employees.json'
+    snapshot.write_text(json.dumps({'ИТ': [{'full_name': 'Иванов И.И.'}]}, ensure_ascii=False), encoding='utf-8')
+
+    report = validate_skud_file(str(file_path), CONFIG, load_employee_snapshot(str(snapshot)))
+
+    assert report['records'] == 2
+    assert report['duplicates_in_file'] == 1
+    assert report['excluded_rows'] == 1
+    assert report['events_by_type'] == {'Доступ предоставлен': 4, 'Дверь открыта': 1}
+    assert report['employees']['unknown_names'] == ['Петров П.П.']
+    assert report['time_range'] == {'first': '2025-10-23 08:00:00', 'last': '2025-10-23 08:05:00'}
+    assert report['doors'] == {'2 эт': 1, '3 эт': 1}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Тесты парсера СКУД: строки выгрузки и JSON-записи /ingest/events
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from real_skud_parser import parse_real_skud_line, record_from_dict
+
+CONFIG = {'exclude_employees': ['Охрана М.'], 'exclude_doors': ['1эт серверная']}
+
+
+def test_line_and_dict_give_same_record():
+    """Строка выгрузки и эквивалентная JSON-запись дают одну и ту же запись"""
+    line = "\t".join([
+        'DESKTOP-1', '23.10.2025 08:01:02', 'Доступ предоставлен', '-', '3 эт - 1 лст',
+        'Вход 3 эт', '3/1/22/1', '2', 'Иванов И.И.', '-'
+    ])
+    from_line = parse_real_skud_line(line, 1, CONFIG)
+    from_dict = record_from_dict({
+        'timestamp': '2025-10-23T08:01:02',
+        'full_name': 'Иванов И.И.',
+        'door_location': '3 эт - 1 лст',
+        'direction': 'вход',
+        'workstation': 'DESKTOP-1'
+    }, CONFIG)
+
+    assert from_line == from_dict
+    assert from_line.timestamp == datetime(2025, 10, 23, 8, 1, 2)
+    assert from_line.workstation == 'DESKTOP-1'
+
+
+def test_dict_records_are_filtered():
+    """К JSON-записям применяются исключения и проверка обязательных полей"""
+    base = {'timestamp': '23.10.2025 08:01:02', 'full_name': 'Иванов И.И.', 'door_location': '2 эт'}
+    assert record_from_dict(base, CONFIG) is not None
+    assert record_from_dict(dict(base, full_name='Охрана М.'), CONFIG) is None
+    assert record_from_dict(dict(base, door_location='1эт серверная'), CONFIG) is None
+    assert record_from_dict(dict(base, event_type='Доступ запрещен'), CONFIG) is None
+    assert record_from_dict(dict(base, timestamp='вчера'), CONFIG) is None
+    assert record_from_dict({'full_name': 'Иванов И.И.'}, CONFIG) is None
+
+
+def test_dict_timestamp_must_be_local():
+    """Наивное ISO-время принимается как есть, время со смещением отклоняется"""
+    base = {'full_name': 'Иванов И.И.', 'door_location': '2 эт'}
+    record = record_from_dict(dict(base, timestamp='2025-10-23T08:01:02'), CONFIG)
+    assert record.timestamp == datetime(2025, 10, 23, 8, 1, 2)
+    assert record.timestamp.tzinfo is None
+    assert record_from_dict(dict(base, timestamp='2025-10-23T08:01:02+03:00'), CONFIG) is None
+    assert record_from_dict(dict(base, timestamp='2025-10-23T05:01:02Z'), CONFIG) is None
+    assert record_from_dict(dict(base, timestamp=datetime(2025, 10, 23, 8, 1, 2, tzinfo=timezone.utc)), CONFIG) is None
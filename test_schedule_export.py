@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Тесты расписания за период и его выгрузки на PostgreSQL
+
+Нужен сервер из SKUD_TEST_CONFIG (по умолчанию postgres_config.ini): тест
+работает в отдельной базе <database>_pytest, без сервера пропускается.
+"""
+
+import csv
+import io
+import os
+from datetime import datetime
+
+import pytest
+
+from database_integrator import load_db_config
+from skud_bench import BenchDatabase, api_client
+
+PERIOD = {'start_date': '2025-06-23', 'end_date': '2025-06-27'}
+
+
+@pytest.fixture
+def database():
+    import psycopg2
+
+    db_config = load_db_config(os.environ.get('SKUD_TEST_CONFIG', 'postgres_config.ini'))
+    database = BenchDatabase(db_config, f"{db_config['database']}_pytest")
+    try:
+        database.prepare()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"нет PostgreSQL: {e}")
+    conn = database.connect()
+    try:
+        conn.cursor().execute(
+            "TRUNCATE access_logs, attendance_daily, data_catalog, employees RESTART IDENTITY CASCADE"
+        )
+    finally:
+        conn.close()
+    return database
+
+
+def add_events(database, full_name, events):
+    conn = database.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO employees (full_name) VALUES (%s) RETURNING id", (full_name,))
+        employee_id = cursor.fetchone()[0]
+        for timestamp, access_type, door in events:
+            cursor.execute("""
+                INSERT INTO access_logs (employee_id, access_datetime, access_type, door_location)
+                VALUES (%s, %s, %s, %s)
+            """, (employee_id, timestamp, access_type, door))
+    finally:
+        conn.close()
+
+
+def as_text(row):
+    return ['' if value is None else str(value) for value in row]
+
+
+def test_schedule_json_csv_and_xlsx_carry_same_rows(database):
+    """Событие без двери считается входом; JSON, CSV и XLSX дают одни и те же строки"""
+    from openpyxl import load_workbook
+    import clean_api
+
+    add_events(database, 'Иванов И.И.', [
+        (datetime(2025, 6, 26, 9, 20), 'ВХОД', None),
+        (datetime(2025, 6, 26, 18, 5), 'ВЫХОД', 'Выход 1 эт'),
+    ])
+    add_events(database, 'Петров П.П.', [
+        (datetime(2025, 6, 25, 8, 45), 'ВХОД', '2 эт'),
+        (datetime(2025, 6, 27, 8, 50), 'ВХОД', '3 эт'),
+        (datetime(2025, 6, 27, 17, 30), 'ВЫХОД', 'Выход 1 эт'),
+    ])
+    client = api_client(database)
+
+    response = client.get('/employee-schedule-range', params=PERIOD)
+    assert response.status_code == 200
+    employees = response.json()['employees']
+    ivanov_day = employees[0]['days'][0]
+    assert (ivanov_day['first_entry'], ivanov_day['is_late']) == ('09:20:00', True)
+    expected = [as_text(row) for row in clean_api.schedule_export_rows(employees)]
+    assert len(expected) == 3
+
+    response = client.get('/employee-schedule-range/export', params=dict(PERIOD, format='csv'))
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.content.decode('utf-8-sig')), delimiter=';'))
+    assert rows[0] == clean_api.SCHEDULE_EXPORT_COLUMNS
+    assert rows[1:] == expected
+
+    response = client.get('/employee-schedule-range/export', params=dict(PERIOD, format='xlsx'))
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.content), read_only=True).active
+    rows = [as_text(row) for row in sheet.iter_rows(values_only=True)]
+    assert rows[0] == clean_api.SCHEDULE_EXPORT_COLUMNS
+    assert rows[1:] == expected
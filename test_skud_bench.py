@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Тесты сравнения результатов бенчмарка с базой
+"""
+
+from skud_bench import compare, metric
+
+
+def test_compare_thresholds():
+    baseline = {
+        'metrics': {
+            'api.30d.dashboard_stats.p50_ms': metric(100, 'ms', 'lower'),
+            'api.30d.svod_report.p50_ms': metric(4, 'ms', 'lower'),
+            'ingest.batch_rows_per_sec': metric(10000, 'rows/s', 'higher'),
+        },
+        'thresholds': {'ingest.*': 0.5}
+    }
+    results = {
+        'metrics': {
+            'api.30d.dashboard_stats.p50_ms': metric(130, 'ms', 'lower'),
+            # +50%, но всего на 2 мс - в пределах шума
+            'api.30d.svod_report.p50_ms': metric(6, 'ms', 'lower'),
+            'ingest.batch_rows_per_sec': metric(6000, 'rows/s', 'higher'),
+        }
+    }
+
+    regressed = {row[0]: row[5] for row in compare(results, baseline)}
+    assert regressed == {
+        'api.30d.dashboard_stats.p50_ms': True,
+        'api.30d.svod_report.p50_ms': False,
+        'ingest.batch_rows_per_sec': False,
+    }
+
+    regressed = {row[0]: row[5] for row in compare(results, baseline, thresholds={'api.*': 0.5})}
+    assert not regressed['api.30d.dashboard_stats.p50_ms']
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Тесты генератора синтетической нагрузки
+"""
+
+from datetime import date
+
+from ingest_validate import validate_skud_file
+from skud_workload import SERVICE_ACCOUNTS, Workload, write_files
+
+CONFIG = {'exclude_employees': SERVICE_ACCOUNTS, 'exclude_doors': []}
+
+
+def make_workload():
+    return Workload(employees=20, doors=3, days=2, start=date(2025, 3, 6), seed=7)
+
+
+def test_files_parse_and_repeat(tmp_path):
+    stats = write_files(make_workload(), str(tmp_path / 'a'))
+    write_files(make_workload(), str(tmp_path / 'b'))
+
+    first = (tmp_path / 'a' / '2025.03.06.txt').read_bytes()
+    assert first == (tmp_path / 'b' / '2025.03.06.txt').read_bytes()
+    assert stats['files'] == 2
+
+    report = validate_skud_file(str(tmp_path / 'a' / '2025.03.06.txt'), CONFIG)
+    expected = sum(1 for _ in make_workload().access_rows(next(make_workload().days_events())[1], SERVICE_ACCOUNTS))
+    assert report['records'] == expected
+    assert report['excluded_rows'] > 0
+    assert report['events_by_type']['Дверь открыта'] > 0
+    assert report['events_by_type']['Включение реле'] > 0
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тесты встроенного SQLite-бэкенда интегратора (без сервера PostgreSQL)
+"""
+
+from datetime import date, datetime, time
+
+import report_queries
+from database_integrator import SkudDatabaseIntegrator
+from real_skud_parser import RealSkudRecord
+
+
+def make_line(time_str, name, door, description='Вход'):
+    return "\t".join(['DESKTOP-1', f'23.10.2025 {time_str}', 'Доступ предоставлен', '-', door,
+                      description, '1', '2', name, '-'])
+
+
+def test_sqlite_ingest_dedupe_and_reports(tmp_path):
+    file_path = tmp_path / 'day.txt'
+    lines = [
+        make_line('08:01:00', 'Иванов И.И.', '3 эт - 1 лст'),
+        make_line('08:01:00', 'Иванов И.И.', '3 эт - 1 лст'),
+        make_line('18:02:00', 'Иванов И.И.', 'Выход 1 эт', 'Выход'),
+        make_line('09:15:00', 'Петров П.П.', '2 эт'),
+    ]
+    file_path.write_bytes(("\n".join(lines) + "\n").encode('windows-1251'))
+
+    integrator = SkudDatabaseIntegrator(db_type="sqlite", db_path=str(tmp_path / 'skud.db'))
+    integrator.throttle = None
+    first = integrator.process_skud_file(str(file_path))
+    second = integrator.process_skud_file(str(file_path))
+
+    assert first['success'] and second['success']
+    assert first['details']['new_access_records'] == 3
+    assert first['details']['new_employees'] == 2
+    assert first['details']['duplicates'] == 1
+    # Повторная загрузка целиком отсекается водяным знаком и окном перекрытия
+    assert second['details']['new_access_records'] == 0
+    assert second['details']['dedupe']['overlap_in_memory'] == 4
+
+    integrator.connect()
+    schedule = report_queries.daily_schedule(integrator.connection, integrator.dialect, date(2025, 10, 23))
+    integrator.close()
+    by_name = {row['full_name']: row for row in schedule}
+    assert by_name['Иванов И.И.']['first_entry'] == time(8, 1)
+    assert by_name['Иванов И.И.']['last_exit'] == time(18, 2)
+    assert by_name['Петров П.П.']['last_exit'] is None
+
+
+def test_overlap_preload_is_per_workstation(tmp_path):
+    """Ключи окна перекрытия грузятся по знаку своего РМ, а не от самого старого знака"""
+    integrator = SkudDatabaseIntegrator(db_type="sqlite", db_path=str(tmp_path / 'skud.db'))
+    integrator.connect()
+    integrator.create_test_tables()
+    windows = []
+    integrator.preload_access_keys = lambda since, until: windows.append((since, until)) or set()
+    state = integrator.new_ingest_state()
+    state['watermarks'] = {'DESKTOP-1': datetime(2025, 10, 23, 18, 0), 'STALE': datetime(2024, 1, 10, 12, 0)}
+
+    def record(workstation, timestamp):
+        return RealSkudRecord(timestamp=timestamp, full_name='Иванов И.И.', card_number='', door_location='2 эт',
+                              event_type='Доступ предоставлен', direction='вход', workstation=workstation)
+
+    integrator.classify_record(record('DESKTOP-1', datetime(2025, 10, 23, 8, 0)), state)
+    integrator.classify_record(record('DESKTOP-1', datetime(2025, 10, 23, 9, 0)), state)
+    integrator.classify_record(record('STALE', datetime(2024, 1, 10, 8, 0)), state)
+    integrator.close()
+
+    assert windows == [
+        (datetime(2025, 10, 22, 18, 0), datetime(2025, 10, 23, 18, 0)),
+        (datetime(2024, 1, 9, 12, 0), datetime(2024, 1, 10, 12, 0)),
+    ]
+    assert state['dedupe']['overlap_in_memory'] == 3
+
+
+def test_add_access_log_without_check_counts_existing_row_as_duplicate(tmp_path, capsys):
+    """Запись, уже сохраненная другим импортом, не считается ошибкой"""
+    integrator = SkudDatabaseIntegrator(db_type="sqlite", db_path=str(tmp_path / 'skud.db'))
+    integrator.connect()
+    integrator.create_test_tables()
+    record = RealSkudRecord(timestamp=datetime(2025, 10, 23, 8, 0), full_name='Иванов И.И.', card_number='',
+                            door_location='2 эт', event_type='Доступ предоставлен', direction='вход')
+
+    assert integrator.add_access_log(record, check_duplicate=False)
+    assert not integrator.add_access_log(record, check_duplicate=False)
+    rows = integrator.connection.execute("SELECT COUNT(*) FROM access_logs").fetchone()[0]
+    integrator.close()
+
+    assert rows == 1
+    assert 'Ошибка' not in capsys.readouterr().out